@@ -1 +1,6 @@
-from . import agent
\ No newline at end of file
+try:
+    from . import agent
+except ModuleNotFoundError as e:
+    # Only the agent needs google-adk; the plain modules (and their tests) import without it
+    if not (e.name or '').startswith('google'):
+        raise
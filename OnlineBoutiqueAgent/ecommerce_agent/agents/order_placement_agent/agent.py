@@ -3,54 +3,64 @@ import requests
 import json
 from typing import Dict, List, Any, Optional
 
-# Simple in-memory cart storage (in production, this would be in a database)
-user_carts = {}
+try:
+    from ecommerce_agent.session_store import create_session_store
+except ImportError:
+    from session_store import create_session_store
 
-# Simple in-memory order storage for export purposes
-user_orders = {}
+# Cart items per user (bounded and expiring; SESSION_STORE_URL moves them out of process)
+user_carts = create_session_store('agent_carts')
+
+# Orders per user, kept for export
+user_orders = create_session_store('agent_orders')
 
 def add_to_cart(user_id: str, product_id: str, quantity: int = 1) -> Dict[str, Any]:
     """
     Add a product to the user's shopping cart.
     """
     try:
-        if user_id not in user_carts:
-            user_carts[user_id] = []
-
-        # Check if product already exists in cart
-        existing_item = None
-        for item in user_carts[user_id]:
-            if item["product_id"] == product_id:
-                existing_item = item
-                break
-
-        if existing_item:
-            existing_item["quantity"] += quantity
-            message = f"Updated quantity for product {product_id}. New quantity: {existing_item['quantity']}"
-        else:
-            # Get product details to store in cart
+        cart = user_carts.get(user_id, [])
+
+        # Get product details to store in cart (not needed if it's already there)
+        cart_item = None
+        if not any(item["product_id"] == product_id for item in cart):
             product_details = get_product_info(product_id)
-            if product_details["status"] == "success":
-                cart_item = {
-                    "product_id": product_id,
-                    "name": product_details["product"]["name"],
-                    "price": product_details["product"]["price"],
-                    "quantity": quantity,
-                    "url": product_details["product"]["url"]
-                }
-                user_carts[user_id].append(cart_item)
-                message = f"Added {quantity} x {cart_item['name']} to cart"
-            else:
+            if product_details["status"] != "success":
                 return {
                     "status": "error",
                     "error_message": f"Could not find product {product_id}"
                 }
+            cart_item = {
+                "product_id": product_id,
+                "name": product_details["product"]["name"],
+                "price": product_details["product"]["price"],
+                "quantity": quantity,
+                "url": product_details["product"]["url"]
+            }
+
+        outcome = {}
+
+        def add(cart):
+            existing_item = next((item for item in cart if item["product_id"] == product_id), None)
+            if existing_item:
+                existing_item["quantity"] += quantity
+                outcome["message"] = f"Updated quantity for product {product_id}. New quantity: {existing_item['quantity']}"
+            elif cart_item is not None:
+                cart.append(dict(cart_item))
+                outcome["message"] = f"Added {quantity} x {cart_item['name']} to cart"
+            return cart
+
+        cart = user_carts.update(user_id, add, list)
+        if "message" not in outcome:
+            # Removed by another request after we looked - fetch its details after all
+            return add_to_cart(user_id, product_id, quantity)
+        message = outcome["message"]
 
         return {
             "status": "success",
             "message": message,
-            "cart_items": len(user_carts[user_id]),
-            "total_products": sum(item["quantity"] for item in user_carts[user_id])
+            "cart_items": len(cart),
+            "total_products": sum(item["quantity"] for item in cart)
         }
 
     except Exception as e:
@@ -66,39 +76,43 @@ def remove_from_cart(user_id: str, product_id: str, quantity: Optional[int] = No
     Remove a product from the user's shopping cart.
     """
     try:
-        if user_id not in user_carts or not user_carts[user_id]:
-            return {
-                "status": "error",
-                "error_message": "Cart is empty"
-            }
-
-        # Find the item in cart
-        item_to_remove = None
-        for item in user_carts[user_id]:
-            if item["product_id"] == product_id:
-                item_to_remove = item
-                break
+        outcome = {}
+
+        def remove(cart):
+            outcome.clear()
+            if not cart:
+                outcome["error"] = "Cart is empty"
+                return cart
+
+            # Find the item in cart
+            item_to_remove = next((item for item in cart if item["product_id"] == product_id), None)
+            if not item_to_remove:
+                outcome["error"] = f"Product {product_id} not found in cart"
+                return cart
+
+            if quantity is None or quantity >= item_to_remove["quantity"]:
+                # Remove entire item
+                cart.remove(item_to_remove)
+                outcome["message"] = f"Removed {item_to_remove['name']} from cart"
+            else:
+                # Reduce quantity
+                item_to_remove["quantity"] -= quantity
+                outcome["message"] = f"Reduced quantity of {item_to_remove['name']} by {quantity}. New quantity: {item_to_remove['quantity']}"
+            return cart
 
-        if not item_to_remove:
+        cart = user_carts.update(user_id, remove, list)
+        if "error" in outcome:
             return {
                 "status": "error",
-                "error_message": f"Product {product_id} not found in cart"
+                "error_message": outcome["error"]
             }
-
-        if quantity is None or quantity >= item_to_remove["quantity"]:
-            # Remove entire item
-            user_carts[user_id].remove(item_to_remove)
-            message = f"Removed {item_to_remove['name']} from cart"
-        else:
-            # Reduce quantity
-            item_to_remove["quantity"] -= quantity
-            message = f"Reduced quantity of {item_to_remove['name']} by {quantity}. New quantity: {item_to_remove['quantity']}"
+        message = outcome["message"]
 
         return {
             "status": "success",
             "message": message,
-            "cart_items": len(user_carts[user_id]),
-            "total_products": sum(item["quantity"] for item in user_carts[user_id])
+            "cart_items": len(cart),
+            "total_products": sum(item["quantity"] for item in cart)
         }
 
     except Exception as e:
@@ -109,12 +123,33 @@ def remove_from_cart(user_id: str, product_id: str, quantity: Optional[int] = No
             "product_id": product_id
         }
 
+def _cart_summary(cart_items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    total_cost = 0.0
+
+    for item in cart_items:
+        # Extract price value from price string (e.g., "$19.99" -> 19.99)
+        price_str = item["price"].replace("$", "")
+        try:
+            price_value = float(price_str)
+            total_cost += price_value * item["quantity"]
+        except ValueError:
+            # If price parsing fails, skip adding to total
+            pass
+
+    return {
+        "status": "success",
+        "cart_items": cart_items,
+        "total_items": sum(item["quantity"] for item in cart_items),
+        "total_cost": round(total_cost, 2)
+    }
+
 def view_cart(user_id: str) -> Dict[str, Any]:
     """
     View the contents of the user's shopping cart.
     """
     try:
-        if user_id not in user_carts or not user_carts[user_id]:
+        cart_items = user_carts.get(user_id)
+        if not cart_items:
             return {
                 "status": "success",
                 "message": "Cart is empty",
@@ -123,25 +158,7 @@ def view_cart(user_id: str) -> Dict[str, Any]:
                 "total_cost": 0.0
             }
 
-        cart_items = user_carts[user_id]
-        total_cost = 0.0
-
-        for item in cart_items:
-            # Extract price value from price string (e.g., "$19.99" -> 19.99)
-            price_str = item["price"].replace("$", "")
-            try:
-                price_value = float(price_str)
-                total_cost += price_value * item["quantity"]
-            except ValueError:
-                # If price parsing fails, skip adding to total
-                pass
-
-        return {
-            "status": "success",
-            "cart_items": cart_items,
-            "total_items": sum(item["quantity"] for item in cart_items),
-            "total_cost": round(total_cost, 2)
-        }
+        return _cart_summary(cart_items)
 
     except Exception as e:
         return {
@@ -155,9 +172,9 @@ def clear_cart(user_id: str) -> Dict[str, Any]:
     Clear all items from the user's shopping cart.
     """
     try:
-        if user_id in user_carts:
-            items_count = len(user_carts[user_id])
-            user_carts[user_id] = []
+        cart = user_carts.pop(user_id)
+        if cart is not None:
+            items_count = len(cart)
             return {
                 "status": "success",
                 "message": f"Cleared {items_count} items from cart"
@@ -181,15 +198,14 @@ def simulate_checkout(user_id: str, shipping_address: str, payment_method: str)
     Note: This is a simulation - no real payment is processed.
     """
     try:
-        cart_result = view_cart(user_id)
-        if cart_result["status"] != "success":
-            return cart_result
-
-        if not cart_result["cart_items"]:
+        # Take the cart in one step, so a concurrent checkout can't order it again
+        cart_items = user_carts.pop(user_id)
+        if not cart_items:
             return {
                 "status": "error",
                 "error_message": "Cannot checkout with empty cart"
             }
+        cart_result = _cart_summary(cart_items)
 
         # Generate a fake order number
         import random
@@ -208,12 +224,7 @@ def simulate_checkout(user_id: str, shipping_address: str, payment_method: str)
         }
 
         # Store order for later export
-        if user_id not in user_orders:
-            user_orders[user_id] = []
-        user_orders[user_id].append(order_details)
-
-        # Clear the cart after successful checkout
-        clear_cart(user_id)
+        user_orders.update(user_id, lambda orders: orders + [order_details], list)
 
         return {
             "status": "success",
@@ -272,13 +283,14 @@ def get_latest_order(user_id: str) -> Dict[str, Any]:
     Get the most recent order for a user (for export purposes).
     """
     try:
-        if user_id not in user_orders or not user_orders[user_id]:
+        orders = user_orders.get(user_id)
+        if not orders:
             return {
                 "status": "error",
                 "error_message": "No orders found for this user"
             }
 
-        latest_order = user_orders[user_id][-1]
+        latest_order = orders[-1]
         return {
             "status": "success",
             "order": latest_order
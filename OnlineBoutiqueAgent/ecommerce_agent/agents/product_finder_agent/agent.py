@@ -3,6 +3,15 @@ import requests
 import json
 from typing import Dict, List, Any
 
+try:
+    from ecommerce_agent.deals_engine import deals_engine
+    from ecommerce_agent.price_history import price_history
+    from ecommerce_agent.product_records import freeze_product, freeze_products
+except ImportError:
+    from deals_engine import deals_engine
+    from price_history import price_history
+    from product_records import freeze_product, freeze_products
+
 def search_products(query: str) -> Dict[str, Any]:
     """
     Search for products on the Cymbal Shops e-commerce site.
@@ -68,7 +77,12 @@ def search_products(query: str) -> Dict[str, Any]:
                             "image": image_url,
                             "description": name  # Use name as description to avoid null errors
                         }
-                        products.append(product_info)
+                        # Normalized and frozen once here; sessions and UI props share the record
+                        products.append(freeze_product(product_info))
+
+        # Every scrape is a catalog refresh - record prices before filtering
+        price_history.record_catalog(products)
+        deals_engine.refresh(products)
 
         # Filter products based on query
         if query:
@@ -89,7 +103,7 @@ def search_products(query: str) -> Dict[str, Any]:
             "status": "success",
             "query": query,
             "total_found": len(products),
-            "products": products[:10]  # Limit to top 10 results
+            "products": freeze_products(products[:10])  # Limit to top 10 results
         }
 
     except Exception as e:
@@ -135,14 +149,14 @@ def get_product_details(product_id: str) -> Dict[str, Any]:
 
         return {
             "status": "success",
-            "product": {
+            "product": freeze_product({
                 "id": product_id,
                 "name": name,
                 "price": price,
                 "description": description,
                 "available_quantities": available_quantities,
                 "url": product_url
-            }
+            })
         }
 
     except Exception as e:
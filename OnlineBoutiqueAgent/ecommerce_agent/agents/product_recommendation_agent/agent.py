@@ -3,6 +3,11 @@ import requests
 import json
 from typing import Dict, List, Any, Optional
 
+try:
+    from ecommerce_agent.popularity import popularity_tracker
+except ImportError:
+    from popularity import popularity_tracker
+
 def get_all_products() -> Dict[str, Any]:
     """
     Get all available products from the Cymbal Shops website for recommendation analysis.
@@ -97,14 +102,26 @@ def recommend_products(user_preferences: str, current_product_id: Optional[str]
     """
     Recommend products based on user preferences, purchase history, or current product.
     """
+    # Get all available products
+    all_products_result = get_all_products()
+    if all_products_result["status"] != "success":
+        return all_products_result
+
+    return recommend_from_catalog(all_products_result["products"], user_preferences, current_product_id)
+
+def recommend_from_catalog(
+    products: List[Dict[str, Any]],
+    user_preferences: str,
+    current_product_id: Optional[str] = None,
+    tracker=None
+) -> Dict[str, Any]:
+    """
+    Rank recommendations from an already-loaded product list.
+    Kept separate from recommend_products so it can be evaluated offline.
+    """
+    if tracker is None:
+        tracker = popularity_tracker
     try:
-        # Get all available products
-        all_products_result = get_all_products()
-        if all_products_result["status"] != "success":
-            return all_products_result
-
-        products = all_products_result["products"]
-
         if not products:
             return {
                 "status": "error",
@@ -165,23 +182,32 @@ def recommend_products(user_preferences: str, current_product_id: Optional[str]
 
         # If no specific matches, recommend popular items within price constraints
         if not recommendations:
-            popular_items = ["Sunglasses", "Watch", "Tank Top", "Mug"]
-            for product in products:
-                if any(item.lower() in product["name"].lower() for item in popular_items):
-                    # Check price constraint for popular items too
-                    meets_price_constraint = True
-                    if max_price is not None:
-                        try:
-                            product_price = float(product["price"].replace("$", ""))
-                            meets_price_constraint = product_price <= max_price
-                        except:
-                            meets_price_constraint = True
-
-                    if meets_price_constraint:
-                        recommendations.append({
-                            **product,
-                            "reason": "Popular item within your budget"
-                        })
+            # Ranked by live traffic; the static list only applies before any traffic is seen
+            popular_ids = tracker.top_ids()
+            if popular_ids:
+                products_by_id = {p["id"]: p for p in products}
+                popular_products = [products_by_id[pid] for pid in popular_ids if pid in products_by_id]
+            else:
+                popular_items = ["Sunglasses", "Watch", "Tank Top", "Mug"]
+                popular_products = [
+                    p for p in products
+                    if any(item.lower() in p["name"].lower() for item in popular_items)
+                ]
+            for product in popular_products:
+                # Check price constraint for popular items too
+                meets_price_constraint = True
+                if max_price is not None:
+                    try:
+                        product_price = float(product["price"].replace("$", ""))
+                        meets_price_constraint = product_price <= max_price
+                    except:
+                        meets_price_constraint = True
+
+                if meets_price_constraint:
+                    recommendations.append({
+                        **product,
+                        "reason": "Popular item within your budget"
+                    })
 
         # Sort by category and price for better presentation
         recommendations = sorted(recommendations, key=lambda x: (x["category"], x["price"]))
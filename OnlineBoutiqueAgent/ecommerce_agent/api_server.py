@@ -19,6 +19,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Now import the agent components
 from ecommerce_agent.agents.product_finder_agent.agent import search_products
 from ecommerce_agent.tambo_ui_engine import TamboUIDecisionEngine
+from ecommerce_agent.session_store import create_session_store
 
 app = FastAPI(
     title="E-commerce Agent API",
@@ -38,8 +39,8 @@ app.add_middleware(
 # Initialize UI engine
 ui_engine = TamboUIDecisionEngine()
 
-# Simple session storage (in production, use Redis or database)
-sessions = {}
+# Chat contexts (bounded, expiring; set SESSION_STORE_URL=redis://... to share them)
+sessions = create_session_store('sessions')
 
 
 class ChatRequest(BaseModel):
@@ -82,14 +83,11 @@ async def chat(request: ChatRequest):
         user_message = request.message.lower()
         
         # Initialize session context if needed
-        if session_id not in sessions:
-            sessions[session_id] = {
-                'products': [],
-                'cart_items': [],
-                'history': []
-            }
-        
-        context = sessions[session_id]
+        context = sessions.setdefault(session_id, lambda: {
+            'products': [],
+            'cart_items': [],
+            'history': []
+        })
         
         # Search for products
         search_result = search_products(user_message)
@@ -98,6 +96,7 @@ async def chat(request: ChatRequest):
         if search_result.get('status') == 'success':
             products = search_result.get('products', [])
             context['products'] = products
+            sessions.set(session_id, context)
             
             if products:
                 product_names = ', '.join([p['name'] for p in products[:3]])
@@ -121,7 +120,7 @@ async def reset_session(session_id: str):
     """Reset a conversation session"""
     try:
         if session_id in sessions:
-            sessions[session_id] = {
+            sessions.set(session_id, {
                 'products': [],
                 'cart_items': [],
                 'history': []
@@ -0,0 +1,229 @@
+"""
+Budget-constrained bundle solver for BundleBuilder and OutfitBoard.
+
+Products are bucketed once into per-category candidate lists (sorted by
+score), then a branch-and-bound search picks one item per required category
+and keeps the top N combinations that fit the budget. The search stops early
+when its latency budget runs out and returns the best bundles found so far.
+"""
+
+import heapq
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Outfit slots a product can fill, matched against the product name
+SLOT_KEYWORDS = {
+    'top': ['tank top', 'shirt', 't-shirt', 'blouse', 'sweater', 'hoodie', 'jacket'],
+    'bottom': ['pants', 'jeans', 'shorts', 'skirt', 'trousers'],
+    'footwear': ['loafers', 'shoes', 'boots', 'sandals', 'sneakers'],
+    'accessory': ['sunglasses', 'glasses', 'watch', 'jewelry', 'bag', 'belt', 'hat'],
+    'home': ['candle holder', 'salt', 'pepper', 'jar', 'mug'],
+    'beauty': ['hairdryer', 'makeup', 'skincare'],
+}
+
+DEFAULT_OUTFIT_CATEGORIES = ('top', 'footwear', 'accessory')
+BUNDLE_DISCOUNT_PERCENT = 15
+DEFAULT_TOP_N = 3
+DEFAULT_LATENCY_BUDGET_MS = 20.0
+# Cap per-category candidates so the search space stays small
+MAX_CANDIDATES_PER_CATEGORY = 8
+
+_BUDGET_PATTERN = re.compile(r'(?:under|below|less than|max|budget(?: of)?)\s*\$?\s*(\d+(?:\.\d+)?)')
+
+
+def categorize_product(product: Dict[str, Any]) -> str:
+    """Return the outfit slot for a product (explicit 'slot' wins over name keywords)"""
+    if product.get('slot'):
+        return product['slot']
+    name = str(product.get('name', '')).lower()
+    for slot, keywords in SLOT_KEYWORDS.items():
+        if any(keyword in name for keyword in keywords):
+            return slot
+    return 'general'
+
+
+def parse_price(value: Any) -> Optional[float]:
+    """Parse '$19.99' / 19.99 style prices, returning None when unparseable"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace('$', '').replace(',', '').strip())
+    except ValueError:
+        return None
+
+
+def parse_budget(user_message: str) -> Optional[float]:
+    """Extract a budget like 'under $150' from a user message"""
+    match = _BUDGET_PATTERN.search(user_message.lower())
+    return float(match.group(1)) if match else None
+
+
+def default_score(product: Dict[str, Any]) -> float:
+    """Default item score - explicit score, then rating, then neutral (unparseable values count as neutral)"""
+    score = parse_price(product.get('score', product.get('rating', 1.0)))
+    return 1.0 if score is None else score
+
+
+@dataclass(frozen=True)
+class Candidate:
+    """A product prepared for the solver"""
+    product: Dict[str, Any]
+    price: float
+    score: float
+
+
+@dataclass
+class Bundle:
+    """One solver result: an item per required category that has candidates"""
+    items: List[Dict[str, Any]]
+    total_price: float
+    score: float
+    # Required categories with nothing on offer, so no item in the bundle
+    missing_categories: Tuple[str, ...] = ()
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing_categories
+
+    def to_dict(self, discount_percent: float = 0) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'totalPrice': round(self.total_price, 2),
+            'bundlePrice': round(self.total_price * (1 - discount_percent / 100), 2),
+            'score': round(self.score, 4),
+            'complete': self.complete,
+            'missingCategories': list(self.missing_categories),
+        }
+
+
+@dataclass
+class CandidateIndex:
+    """Per-category candidate lists, each sorted by score (desc) then price (asc)"""
+    by_category: Dict[str, List[Candidate]] = field(default_factory=dict)
+
+    def categories(self) -> List[str]:
+        return list(self.by_category.keys())
+
+
+class BundleSolver:
+    """
+    Finds the best-scoring bundles within a budget.
+
+    Example:
+        solver = BundleSolver()
+        index = solver.build_index(products)
+        bundles = solver.solve(index, ['top', 'footwear', 'accessory'], budget=150)
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[Dict[str, Any]], float] = default_score,
+        category_fn: Callable[[Dict[str, Any]], str] = categorize_product,
+        max_candidates: int = MAX_CANDIDATES_PER_CATEGORY
+    ):
+        self.score_fn = score_fn
+        self.category_fn = category_fn
+        self.max_candidates = max_candidates
+
+    def build_index(self, products: Sequence[Dict[str, Any]]) -> CandidateIndex:
+        """Bucket products by category once; reuse the index across solves"""
+        buckets: Dict[str, List[Candidate]] = {}
+        for product in products:
+            price = parse_price(product.get('price'))
+            if price is None:
+                continue
+            candidate = Candidate(product=product, price=price, score=self.score_fn(product))
+            buckets.setdefault(self.category_fn(product), []).append(candidate)
+
+        index = CandidateIndex()
+        for category, candidates in buckets.items():
+            candidates.sort(key=lambda c: (-c.score, c.price))
+            index.by_category[category] = candidates[:self.max_candidates]
+        return index
+
+    def solve(
+        self,
+        index: CandidateIndex,
+        categories: Sequence[str],
+        budget: Optional[float] = None,
+        top_n: int = DEFAULT_TOP_N,
+        latency_budget_ms: float = DEFAULT_LATENCY_BUDGET_MS
+    ) -> List[Bundle]:
+        """
+        Branch-and-bound over the required categories.
+
+        Categories with no candidates are skipped rather than failing the
+        whole bundle, and listed in each bundle's missing_categories - callers
+        decide whether a partial bundle is worth showing. Results are ordered
+        by score (desc) then price (asc).
+        """
+        categories = list(dict.fromkeys(categories))
+        missing = tuple(c for c in categories if not index.by_category.get(c))
+        slots = [index.by_category[c] for c in categories if index.by_category.get(c)]
+        if not slots or top_n <= 0:
+            return []
+
+        # Fewest candidates first keeps the tree narrow near the root
+        slots.sort(key=len)
+        limit = float('inf') if budget is None else budget
+
+        # Suffix bounds: best achievable score and cheapest possible spend for slots[i:]
+        depth = len(slots)
+        max_score_after = [0.0] * (depth + 1)
+        min_price_after = [0.0] * (depth + 1)
+        for i in range(depth - 1, -1, -1):
+            max_score_after[i] = max_score_after[i + 1] + slots[i][0].score
+            min_price_after[i] = min_price_after[i + 1] + min(c.price for c in slots[i])
+
+        if min_price_after[0] > limit:
+            return []
+
+        deadline = time.perf_counter() + latency_budget_ms / 1000.0
+        # Min-heap of (score, -price, tiebreak, picks) holding the current top N
+        best: List[Tuple[float, float, int, Tuple[Candidate, ...]]] = []
+        counter = 0
+        picks: List[Candidate] = []
+
+        def search(level: int, spent: float, score: float) -> bool:
+            nonlocal counter
+            if level == depth:
+                counter += 1
+                entry = (score, -spent, counter, tuple(picks))
+                if len(best) < top_n:
+                    heapq.heappush(best, entry)
+                elif entry[:2] > best[0][:2]:
+                    heapq.heapreplace(best, entry)
+                return True
+
+            if time.perf_counter() > deadline:
+                return False
+
+            for candidate in slots[level]:
+                new_spent = spent + candidate.price
+                if new_spent + min_price_after[level + 1] > limit:
+                    continue
+                bound = score + candidate.score + max_score_after[level + 1]
+                # Candidates are score-sorted, so once the bound loses nothing later can win
+                if len(best) == top_n and bound < best[0][0]:
+                    break
+                picks.append(candidate)
+                keep_going = search(level + 1, new_spent, score + candidate.score)
+                picks.pop()
+                if not keep_going:
+                    return False
+            return True
+
+        search(0, 0.0, 0.0)
+
+        results = sorted(best, key=lambda e: (-e[0], -e[1]))
+        return [
+            Bundle(
+                items=[c.product for c in entry[3]],
+                total_price=-entry[1],
+                score=entry[0],
+                missing_categories=missing
+            )
+            for entry in results
+        ]
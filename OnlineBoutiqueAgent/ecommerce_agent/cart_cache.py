@@ -0,0 +1,195 @@
+"""
+Write-through cache of signed-in users' carts.
+
+Reading a cart used to mean a MongoDB round trip, then totals and the
+CheckoutWizard props rebuilt from the items, on every cart view, chat
+"cart" turn and profile. Carts are read far more often than they change,
+so the cache keeps one CartView per user: the items, the formatted
+CheckoutWizard items and the totals, built once per change.
+
+Every cart write already returns the cart after the change (see Cart in
+database.py), and the endpoint hands that document to put(): the cache is
+written through, never invalidated and re-read. Cart documents carry a
+version that every write increments on the server, so when two writes
+finish out of order the older document doesn't replace the newer one.
+
+Each process has its own cache. With several workers (or hosts) give it the
+shared session store as `versions`: put() publishes each cart's version
+there and get() serves a cached cart only while its version is still the
+published one, so a change made on another worker is never missed - a read
+costs one store round trip instead of a MongoDB read and a rebuild.
+Several workers without a shared store can't be kept consistent, so the
+server turns the cache off then. Checkout never trusts the cache either and
+takes the items from the stored cart.
+
+    view = cart_cache.get(user_id)
+    if view is None:
+        view = cart_cache.put(user_id, Cart.get_or_create(user_id))
+    view.total_price, view.checkout_props()
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+try:
+    from ecommerce_agent.product_records import ProductRecord
+    from ecommerce_agent.session_store import SessionStore
+except ImportError:
+    from product_records import ProductRecord
+    from session_store import SessionStore
+
+DEFAULT_TTL_SECONDS = 300.0
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_ITEM_IMAGE = 'https://picsum.photos/seed/cart/100/100'
+
+
+def format_cart_items(cart_items: Iterable[Dict[str, Any]]) -> Tuple[ProductRecord, ...]:
+    """Cart items in the shape CheckoutWizard and UserProfile expect"""
+    return tuple(
+        ProductRecord(
+            id=item.get('id', ''),
+            name=item.get('name', 'Product'),
+            price=item.get('price', 0),
+            quantity=item.get('quantity', 1),
+            image=item.get('image', DEFAULT_ITEM_IMAGE)
+        )
+        for item in cart_items
+    )
+
+
+@dataclass(frozen=True)
+class CartView:
+    """A cart as the endpoints return it; items are immutable records"""
+    items: Tuple[ProductRecord, ...]
+    cart_items: Tuple[ProductRecord, ...]
+    total_items: int
+    total_price: float
+    version: int = 0
+
+    @classmethod
+    def build(cls, items: Iterable[Dict[str, Any]], version: int = 0) -> "CartView":
+        items = tuple(item if isinstance(item, ProductRecord) else ProductRecord(item) for item in items)
+        return cls(
+            items=items,
+            cart_items=format_cart_items(items),
+            total_items=sum(item['quantity'] for item in items),
+            total_price=sum(item['price'] * item['quantity'] for item in items),
+            version=version
+        )
+
+    @classmethod
+    def from_cart(cls, cart: Dict[str, Any]) -> "CartView":
+        """View of a cart document (carts written before versions count as version 0)"""
+        return cls.build(cart.get('items') or (), cart.get('version', 0))
+
+    def checkout_props(self) -> Dict[str, Any]:
+        """CheckoutWizard props (a new dict; the items are shared)"""
+        return {
+            'cartItems': list(self.cart_items),
+            'expressMode': False,
+            'shippingCost': 0
+        }
+
+
+class CartCache:
+    """
+    Thread-safe LRU of CartViews per user, with a fixed TTL
+
+    Entries expire ttl_seconds after they were written (reads don't extend
+    them). With a `versions` store shared by every process, a hit is also
+    checked against the cart's published version. A ttl_seconds of 0
+    disables the cache: get() always misses.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+        versions: Optional[SessionStore] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        # user_id -> newest cart version any process has seen
+        self.versions = versions
+        # user_id -> (expires_at, view)
+        self._entries: "OrderedDict[str, Tuple[float, CartView]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_writes = 0
+        self.outdated = 0
+
+    @property
+    def shared(self) -> bool:
+        """True when get() and put() make store round trips (see AsyncSessionStore)"""
+        return self.versions is not None
+
+    def get(self, user_id: str) -> Optional[CartView]:
+        """The cached cart, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            view = entry[1]
+        # Another process changed the cart (or its version expired from the store)
+        if self.versions is not None and self.versions.get(user_id) != view.version:
+            with self._lock:
+                if self._entries.get(user_id, (0, None))[1] is view:
+                    del self._entries[user_id]
+                self.misses += 1
+                self.outdated += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return view
+
+    def put(self, user_id: str, cart: Dict[str, Any]) -> CartView:
+        """
+        Cache the cart document a read or write returned; returns the view
+        to respond with (the cached one if it is newer than `cart`)
+        """
+        view = CartView.from_cart(cart)
+        if not self.ttl_seconds:
+            return view
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now and entry[1].version > view.version:
+                # An older write finishing after a newer one
+                self.stale_writes += 1
+                return entry[1]
+            self._entries[user_id] = (now + self.ttl_seconds, view)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if self.versions is not None:
+            # Never lower it: an older cart arriving late must not look current
+            self.versions.update(
+                user_id, lambda current: view.version if current is None or view.version > current else current
+            )
+        return view
+
+    def discard(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale_writes': self.stale_writes,
+                'outdated': self.outdated,
+                'ttl_seconds': self.ttl_seconds,
+                'shared_versions': self.versions is not None
+            }
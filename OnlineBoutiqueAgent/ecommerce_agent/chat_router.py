@@ -0,0 +1,184 @@
+"""
+Compiled intent router for the /chat endpoint.
+
+All route keywords are compiled into one regex shaped like a trie, run as a
+lookahead at every position so overlapping keywords are all seen in a single
+pass over the message. Each keyword carries a bitmask of the routes it
+triggers (and the routes it vetoes); the OR of those masks is mapped to a
+route through a memo table, so routing cost does not grow with the number of
+routes.
+
+Usage:
+    python chat_router.py                 # micro-benchmark, default messages
+    python chat_router.py --iterations 50000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from commerce_genui.intent_engine import trie_pattern
+except ImportError:
+    # Monorepo checkout without the SDK installed - use it from commerce-genui/
+    sys.path.insert(0, os.path.abspath(os.path.join(
+        os.path.dirname(__file__), '..', '..', 'commerce-genui', 'packages', 'core'
+    )))
+    from commerce_genui.intent_engine import trie_pattern
+
+DEFAULT_ROUTE = 'search'
+
+
+@dataclass(frozen=True)
+class Route:
+    """One /chat intent: fires on any keyword unless a veto keyword is present"""
+    name: str
+    keywords: Tuple[str, ...]
+    unless: Tuple[str, ...] = ()
+
+
+# Precedence is table order - the first route that fires wins
+CHAT_ROUTES: Tuple[Route, ...] = (
+    Route('login', ('login', 'log in', 'sign in', 'signin'), unless=('create', 'signup')),
+    Route('signup', ('signup', 'sign up', 'create account', 'register', 'new account')),
+    Route('orders', ('order history', 'my orders', 'past orders', 'previous orders', 'show orders')),
+    # Cart is checked before profile ("my cart" must not fall through to "my account")
+    Route('cart', (
+        'show cart', 'my cart', 'view cart', 'see cart', 'cart items', "what's in my cart",
+        'whats in my cart', 'show my cart', 'show me my cart', 'show me cart', 'display cart',
+        'display my cart'
+    )),
+    Route('profile', (
+        'show my profile', 'view profile', 'my account', 'account details', 'profile page',
+        'my profile', 'view my profile', 'show profile'
+    )),
+)
+
+
+class ChatRouter:
+    """
+    Maps a chat message to exactly one route name.
+
+    Example:
+        router = ChatRouter()
+        router.route("Show me my cart")   # 'cart'
+        router.route("red sunglasses")    # 'search'
+    """
+
+    def __init__(self, routes: Sequence[Route] = CHAT_ROUTES, default: str = DEFAULT_ROUTE):
+        self.routes = tuple(routes)
+        self.default = default
+
+        # Bit i: route i fired; bit len(routes) + i: route i vetoed
+        veto_offset = len(self.routes)
+        masks: Dict[str, int] = {}
+        for i, route in enumerate(self.routes):
+            for keyword in route.keywords:
+                masks[keyword.lower()] = masks.get(keyword.lower(), 0) | (1 << i)
+            for keyword in route.unless:
+                masks[keyword.lower()] = masks.get(keyword.lower(), 0) | (1 << (veto_offset + i))
+
+        # Only the longest keyword starting at each position is reported, so a
+        # keyword's mask also carries every keyword it contains
+        self._masks = {
+            keyword: _closure(keyword, masks) for keyword in masks
+        }
+        self._pattern = re.compile('(?=(' + trie_pattern(self._masks) + '))')
+        self._fire_bits = [1 << i for i in range(len(self.routes))]
+        self._veto_bits = [1 << (veto_offset + i) for i in range(len(self.routes))]
+        # Memo of combined mask -> route; the set of reachable masks is small
+        self._decisions: Dict[int, str] = {0: self.default}
+
+    def mask(self, message: str) -> int:
+        """OR of the masks of every keyword occurring in the message"""
+        masks = self._masks
+        combined = 0
+        for match in self._pattern.finditer(message.lower()):
+            keyword = match.group(1)
+            if keyword:
+                combined |= masks[keyword]
+        return combined
+
+    def route(self, message: str) -> str:
+        """Route name for a message (the default route when nothing fires)"""
+        combined = self.mask(message)
+        decision = self._decisions.get(combined)
+        if decision is None:
+            decision = self._decisions[combined] = self._decide(combined)
+        return decision
+
+    def _decide(self, combined: int) -> str:
+        for route, fire, veto in zip(self.routes, self._fire_bits, self._veto_bits):
+            if combined & fire and not combined & veto:
+                return route.name
+        return self.default
+
+
+def _closure(keyword: str, masks: Dict[str, int]) -> int:
+    combined = 0
+    for other, mask in masks.items():
+        if other in keyword:
+            combined |= mask
+    return combined
+
+
+def cascade_route(message: str, routes: Sequence[Route] = CHAT_ROUTES, default: str = DEFAULT_ROUTE) -> str:
+    """Reference router: one substring scan per keyword, as the handler used to do"""
+    text = message.lower()
+    for route in routes:
+        if any(keyword in text for keyword in route.keywords) and not any(k in text for k in route.unless):
+            return route.name
+    return default
+
+
+BENCHMARK_MESSAGES = [
+    "login",
+    "I want to create account",
+    "show me my order history please",
+    "what's in my cart right now?",
+    "open my profile page",
+    "red sunglasses under $30",
+    "I'm looking for a comfortable pair of loafers for the office and maybe a watch to go with them",
+    "compare the mug and the candle holder",
+]
+
+
+def benchmark(messages: Optional[List[str]] = None, iterations: int = 20000) -> Dict[str, float]:
+    """Mean routing time per message in microseconds, compiled router vs keyword cascade"""
+    messages = messages or BENCHMARK_MESSAGES
+    router = ChatRouter()
+    for message in messages:
+        assert router.route(message) == cascade_route(message), message
+
+    results = {}
+    for name, fn in (('compiled', router.route), ('cascade', cascade_route)):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for message in messages:
+                fn(message)
+        elapsed = time.perf_counter() - started
+        results[name] = elapsed / (iterations * len(messages)) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat router micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = benchmark(iterations=args.iterations)
+    print(f"{len(BENCHMARK_MESSAGES)} messages x {args.iterations} iterations")
+    for name, micros in results.items():
+        print(f"{name:<10}{micros:>10.2f} µs/message")
+
+
+# Shared router for the server process
+chat_router = ChatRouter()
+
+
+if __name__ == "__main__":
+    main()
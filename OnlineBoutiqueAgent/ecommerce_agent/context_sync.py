@@ -0,0 +1,147 @@
+"""
+Versioned chat context for compact responses.
+
+By default a chat reply echoes the whole session context. A client that
+keeps its own copy can ask for a delta instead: it sends back the
+context_version it last applied and gets only the keys that changed since.
+
+Each session carries its bookkeeping under SYNC_KEY: a random epoch (a new
+session, e.g. after expiry, gets a new one), a turn counter, and per
+context key the version it last changed at plus a digest of its value.
+Versions are "<epoch>-<n>" strings; a version from another epoch or from the
+future gets a full snapshot.
+
+The version a turn started from also tells which keys the turn changed.
+When another worker saved a turn for the same session in the meantime,
+rebase_turn() keeps that turn's context and applies only this turn's
+changes to it, so neither turn is lost (unless both changed the same key:
+then the later save wins that key).
+
+Compact context:
+    {
+        "version": "3f9a2c1b-7",
+        "base": "3f9a2c1b-5",          # version this applies on; null = replace everything
+        "set": {"cart_items": [...]},  # keys whose value changed
+        "unset": [],                   # keys that were removed
+        "product_ids": ["OLJCESPC7Z"]  # context products, by id, all present in ui_props.products
+    }
+"""
+
+import copy
+import hashlib
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+SYNC_KEY = '_sync'
+# Oldest turns are dropped first
+MAX_HISTORY_ENTRIES = 20
+
+
+def _digest(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def public_context(context: Dict[str, Any]) -> Dict[str, Any]:
+    """The context without its sync bookkeeping"""
+    return {key: value for key, value in context.items() if key != SYNC_KEY}
+
+
+def sync_context(context: Dict[str, Any], max_history: int = MAX_HISTORY_ENTRIES) -> str:
+    """
+    Cap history and record which keys changed this turn; returns the version
+
+    Call once per turn, after the handler has updated the context and
+    before it's saved.
+    """
+    history = context.get('history')
+    if isinstance(history, list) and len(history) > max_history:
+        context['history'] = history[-max_history:]
+
+    sync = context.get(SYNC_KEY)
+    if sync is None:
+        sync = context[SYNC_KEY] = {'epoch': uuid.uuid4().hex[:8], 'turn': 0, 'keys': {}}
+    turn = sync['turn'] + 1
+    changed = False
+    keys = sync['keys']
+    for key, value in context.items():
+        if key == SYNC_KEY:
+            continue
+        digest = _digest(value)
+        if key not in keys or keys[key][1] != digest:
+            keys[key] = [turn, digest]
+            changed = True
+    for key, entry in keys.items():
+        if key not in context and entry[1] is not None:
+            keys[key] = [turn, None]
+            changed = True
+    if changed:
+        sync['turn'] = turn
+    return f"{sync['epoch']}-{sync['turn']}"
+
+
+def context_version(context: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Version a context was last synced at (None before its first turn)"""
+    sync = (context or {}).get(SYNC_KEY)
+    return f"{sync['epoch']}-{sync['turn']}" if sync else None
+
+
+def rebase_turn(stored: Dict[str, Any], context: Dict[str, Any], read_version: Optional[str]) -> Dict[str, Any]:
+    """
+    `stored` with the changes a turn made to `context` since `read_version`
+    (the version it was loaded at), synced; neither argument is changed
+    except for `context`'s bookkeeping, so this can be retried
+    """
+    sync_context(context)
+    delta = context_delta(context, read_version)
+    rebased = {key: value for key, value in stored.items() if key != SYNC_KEY}
+    rebased.update(delta['set'])
+    for key in delta['unset']:
+        rebased.pop(key, None)
+    if SYNC_KEY in stored:
+        rebased[SYNC_KEY] = copy.deepcopy(stored[SYNC_KEY])
+    sync_context(rebased)
+    return rebased
+
+
+def _base_turn(sync: Dict[str, Any], version: Optional[str]) -> Optional[int]:
+    """Turn a client version refers to, or None when it can't be used as a base"""
+    if not version:
+        return None
+    epoch, _, turn = version.rpartition('-')
+    if epoch != sync['epoch'] or not turn.isdigit() or int(turn) > sync['turn']:
+        return None
+    return int(turn)
+
+
+def _product_ids(products: Any) -> Optional[List[Any]]:
+    if not isinstance(products, (list, tuple)) or not all(isinstance(p, dict) and 'id' in p for p in products):
+        return None
+    return [p['id'] for p in products]
+
+
+def context_delta(
+    context: Dict[str, Any],
+    since: Optional[str],
+    ui_props: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Compact context (see module docstring) for a client at version `since`"""
+    sync = context[SYNC_KEY]
+    base = _base_turn(sync, since)
+    changed = [key for key, (turn, _) in sync['keys'].items() if base is None or turn > base]
+
+    delta = {
+        'version': f"{sync['epoch']}-{sync['turn']}",
+        'base': since if base is not None else None,
+        'set': {key: context[key] for key in changed if key in context},
+        'unset': [key for key in changed if key not in context],
+    }
+    # Products already being rendered go by id instead of twice
+    if 'products' in delta['set'] and ui_props:
+        context_ids = _product_ids(delta['set']['products'])
+        rendered_ids = _product_ids(ui_props.get('products'))
+        if context_ids is not None and rendered_ids is not None and set(context_ids) <= set(rendered_ids):
+            del delta['set']['products']
+            delta['product_ids'] = context_ids
+    return delta
@@ -1,35 +1,95 @@
-"""MongoDB database connection and models"""
+"""
+MongoDB database connection and models
+
+The models are synchronous (pymongo). Async endpoints use their awaitable
+twins AsyncUser, AsyncCart and AsyncOrder instead: same methods, each call
+run on db_executor, so a database round trip never stalls the event loop.
+The executor is dedicated to MongoDB calls - the default asyncio executor
+also runs catalog scrapes, which must not hold up logins or cart writes.
+"""
+import asyncio
+import functools
 import os
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
 from datetime import datetime
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
 from dotenv import load_dotenv
 
+from order_numbers import new_order_number, normalize_order_number
+
 load_dotenv()
 
 # MongoDB connection
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "shopsage")
+# Threads running MongoDB calls for async endpoints (each holds at most one pooled connection)
+MONGODB_EXECUTOR_THREADS = int(os.getenv("MONGODB_EXECUTOR_THREADS", "32"))
+
+# Order history pages
+ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+# Fresh order numbers to try when the drawn one is already taken
+ORDER_NUMBER_ATTEMPTS = 5
+
+# Order fields per view (expressions in find projections need MongoDB 4.4+)
+ORDER_VIEWS = {
+    # One line per order: item counts instead of the item arrays
+    "summary": {
+        "number": 1, "created_at": 1, "total": 1, "status": 1,
+        "item_count": {"$size": {"$ifNull": ["$items", []]}},
+        "total_quantity": {"$sum": "$items.quantity"}
+    },
+    # Order lists: everything shown, nothing else
+    "list": {"number": 1, "created_at": 1, "total": 1, "status": 1, "items": 1, "shipping_info": 1},
+    "full": None
+}
 
 if not MONGODB_URI or "YOUR_PASSWORD_HERE" in MONGODB_URI:
     print("⚠️ MongoDB not configured - running in fallback mode")
     print("   Set MONGODB_URI in .env file to enable database features")
     raise ValueError("MONGODB_NOT_CONFIGURED")
 
-client = MongoClient(MONGODB_URI)
+client = MongoClient(MONGODB_URI, maxPoolSize=max(100, MONGODB_EXECUTOR_THREADS))
 db = client[MONGODB_DB_NAME]
+db_executor = ThreadPoolExecutor(max_workers=MONGODB_EXECUTOR_THREADS, thread_name_prefix="mongodb")
 
 # Collections
 users_collection = db["users"]
 carts_collection = db["carts"]
 orders_collection = db["orders"]
+popularity_collection = db["product_popularity"]
 
 # Create indexes
 users_collection.create_index("email", unique=True)
 users_collection.create_index("username", unique=True)
-carts_collection.create_index("user_id")
-orders_collection.create_index("user_id")
+# Order history pages: equality on user_id, then the (created_at, _id) sort and cursor
+orders_collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
 orders_collection.create_index("created_at")
+# Order numbers are what customers see; orders from before they existed have none
+orders_collection.create_index("number", unique=True, sparse=True)
+popularity_collection.create_index("product_id", unique=True)
+
+
+def _ensure_unique_cart_index():
+    """
+    One cart per user: cart upserts rely on a unique user_id index (without
+    it, two first writes can each insert a cart). Replaces the plain index
+    older versions created.
+    """
+    try:
+        carts_collection.create_index("user_id", unique=True)
+    except OperationFailure:
+        try:
+            carts_collection.drop_index("user_id_1")
+            carts_collection.create_index("user_id", unique=True)
+        except OperationFailure as e:
+            carts_collection.create_index("user_id")
+            print(f"⚠️ Carts index on user_id is not unique (duplicate carts?): {e}")
+
+
+_ensure_unique_cart_index()
 
 print(f"✅ Connected to MongoDB: {MONGODB_DB_NAME}")
 
@@ -108,70 +168,81 @@ class User:
             return None
 
 
+# Pipeline expression for a cart's version after one more change
+_NEXT_CART_VERSION = {"$add": [{"$ifNull": ["$version", 0]}, 1]}
+
+
 class Cart:
-    """Cart model"""
+    """
+    Cart model
+    
+    Every operation is one find_one_and_update with upsert that returns the
+    cart after the change, so a missing cart is created by the same atomic
+    write. Changes that depend on the current items (add or increment,
+    remove, set quantity) are aggregation-pipeline updates evaluated by the
+    server against the stored document - there is no read-then-write window
+    for a concurrent request to slip into. Needs MongoDB 4.2+.
+    
+    Every change also increments the cart's `version`, which lets a cache
+    of carts (cart_cache.py) tell which of two returned carts is newer.
+    """
+    
+    @staticmethod
+    def _find_and_upsert(user_id: str, update: Any) -> dict:
+        """Apply `update` to the user's cart, creating it if needed; returns the cart after the change"""
+        try:
+            cart = carts_collection.find_one_and_update(
+                {"user_id": user_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two first writes raced to insert the cart and the other one won - now it's an update
+            cart = carts_collection.find_one_and_update(
+                {"user_id": user_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        cart["_id"] = str(cart["_id"])
+        return cart
+    
+    @staticmethod
+    def _set_items(user_id: str, items_expression: Any) -> dict:
+        """Set the cart's items to a pipeline expression over the current `$items`"""
+        now = datetime.utcnow()
+        return Cart._find_and_upsert(user_id, [{"$set": {
+            "items": items_expression,
+            "version": _NEXT_CART_VERSION,
+            "created_at": {"$ifNull": ["$created_at", now]},
+            "updated_at": now
+        }}])
     
     @staticmethod
     def get_or_create(user_id: str) -> dict:
         """Get user's cart or create if doesn't exist"""
-        cart = carts_collection.find_one({"user_id": user_id})
-        if not cart:
-            cart = {
-                "user_id": user_id,
-                "items": [],
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-            result = carts_collection.insert_one(cart)
-            cart["_id"] = str(result.inserted_id)
-        else:
-            cart["_id"] = str(cart["_id"])
-        return cart
+        now = datetime.utcnow()
+        return Cart._find_and_upsert(
+            user_id, {"$setOnInsert": {"items": [], "version": 0, "created_at": now, "updated_at": now}}
+        )
     
     @staticmethod
     def add_item(user_id: str, item: dict) -> dict:
-        """Add item to cart"""
-        cart = Cart.get_or_create(user_id)
-        
-        # Check if item already exists
-        existing_item = None
-        for cart_item in cart["items"]:
-            if cart_item["id"] == item["id"]:
-                existing_item = cart_item
-                break
-        
-        if existing_item:
-            # Update quantity
-            carts_collection.update_one(
-                {"user_id": user_id, "items.id": item["id"]},
-                {
-                    "$inc": {"items.$.quantity": item.get("quantity", 1)},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-        else:
-            # Add new item
-            carts_collection.update_one(
-                {"user_id": user_id},
-                {
-                    "$push": {"items": item},
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
-            )
-        
-        return Cart.get_or_create(user_id)
+        """Add item to cart (or add to its quantity if it's already there)"""
+        # $literal: client values starting with "$" are data, not field paths
+        items = {"$ifNull": ["$items", []]}
+        product_id = {"$literal": item["id"]}
+        return Cart._set_items(user_id, {"$cond": [
+            {"$in": [product_id, {"$map": {"input": items, "as": "it", "in": "$$it.id"}}]},
+            {"$map": {"input": items, "as": "it", "in": {"$cond": [
+                {"$eq": ["$$it.id", product_id]},
+                {"$mergeObjects": ["$$it", {"quantity": {"$add": [{"$ifNull": ["$$it.quantity", 0]}, {"$literal": item.get("quantity", 1)}]}}]},
+                "$$it"
+            ]}}},
+            {"$concatArrays": [items, [{"$literal": item}]]}
+        ]})
     
     @staticmethod
     def remove_item(user_id: str, product_id: str) -> dict:
         """Remove item from cart"""
-        carts_collection.update_one(
-            {"user_id": user_id},
-            {
-                "$pull": {"items": {"id": product_id}},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
-        )
-        return Cart.get_or_create(user_id)
+        return Cart._set_items(user_id, {"$filter": {
+            "input": {"$ifNull": ["$items", []]}, "as": "it", "cond": {"$ne": ["$$it.id", {"$literal": product_id}]}
+        }})
     
     @staticmethod
     def update_quantity(user_id: str, product_id: str, quantity: int) -> dict:
@@ -179,16 +250,11 @@ class Cart:
         if quantity <= 0:
             return Cart.remove_item(user_id, product_id)
         
-        carts_collection.update_one(
-            {"user_id": user_id, "items.id": product_id},
-            {
-                "$set": {
-                    "items.$.quantity": quantity,
-                    "updated_at": datetime.utcnow()
-                }
-            }
-        )
-        return Cart.get_or_create(user_id)
+        return Cart._set_items(user_id, {"$map": {"input": {"$ifNull": ["$items", []]}, "as": "it", "in": {"$cond": [
+            {"$eq": ["$$it.id", {"$literal": product_id}]},
+            {"$mergeObjects": ["$$it", {"quantity": {"$literal": quantity}}]},
+            "$$it"
+        ]}}})
     
     @staticmethod
     def clear(user_id: str):
@@ -199,9 +265,32 @@ class Cart:
                 "$set": {
                     "items": [],
                     "updated_at": datetime.utcnow()
-                }
+                },
+                "$inc": {"version": 1}
             }
         )
+    
+    @staticmethod
+    def take_items(user_id: str) -> Optional[dict]:
+        """
+        Empty the cart and return it as it was, in one write (checkout: an
+        item added meanwhile is either taken too or stays in the cart).
+        The cart is now empty at the returned version + 1. None if the user
+        has no cart.
+        """
+        cart = carts_collection.find_one_and_update(
+            {"user_id": user_id},
+            [{"$set": {"items": [], "version": _NEXT_CART_VERSION, "updated_at": datetime.utcnow()}}],
+            return_document=ReturnDocument.BEFORE
+        )
+        if cart is not None:
+            cart["_id"] = str(cart["_id"])
+        return cart
+    
+    @staticmethod
+    def restore_items(user_id: str, items: list) -> dict:
+        """Put items taken by take_items back in front of the cart (a failed checkout)"""
+        return Cart._set_items(user_id, {"$concatArrays": [{"$literal": items}, {"$ifNull": ["$items", []]}]})
 
 
 class Order:
@@ -209,7 +298,7 @@ class Order:
     
     @staticmethod
     def create(user_id: str, items: list, shipping_info: dict, total: float) -> dict:
-        """Create a new order"""
+        """Create a new order with a new unique order number"""
         order = {
             "user_id": user_id,
             "items": items,
@@ -218,14 +307,174 @@ class Order:
             "status": "completed",
             "created_at": datetime.utcnow()
         }
-        result = orders_collection.insert_one(order)
+        for attempt in range(ORDER_NUMBER_ATTEMPTS):
+            order["number"] = new_order_number()
+            try:
+                result = orders_collection.insert_one(order)
+                break
+            except DuplicateKeyError:
+                # The number is taken (insert_one set _id, so drop it too)
+                order.pop("_id", None)
+                if attempt == ORDER_NUMBER_ATTEMPTS - 1:
+                    raise
         order["_id"] = str(result.inserted_id)
         return order
     
     @staticmethod
-    def get_user_orders(user_id: str) -> list:
-        """Get all orders for a user"""
-        orders = list(orders_collection.find({"user_id": user_id}).sort("created_at", -1))
+    def display_number(order: dict) -> str:
+        """The number shown for an order (older orders have none: their _id prefix)"""
+        return order.get("number") or str(order["_id"])[:8]
+    
+    @staticmethod
+    def get_by_number(user_id: str, number: str) -> Optional[dict]:
+        """
+        A user's order by the number shown for it, or None - one indexed read
+        
+        Also finds orders from before order numbers by the _id prefix they
+        were shown with. That prefix is the ObjectId's timestamp, so it is
+        an _id range.
+        """
+        from bson import ObjectId
+        normalized = normalize_order_number(number)
+        if not normalized:
+            return None
+        order = orders_collection.find_one({"number": normalized, "user_id": user_id})
+        if not order:
+            prefix = number.strip().lower()
+            if len(prefix) != 8 or any(c not in "0123456789abcdef" for c in prefix):
+                return None
+            order = orders_collection.find_one({
+                "_id": {"$gte": ObjectId(prefix + "0" * 16), "$lte": ObjectId(prefix + "f" * 16)},
+                "user_id": user_id,
+                "number": {"$exists": False}
+            }, sort=[("_id", ASCENDING)])
+            if not order:
+                return None
+        order["_id"] = str(order["_id"])
+        return order
+    
+    @staticmethod
+    def _page_cursor(order: dict) -> str:
+        return f"{order['created_at'].isoformat()}~{order['_id']}"
+    
+    @staticmethod
+    def _parse_page_cursor(cursor: str):
+        from bson import ObjectId
+        try:
+            created_at, order_id = cursor.split("~")
+            return datetime.fromisoformat(created_at), ObjectId(order_id)
+        except Exception:
+            raise ValueError(f"Invalid order cursor: {cursor!r}")
+    
+    @staticmethod
+    def get_order_page(user_id: str, limit: int = ORDER_PAGE_SIZE, cursor: Optional[str] = None,
+                       view: str = "list") -> dict:
+        """
+        One page of a user's orders, newest first
+        
+        Returns {"orders": [...], "next_cursor": str or None}; pass next_cursor
+        back to get the following page. The cursor is the last order's
+        (created_at, _id), so a page is one range scan of the
+        (user_id, created_at, _id) index however many orders the user has.
+        `view` picks the fields (ORDER_VIEWS): "summary", "list" or "full".
+        """
+        limit = max(1, min(int(limit), MAX_ORDER_PAGE_SIZE))
+        query = {"user_id": user_id}
+        if cursor:
+            created_at, order_id = Order._parse_page_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": order_id}}
+            ]
+        # One extra document tells whether there is a next page
+        orders = list(
+            orders_collection.find(query, ORDER_VIEWS[view])
+            .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        next_cursor = Order._page_cursor(orders[limit - 1]) if len(orders) > limit else None
+        orders = orders[:limit]
         for order in orders:
             order["_id"] = str(order["_id"])
-        return orders
+        return {"orders": orders, "next_cursor": next_cursor}
+    
+    @staticmethod
+    def count_user_orders(user_id: str) -> int:
+        """Number of orders a user placed (counted on the index, no documents read)"""
+        return orders_collection.count_documents({"user_id": user_id})
+
+
+class Popularity:
+    """Persisted product popularity scores (see popularity.PopularityTracker)"""
+    
+    @staticmethod
+    def add_scores(increments: dict, as_of: float, decay_rate: float):
+        """
+        Decay each stored score to the unix time `as_of` and add the increment
+        (server-side, so concurrent workers never overwrite each other)
+        """
+        if not increments:
+            return
+        popularity_collection.bulk_write([
+            UpdateOne(
+                {"product_id": product_id},
+                [{"$set": {
+                    "score": {"$add": [increment, {"$multiply": [
+                        {"$ifNull": ["$score", 0]},
+                        {"$exp": {"$multiply": [
+                            -decay_rate, {"$subtract": [as_of, {"$ifNull": ["$as_of", as_of]}]}
+                        ]}}
+                    ]}]},
+                    "as_of": as_of
+                }}],
+                upsert=True
+            )
+            for product_id, increment in increments.items()
+        ], ordered=False)
+    
+    @staticmethod
+    def load_scores() -> list:
+        """Return (product_id, score, as_of) for every stored product"""
+        return [
+            (doc["product_id"], doc["score"], doc["as_of"])
+            for doc in popularity_collection.find({}, {"_id": 0, "product_id": 1, "score": 1, "as_of": 1})
+        ]
+
+
+async def run_db(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking database call on db_executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(function, *args, **kwargs))
+
+
+class AsyncModel:
+    """
+    Awaitable twin of a model class: every static method becomes a
+    coroutine function with the same signature, run through run_db
+
+    Example:
+        cart = await AsyncCart.add_item(user_id, item)
+    """
+    
+    def __init__(self, model: type):
+        self._model = model
+    
+    def __getattr__(self, name: str):
+        method = getattr(self._model, name)
+        if name.startswith("_") or not callable(method):
+            return method
+        
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return await run_db(method, *args, **kwargs)
+        
+        setattr(self, name, call)
+        return call
+    
+    def __repr__(self) -> str:
+        return f"Async{self._model.__name__}"
+
+
+AsyncUser = AsyncModel(User)
+AsyncCart = AsyncModel(Cart)
+AsyncOrder = AsyncModel(Order)
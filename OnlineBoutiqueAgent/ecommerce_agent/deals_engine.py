@@ -0,0 +1,167 @@
+"""
+Deals engine backing DealBadgePanel.
+
+At each catalog refresh the engine compares every product's current price
+with its trailing median from the price history, adds the active bundle
+discount for the best outfit bundle, and stores the ranked result. Serving
+the deals panel is then a read of the precomputed list.
+"""
+
+import threading
+import time
+from statistics import median
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    from ecommerce_agent.bundle_solver import (
+        BundleSolver, BUNDLE_DISCOUNT_PERCENT, DEFAULT_OUTFIT_CATEGORIES, parse_price
+    )
+    from ecommerce_agent.price_history import PriceHistoryStore, price_history
+except ImportError:
+    from bundle_solver import (
+        BundleSolver, BUNDLE_DISCOUNT_PERCENT, DEFAULT_OUTFIT_CATEGORIES, parse_price
+    )
+    from price_history import PriceHistoryStore, price_history
+
+TRAILING_WINDOW_DAYS = 30
+# Markdowns smaller than this are noise, not deals
+MIN_MARKDOWN_PERCENT = 5.0
+MAX_DEALS = 6
+# An unchanged catalog is only re-ranked this often (medians drift slowly)
+MIN_REFRESH_INTERVAL_SECONDS = 300
+BUNDLE_LATENCY_BUDGET_MS = 5.0
+# Markdowns at least this deep get the HOT badge, shallower ones LIMITED
+HOT_MARKDOWN_PERCENT = 25
+
+
+class DealsEngine:
+    """
+    Precomputed, ranked deals.
+
+    Example:
+        engine = DealsEngine()
+        engine.refresh(products)
+        engine.top_deals()  # [{'id': ..., 'discountPercent': 22, ...}, ...]
+    """
+
+    def __init__(
+        self,
+        history: Optional[PriceHistoryStore] = None,
+        bundle_solver: Optional[BundleSolver] = None,
+        clock=time.time
+    ):
+        self.history = history if history is not None else price_history
+        self.bundle_solver = bundle_solver or BundleSolver()
+        self.clock = clock
+        self._deals: List[Dict[str, Any]] = []
+        self._catalog_key = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def top_deals(self) -> List[Dict[str, Any]]:
+        """Ranked deals from the last refresh (shared, do not mutate)"""
+        return self._deals
+
+    def refresh(self, products: Sequence[Dict[str, Any]], force: bool = False) -> bool:
+        """Recompute the ranked deal list; returns False if it was skipped as unchanged"""
+        now = self.clock()
+        key = tuple((p.get('id'), p.get('price')) for p in products)
+        if not force and key == self._catalog_key and now - self._refreshed_at < MIN_REFRESH_INTERVAL_SECONDS:
+            return False
+
+        deals = self._markdown_deals(products, now)
+        bundle_deal = self._bundle_deal(products)
+        if bundle_deal:
+            deals.append(bundle_deal)
+        deals.sort(key=lambda d: (-d['discountPercent'], -(d['originalPrice'] - d['discountedPrice'])))
+
+        with self._lock:
+            self._deals = deals[:MAX_DEALS]
+            self._catalog_key = key
+            self._refreshed_at = now
+        return True
+
+    def _markdown_deals(self, products: Sequence[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        """Products whose current price is below their trailing median"""
+        deals = []
+        start = (int(now) // 86400 - (TRAILING_WINDOW_DAYS - 1)) * 86400
+        end = start + TRAILING_WINDOW_DAYS * 86400 - 1
+        for product in products:
+            current = parse_price(product.get('price'))
+            if not current:
+                continue
+            daily = self.history.query(product.get('id', ''), start, end, buckets=TRAILING_WINDOW_DAYS)
+            if len(daily) < 2:
+                continue
+            reference = median(point['last'] for point in daily)
+            if reference <= current:
+                continue
+            percent = round((reference - current) / reference * 100)
+            if percent < MIN_MARKDOWN_PERCENT:
+                continue
+            deals.append(_deal(
+                deal_id=product.get('id', ''),
+                deal_type='markdown',
+                name=product.get('name', 'Product'),
+                original_price=round(reference, 2),
+                sale_price=current,
+                percent=percent,
+                image=product.get('image', ''),
+                badge='HOT' if percent >= HOT_MARKDOWN_PERCENT else 'LIMITED'
+            ))
+        return deals
+
+    def _bundle_deal(self, products: Sequence[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """The best outfit bundle at the standing bundle discount"""
+        index = self.bundle_solver.build_index(products)
+        bundles = self.bundle_solver.solve(
+            index, DEFAULT_OUTFIT_CATEGORIES, top_n=1, latency_budget_ms=BUNDLE_LATENCY_BUDGET_MS
+        )
+        if not bundles or len(bundles[0].items) < 2:
+            return None
+        bundle = bundles[0]
+        summary = bundle.to_dict(BUNDLE_DISCOUNT_PERCENT)
+        deal = _deal(
+            deal_id='bundle-' + '-'.join(str(item.get('id', '')) for item in bundle.items),
+            deal_type='bundle',
+            name=' + '.join(item.get('name', 'Product') for item in bundle.items),
+            original_price=summary['totalPrice'],
+            sale_price=summary['bundlePrice'],
+            percent=BUNDLE_DISCOUNT_PERCENT,
+            image=bundle.items[0].get('image', '')
+        )
+        deal['productIds'] = [item.get('id') for item in bundle.items]
+        return deal
+
+
+def _deal(
+    deal_id: str,
+    deal_type: str,
+    name: str,
+    original_price: float,
+    sale_price: float,
+    percent: float,
+    image: str,
+    badge: Optional[str] = None
+) -> Dict[str, Any]:
+    """One DealBadgePanel entry (frontend keys plus the legacy productName/discounted* keys)"""
+    deal = {
+        'id': deal_id,
+        'type': deal_type,
+        'name': name,
+        'productName': name,
+        'originalPrice': original_price,
+        'salePrice': sale_price,
+        'discountedPrice': sale_price,
+        'discount': percent,
+        'discountPercent': percent,
+        'image': image
+    }
+    # The panel's badge is an optional enum, so leave it out rather than send null
+    if badge:
+        deal['badge'] = badge
+    return deal
+
+
+# Shared engine, refreshed by product_finder_agent.search_products after each scrape
+deals_engine = DealsEngine()
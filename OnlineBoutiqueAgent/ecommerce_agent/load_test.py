@@ -0,0 +1,201 @@
+"""
+Local load test for multi-worker simple_server.
+
+For each worker count, starts `serve.py --workers N` against one shared
+session store, then runs client processes that each drive a guest cart for
+a fixed time: add an item, read the cart back, ask the chat for the cart.
+Every read is checked against the quantity that client has added so far,
+so a request served by a worker that can't see the cart shows up as a
+consistency ("stale") error rather than just a number. Clients reconnect
+before every request (a kept-alive connection stays on one worker, which
+would hide a read served by a worker that didn't see the write) unless
+--keep-alive is given.
+
+Only the cart and chat-cart paths are exercised, and by default as guests:
+they need neither MongoDB nor the catalog scrape, so the numbers measure
+the server and the store. --signed-in signs every client up first and runs
+the same scenario on its MongoDB cart instead, which is what the per-worker
+cart cache serves; it needs MONGODB_URI (passed on to the server) and leaves
+its load-*@example.com users behind.
+
+    python load_test.py --workers 1 2 4 --clients 8 --duration 10
+    MONGODB_URI=mongodb://localhost:27017 python load_test.py --workers 1 4 --signed-in
+    python load_test.py --workers 1 2 4 --store-url redis://localhost:6379/0
+    python load_test.py --url http://localhost:8000 --clients 8   # existing server
+
+Throughput can only scale up to the number of cores left over after the
+clients and the store; the stand-in store is single-process Python, so use
+a real Redis (--store-url) for scaling numbers.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+def _request(conn: http.client.HTTPConnection, method: str, path: str,
+             body: Optional[Dict[str, Any]] = None, token: Optional[str] = None) -> Dict[str, Any]:
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    conn.request(method, path, body=payload, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{method} {path} -> {response.status}: {data[:200]!r}")
+    return json.loads(data)
+
+
+def _sign_up(conn: http.client.HTTPConnection, name: str) -> str:
+    """A new account's token"""
+    return _request(conn, 'POST', '/auth/signup', {
+        'email': f'{name}@example.com', 'username': name, 'password': 'load-test-password'
+    })['token']
+
+
+def _client(args: Tuple[str, float, int, bool, bool]) -> Dict[str, Any]:
+    """One client process: a guest (or signed-in) cart scenario in a loop until the deadline"""
+    url, duration, client_id, keep_alive, signed_in = args
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    session_id = f"load-{client_id}-{uuid.uuid4().hex[:8]}"
+    token = _sign_up(conn, session_id) if signed_in else None
+    expected = 0
+    latencies: List[float] = []
+    errors = mismatches = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        steps = (
+            ('POST', '/cart/add', {'session_id': session_id, 'product_id': 'OLJCESPC7Z',
+                                   'product_name': 'Sunglasses', 'price': 19.99, 'quantity': 1}),
+            ('GET', f'/cart/{session_id}', None),
+            ('POST', '/chat', {'message': 'show my cart', 'session_id': session_id}),
+        )
+        for method, path, body in steps:
+            if not keep_alive:
+                conn.close()
+            started = time.perf_counter()
+            try:
+                result = _request(conn, method, path, body, token)
+            except Exception:
+                errors += 1
+                conn.close()
+                continue
+            latencies.append(time.perf_counter() - started)
+            if path == '/cart/add':
+                expected += 1
+            elif method == 'GET' and result.get('total_items') != expected:
+                mismatches += 1
+            elif path == '/chat' and sum(i['quantity'] for i in result['ui_props'].get('cartItems', [])) != expected:
+                mismatches += 1
+    conn.close()
+    return {'latencies': latencies, 'errors': errors, 'mismatches': mismatches}
+
+
+def run_clients(url: str, clients: int, duration: float, keep_alive: bool = False,
+                signed_in: bool = False) -> Dict[str, Any]:
+    """Drive `url` with `clients` processes; returns throughput and latency"""
+    started = time.perf_counter()
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.map(_client, [(url, duration, i, keep_alive, signed_in) for i in range(clients)])
+    elapsed = time.perf_counter() - started
+    latencies = sorted(l for r in results for l in r['latencies'])
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        'errors': sum(r['errors'] for r in results),
+        'mismatches': sum(r['mismatches'] for r in results),
+        'wall_seconds': elapsed,
+    }
+
+
+def _wait_ready(url: str, server: subprocess.Popen):
+    parsed = urlparse(url)
+    deadline = time.time() + STARTUP_TIMEOUT_SECONDS
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=2)
+            _request(conn, 'GET', '/health')
+            conn.close()
+            return
+        except (OSError, RuntimeError, http.client.HTTPException):
+            time.sleep(0.25)
+    raise RuntimeError("server did not become ready")
+
+
+def run_workers(workers: int, args, store_url: str) -> Dict[str, Any]:
+    """Start serve.py with `workers` processes, load it, stop it"""
+    env = dict(os.environ, SESSION_STORE_URL=store_url, LOG_LEVEL='warning')
+    command = [sys.executable, os.path.join(HERE, 'serve.py'), '--app', args.app,
+               '--host', '127.0.0.1', '--port', str(args.port), '--workers', str(workers)]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        _wait_ready(url, server)
+        # Give every worker a moment to finish booting before timing
+        time.sleep(args.warmup)
+        return run_clients(url, args.clients, args.duration, args.keep_alive, args.signed_in)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simple_server multi-worker load test")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--keep-alive", action="store_true", help="one connection per client")
+    parser.add_argument("--signed-in", action="store_true", help="signed-in MongoDB carts instead of guest carts")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--app", default="simple_server:app")
+    parser.add_argument("--store-url", help="shared session store (default: start the local stand-in)")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} clients, {args.duration:g}s per run")
+    if args.url:
+        runs = [('-', run_clients(args.url, args.clients, args.duration, args.keep_alive, args.signed_in))]
+    else:
+        standin = None
+        store_url = args.store_url
+        if not store_url:
+            sys.path.insert(0, HERE)
+            from resp_standin import RespStandIn
+            standin = RespStandIn().start()
+            store_url = standin.url
+        try:
+            runs = [(n, run_workers(n, args, store_url)) for n in args.workers]
+        finally:
+            if standin is not None:
+                standin.stop()
+
+    base = runs[0][1]['rps'] or 1.0
+    print(f"{'workers':>8}{'req/s':>10}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'stale':>7}")
+    for workers, r in runs:
+        print(f"{workers:>8}{r['rps']:>10.0f}{r['rps'] / base:>8.2f}x{r['p50_ms']:>9.1f}"
+              f"{r['p95_ms']:>9.1f}{r['errors']:>8}{r['mismatches']:>7}")
+    if any(r['errors'] or r['mismatches'] for _, r in runs):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
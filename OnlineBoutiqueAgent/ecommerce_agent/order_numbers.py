@@ -0,0 +1,41 @@
+"""
+Short order numbers.
+
+Customers see and type an order's number (receipts, "Order #..."), so it is
+short and easy to read out: ORDER_NUMBER_LENGTH characters of Crockford's
+base32 alphabet, without I, L, O and U. Numbers are random, not sequential,
+so they don't reveal how many orders the shop takes.
+
+32**8 is about 10**12 numbers, so a collision is rare. It still has to be
+handled where numbers must be unique: the orders collection has a unique
+index on `number`, and Order.create draws a new number when an insert hits
+it.
+
+    number = new_order_number()                  # e.g. "7K3QX9MD"
+    normalize_order_number(" 7k3q-x9md ")        # "7K3QX9MD"
+"""
+
+import secrets
+from typing import Optional
+
+ORDER_NUMBER_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ORDER_NUMBER_LENGTH = 8
+
+# Letters people confuse with digits, read as the digit (Crockford decoding)
+_LOOKALIKES = str.maketrans({"I": "1", "L": "1", "O": "0"})
+
+
+def new_order_number() -> str:
+    """A random order number"""
+    return "".join(secrets.choice(ORDER_NUMBER_ALPHABET) for _ in range(ORDER_NUMBER_LENGTH))
+
+
+def normalize_order_number(number: str) -> Optional[str]:
+    """
+    An order number as typed by a person (any case, spaces or dashes,
+    O for 0) in its stored form, or None if it can't be one
+    """
+    number = (number or "").strip().upper().replace("-", "").replace(" ", "").translate(_LOOKALIKES)
+    if len(number) != ORDER_NUMBER_LENGTH or any(c not in ORDER_NUMBER_ALPHABET for c in number):
+        return None
+    return number
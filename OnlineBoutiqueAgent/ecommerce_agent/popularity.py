@@ -0,0 +1,237 @@
+"""
+In-process product popularity counters.
+
+Views, searches, cart adds and purchases are folded into one exponentially
+decayed score per product. Scores use forward decay (each event is weighted by
+exp(+lambda * age_of_landmark)) so nothing has to be decayed on read and the
+relative order of products never changes with time alone. That lets a small
+top-k heap be maintained on every write and read back without any work.
+
+Increments are periodically added to an optional store (MongoDB in
+simple_server) and the merged totals read back, so restarts and every
+worker process share one set of scores.
+"""
+
+import heapq
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Tuple
+
+EVENT_WEIGHTS = {
+    'view': 1.0,
+    'search': 0.5,
+    'cart_add': 3.0,
+    'purchase': 5.0,
+}
+
+DEFAULT_HALF_LIFE_SECONDS = 24 * 3600
+DEFAULT_TOP_K = 10
+DEFAULT_FLUSH_INTERVAL_SECONDS = 60
+# Re-base the landmark before forward-decayed scores get large enough to lose precision
+_MAX_EXPONENT = 50.0
+
+
+class PopularityStore(Protocol):
+    """Persistence used by the tracker; scores are stored as of `as_of` (unix time)"""
+
+    def add_scores(self, increments: Dict[str, float], as_of: float, decay_rate: float) -> None:
+        """Decay each stored score to `as_of`, then add the increment"""
+        ...
+
+    def load_scores(self) -> Iterable[Tuple[str, float, float]]: ...
+
+
+class PopularityTracker:
+    """
+    Decayed per-product popularity with an always-current top-k.
+
+    Example:
+        tracker = PopularityTracker()
+        tracker.record('OLJCESPC7Z', 'cart_add', quantity=2)
+        tracker.top_ids()  # ('OLJCESPC7Z',)
+    """
+
+    def __init__(
+        self,
+        half_life_seconds: float = DEFAULT_HALF_LIFE_SECONDS,
+        top_k: int = DEFAULT_TOP_K,
+        clock: Callable[[], float] = time.time
+    ):
+        self.decay_rate = math.log(2) / half_life_seconds
+        self.top_k = top_k
+        self.clock = clock
+        self._landmark = clock()
+        self._scores: Dict[str, float] = {}
+        # Increments not yet added to the store (landmark scale)
+        self._pending: Dict[str, float] = {}
+        # Min-heap of [score, product_id] for the current top-k members
+        self._heap: List[List[Any]] = []
+        self._heap_entries: Dict[str, List[Any]] = {}
+        self._top_snapshot: Tuple[str, ...] = ()
+        self._lock = threading.Lock()
+        self._store: Optional[PopularityStore] = None
+        self._flush_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, product_id: Optional[str], event: str, quantity: int = 1):
+        """Record one event for a product; unknown events and empty ids are ignored"""
+        weight = EVENT_WEIGHTS.get(event)
+        if not product_id or weight is None:
+            return
+        with self._lock:
+            self._add(product_id, weight * max(quantity, 1), self.clock())
+
+    def record_many(self, product_ids: Iterable[Optional[str]], event: str):
+        """Record the same event for several products"""
+        weight = EVENT_WEIGHTS.get(event)
+        if weight is None:
+            return
+        with self._lock:
+            now = self.clock()
+            for product_id in product_ids:
+                if product_id:
+                    self._add(product_id, weight, now)
+
+    def _add(self, product_id: str, amount: float, now: float):
+        exponent = self.decay_rate * (now - self._landmark)
+        if exponent > _MAX_EXPONENT:
+            self._rebase(now)
+            exponent = 0.0
+        increment = amount * math.exp(exponent)
+        score = self._scores.get(product_id, 0.0) + increment
+        self._scores[product_id] = score
+        self._pending[product_id] = self._pending.get(product_id, 0.0) + increment
+        self._update_top(product_id, score)
+
+    def _rebase(self, now: float):
+        """Move the landmark to `now`, scaling every stored score down to match"""
+        factor = math.exp(-self.decay_rate * (now - self._landmark))
+        for product_id in self._scores:
+            self._scores[product_id] *= factor
+        for product_id in self._pending:
+            self._pending[product_id] *= factor
+        for entry in self._heap:
+            entry[0] *= factor
+        self._landmark = now
+
+    def _update_top(self, product_id: str, score: float):
+        entry = self._heap_entries.get(product_id)
+        if entry is not None:
+            # Scores only grow, so the entry can only move down the min-heap
+            entry[0] = score
+            heapq.heapify(self._heap)
+        elif len(self._heap) < self.top_k:
+            entry = [score, product_id]
+            self._heap_entries[product_id] = entry
+            heapq.heappush(self._heap, entry)
+        elif score > self._heap[0][0]:
+            entry = [score, product_id]
+            evicted = heapq.heapreplace(self._heap, entry)
+            del self._heap_entries[evicted[1]]
+            self._heap_entries[product_id] = entry
+        else:
+            return
+        self._top_snapshot = tuple(pid for _, pid in sorted(self._heap, reverse=True))
+
+    def _rebuild_top(self):
+        self._heap = [[score, pid] for pid, score in heapq.nlargest(
+            self.top_k, self._scores.items(), key=lambda item: item[1])]
+        heapq.heapify(self._heap)
+        self._heap_entries = {entry[1]: entry for entry in self._heap}
+        self._top_snapshot = tuple(pid for _, pid in sorted(self._heap, reverse=True))
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def top_ids(self) -> Tuple[str, ...]:
+        """Most popular product ids, best first (precomputed on write)"""
+        return self._top_snapshot
+
+    def score(self, product_id: str) -> float:
+        """Current decayed score for a product"""
+        with self._lock:
+            raw = self._scores.get(product_id, 0.0)
+            return raw * math.exp(-self.decay_rate * (self.clock() - self._landmark))
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def attach_store(self, store: PopularityStore, load: bool = True):
+        """Use `store` for flushes, optionally seeding counters from it"""
+        self._store = store
+        if load:
+            self._load_from_store()
+
+    def _load_from_store(self):
+        """Replace scores with the store's totals plus increments not yet flushed"""
+        stored = self._store.load_scores()
+        with self._lock:
+            scores = dict(self._pending)
+            for product_id, score, as_of in stored:
+                # Bring the stored score into the current landmark's scale
+                scaled = score * math.exp(self.decay_rate * (as_of - self._landmark))
+                scores[product_id] = scores.get(product_id, 0.0) + scaled
+            self._scores = scores
+            self._rebuild_top()
+
+    def flush(self) -> int:
+        """
+        Add increments recorded since the last flush to the store, then read
+        back the totals (which include other workers' increments); returns
+        how many products were written
+        """
+        if self._store is None:
+            return 0
+        with self._lock:
+            now = self.clock()
+            factor = math.exp(-self.decay_rate * (now - self._landmark))
+            landmark_pending, self._pending = self._pending, {}
+        increments = {pid: amount * factor for pid, amount in landmark_pending.items()}
+        try:
+            if increments:
+                self._store.add_scores(increments, now, self.decay_rate)
+        except Exception:
+            # Keep the increments so the next flush retries them
+            with self._lock:
+                for pid, amount in landmark_pending.items():
+                    self._pending[pid] = self._pending.get(pid, 0.0) + amount
+            raise
+        self._load_from_store()
+        return len(increments)
+
+    def start_periodic_flush(self, interval_seconds: float = DEFAULT_FLUSH_INTERVAL_SECONDS):
+        """Flush in a daemon thread every `interval_seconds`"""
+        if self._flush_thread is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"⚠️ Popularity flush failed: {e}")
+
+        self._flush_thread = threading.Thread(target=run, name='popularity-flush', daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        """Stop the periodic flush thread and write any pending changes"""
+        self._stop.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=5)
+            self._flush_thread = None
+        self.flush()
+
+
+# Shared tracker for the server process
+popularity_tracker = PopularityTracker()
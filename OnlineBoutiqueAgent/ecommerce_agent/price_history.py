@@ -0,0 +1,261 @@
+"""
+Compact price history store backing PriceTrendChart.
+
+Each catalog refresh appends one observation per product. Series are kept
+column-wise in append-only arrays: timestamps (seconds) and prices (cents)
+are delta-encoded as 32-bit ints, split into hour-aligned blocks that carry
+their absolute start values and a min/max/last summary, which are in turn
+grouped into day-aligned segments with their own summary. Downsampled
+queries use the coarsest summary that falls entirely inside one bucket, so
+long histories are answered without decoding every point.
+"""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from ecommerce_agent.bundle_solver import parse_price
+except ImportError:
+    from bundle_solver import parse_price
+
+# Blocks hold at most BLOCK_SIZE points from a single hour; segments group the
+# blocks of a single day. Both carry min/max/last summaries.
+BLOCK_SIZE = 128
+BLOCK_SECONDS = 3600
+SEGMENT_SECONDS = 86400
+# Same-price observations closer together than this are coalesced
+DEFAULT_MIN_INTERVAL_SECONDS = 60
+_INT32_MIN, _INT32_MAX = -(2 ** 31), 2 ** 31 - 1
+
+
+class _Series:
+    """Delta-encoded observations for one product"""
+    __slots__ = (
+        'ts_deltas', 'price_deltas',
+        'block_first', 'block_start_ts', 'block_start_price',
+        'block_end_ts', 'block_min', 'block_max', 'block_last',
+        'seg_first', 'seg_start_ts', 'seg_end_ts', 'seg_min', 'seg_max', 'seg_last',
+        'last_ts', 'last_price',
+    )
+
+    def __init__(self):
+        self.ts_deltas = array('i')
+        self.price_deltas = array('i')
+        # Block columns: first point index, absolute start values and summary
+        self.block_first = array('q')
+        self.block_start_ts = array('q')
+        self.block_start_price = array('q')
+        self.block_end_ts = array('q')
+        self.block_min = array('q')
+        self.block_max = array('q')
+        self.block_last = array('q')
+        # Segment columns: first block index and summary
+        self.seg_first = array('q')
+        self.seg_start_ts = array('q')
+        self.seg_end_ts = array('q')
+        self.seg_min = array('q')
+        self.seg_max = array('q')
+        self.seg_last = array('q')
+        self.last_ts = 0
+        self.last_price = 0
+
+    def __len__(self) -> int:
+        return len(self.ts_deltas)
+
+    def append(self, ts: int, cents: int):
+        count = len(self.ts_deltas)
+        ts = max(ts, self.last_ts)
+        ts_delta = ts - self.last_ts
+        price_delta = cents - self.last_price
+        fits = _INT32_MIN <= ts_delta <= _INT32_MAX and _INT32_MIN <= price_delta <= _INT32_MAX
+
+        new_block = (
+            count == 0
+            or not fits
+            or count - self.block_first[-1] >= BLOCK_SIZE
+            or ts // BLOCK_SECONDS != self.block_start_ts[-1] // BLOCK_SECONDS
+        )
+        if new_block:
+            blocks = len(self.block_first)
+            if not blocks or ts // SEGMENT_SECONDS != self.seg_start_ts[-1] // SEGMENT_SECONDS:
+                self.seg_first.append(blocks)
+                self.seg_start_ts.append(ts)
+                self.seg_end_ts.append(ts)
+                self.seg_min.append(cents)
+                self.seg_max.append(cents)
+                self.seg_last.append(cents)
+            # The first point of a block is stored absolutely in the block columns
+            self.block_first.append(count)
+            self.block_start_ts.append(ts)
+            self.block_start_price.append(cents)
+            self.block_end_ts.append(ts)
+            self.block_min.append(cents)
+            self.block_max.append(cents)
+            self.block_last.append(cents)
+            self.ts_deltas.append(0)
+            self.price_deltas.append(0)
+        else:
+            self.ts_deltas.append(ts_delta)
+            self.price_deltas.append(price_delta)
+            self.block_end_ts[-1] = ts
+            if cents < self.block_min[-1]:
+                self.block_min[-1] = cents
+            if cents > self.block_max[-1]:
+                self.block_max[-1] = cents
+            self.block_last[-1] = cents
+
+        self.seg_end_ts[-1] = ts
+        if cents < self.seg_min[-1]:
+            self.seg_min[-1] = cents
+        if cents > self.seg_max[-1]:
+            self.seg_max[-1] = cents
+        self.seg_last[-1] = cents
+        self.last_ts = ts
+        self.last_price = cents
+
+    def decode_block(self, i: int) -> Iterable[Tuple[int, int]]:
+        """Yield (ts, cents) for every point in block i"""
+        first = self.block_first[i]
+        end = self.block_first[i + 1] if i + 1 < len(self.block_first) else len(self.ts_deltas)
+        ts = self.block_start_ts[i]
+        cents = self.block_start_price[i]
+        yield ts, cents
+        ts_deltas, price_deltas = self.ts_deltas, self.price_deltas
+        for j in range(first + 1, end):
+            ts += ts_deltas[j]
+            cents += price_deltas[j]
+            yield ts, cents
+
+
+class PriceHistoryStore:
+    """
+    Per-product price series with downsampled window queries.
+
+    Example:
+        store = PriceHistoryStore()
+        store.record_catalog(products)
+        store.query('OLJCESPC7Z', start_ts, end_ts, buckets=30)
+        # [{'ts': ..., 'min': 19.99, 'max': 21.5, 'last': 19.99}, ...]
+    """
+
+    def __init__(self, min_interval_seconds: int = DEFAULT_MIN_INTERVAL_SECONDS):
+        self.min_interval_seconds = min_interval_seconds
+        self._series: Dict[str, _Series] = {}
+        self._lock = threading.Lock()
+
+    def record(self, product_id: str, price: Any, ts: Optional[float] = None) -> bool:
+        """Append one observation; returns False if it was unparseable or coalesced"""
+        value = parse_price(price)
+        if not product_id or value is None:
+            return False
+        ts = int(time.time() if ts is None else ts)
+        cents = int(round(value * 100))
+        with self._lock:
+            series = self._series.get(product_id)
+            if series is None:
+                series = self._series[product_id] = _Series()
+            elif cents == series.last_price and ts - series.last_ts < self.min_interval_seconds:
+                return False
+            series.append(ts, cents)
+        return True
+
+    def record_catalog(self, products: Iterable[Dict[str, Any]], ts: Optional[float] = None) -> int:
+        """Record an observation for every product in a catalog refresh"""
+        ts = time.time() if ts is None else ts
+        return sum(1 for p in products if self.record(p.get('id'), p.get('price'), ts))
+
+    def latest(self, product_id: str) -> Optional[Tuple[int, float]]:
+        """Most recent (ts, price) for a product"""
+        series = self._series.get(product_id)
+        if series is None or not len(series):
+            return None
+        return series.last_ts, series.last_price / 100
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._series
+
+    def query(
+        self,
+        product_id: str,
+        start_ts: float,
+        end_ts: float,
+        buckets: int = 30
+    ) -> List[Dict[str, float]]:
+        """
+        Downsample observations in [start_ts, end_ts] into `buckets` equal-width
+        buckets, returning min/max/last price for each non-empty bucket in time order.
+        """
+        series = self._series.get(product_id)
+        if series is None or buckets <= 0 or end_ts < start_ts:
+            return []
+        start, end = int(start_ts), int(end_ts)
+        span = max(end - start, 1)
+
+        def bucket_of(ts: int) -> int:
+            return min((ts - start) * buckets // span, buckets - 1)
+
+        mins: List[Optional[int]] = [None] * buckets
+        maxs = [0] * buckets
+        lasts = [0] * buckets
+
+        def merge(b: int, lo: int, hi: int, last: int):
+            if mins[b] is None:
+                mins[b], maxs[b] = lo, hi
+            else:
+                if lo < mins[b]:
+                    mins[b] = lo
+                if hi > maxs[b]:
+                    maxs[b] = hi
+            lasts[b] = last
+
+        with self._lock:
+            blocks = len(series.block_first)
+            segments = len(series.seg_first)
+            # First segment that ends at or after the window start
+            k = bisect_left(series.seg_end_ts, start)
+            while k < segments:
+                seg_start = series.seg_start_ts[k]
+                if seg_start > end:
+                    break
+                seg_end = series.seg_end_ts[k]
+                if start <= seg_start and seg_end <= end and bucket_of(seg_start) == bucket_of(seg_end):
+                    merge(bucket_of(seg_start), series.seg_min[k], series.seg_max[k], series.seg_last[k])
+                    k += 1
+                    continue
+
+                last_block = series.seg_first[k + 1] if k + 1 < segments else blocks
+                i = bisect_left(series.block_end_ts, start, series.seg_first[k], last_block)
+                while i < last_block:
+                    block_start = series.block_start_ts[i]
+                    if block_start > end:
+                        break
+                    block_end = series.block_end_ts[i]
+                    if start <= block_start and block_end <= end and bucket_of(block_start) == bucket_of(block_end):
+                        merge(bucket_of(block_start), series.block_min[i], series.block_max[i], series.block_last[i])
+                    else:
+                        for ts, cents in series.decode_block(i):
+                            if ts < start:
+                                continue
+                            if ts > end:
+                                break
+                            merge(bucket_of(ts), cents, cents, cents)
+                    i += 1
+                k += 1
+
+        return [
+            {
+                'ts': start + b * span // buckets,
+                'min': mins[b] / 100,
+                'max': maxs[b] / 100,
+                'last': lasts[b] / 100,
+            }
+            for b in range(buckets)
+            if mins[b] is not None
+        ]
+
+
+# Shared store, fed by product_finder_agent.search_products on every catalog scrape
+price_history = PriceHistoryStore()
@@ -0,0 +1,72 @@
+"""
+Immutable product records shared across sessions and renders.
+
+Products are normalized once when they enter the catalog (a scrape) or a
+session: features become the [{"key": ..., "value": ...}] list the UI
+components expect, and the record is frozen so props builders can hand out
+the same objects on every turn instead of copying and reshaping them.
+
+Records are dict subclasses, so .get(), json/orjson and FastAPI encoding work
+unchanged; product lists are plain tuples of records.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class ProductRecord(dict):
+    """
+    A product dict that can't be changed after construction.
+
+    Example:
+        record = freeze_product({'id': 'OLJCESPC7Z', 'features': {'color': 'black'}})
+        record['features']         # ({'key': 'color', 'value': 'black'},)
+        dict(record, price='$9')   # a modified, mutable copy
+    """
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("ProductRecord is immutable - build a new one with dict(record, ...)")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # dict's default pickling replays __setitem__, which is blocked
+        return (ProductRecord, (dict(self),))
+
+
+def normalize_features(features: Any) -> Tuple[ProductRecord, ...]:
+    """
+    Features in the component format
+    Old format: {"color": "red", "size": "M"}
+    New format: ({"key": "color", "value": "red"}, {"key": "size", "value": "M"})
+    """
+    if isinstance(features, dict):
+        return tuple(ProductRecord(key=key, value=value) for key, value in features.items())
+    if isinstance(features, (list, tuple)):
+        return tuple(ProductRecord(f) if isinstance(f, dict) and not isinstance(f, ProductRecord) else f
+                     for f in features)
+    # Missing, or neither dict nor list
+    return ()
+
+
+def freeze_product(product: Optional[Dict[str, Any]]) -> ProductRecord:
+    """Normalized, immutable record for a product (records are returned as-is)"""
+    if isinstance(product, ProductRecord):
+        return product
+    record = dict(product or {})
+    record['features'] = normalize_features(record.get('features'))
+    return ProductRecord(record)
+
+
+def freeze_products(products: Optional[Iterable[Dict[str, Any]]]) -> Tuple[ProductRecord, ...]:
+    """Tuple of records; an already frozen tuple is returned without copying"""
+    if isinstance(products, tuple) and all(type(p) is ProductRecord for p in products):
+        return products
+    return tuple(freeze_product(p) for p in products or ())
@@ -0,0 +1,248 @@
+"""
+Offline evaluation and latency harness for product recommenders.
+
+Replays a session log (or a synthetic one generated from a fixture catalog)
+through each recommender in-process, with no network access, and reports:
+- hit-rate@k: share of requests whose purchased product is in the top k
+- coverage: share of the catalog that was recommended at least once
+- p50/p99 latency per request
+
+Usage:
+    python recommender_eval.py                      # synthetic log, default fixture catalog
+    python recommender_eval.py --sessions 2000 --catalog-size 90 --k 5
+    python recommender_eval.py --write-log log.jsonl
+    python recommender_eval.py --log log.jsonl      # replay a saved log
+
+Log format (JSON lines, one request per line):
+    {"ts": 1700000000.0, "preferences": "sunglasses under $30",
+     "current_product_id": null, "purchased_id": "OLJCESPC7Z",
+     "events": [{"product_id": "66VCHSJNUP", "event": "view"}]}
+"""
+
+import argparse
+import json
+import random
+import sys
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agents.product_recommendation_agent.agent import get_product_category, recommend_from_catalog
+from popularity import PopularityTracker
+
+# Cymbal Shops catalog snapshot used as the offline fixture
+FIXTURE_CATALOG = [
+    {"id": "OLJCESPC7Z", "name": "Sunglasses", "price": "$19.99"},
+    {"id": "66VCHSJNUP", "name": "Tank Top", "price": "$18.99"},
+    {"id": "1YMWWN1N4O", "name": "Watch", "price": "$109.99"},
+    {"id": "L9ECAV7KIM", "name": "Loafers", "price": "$89.99"},
+    {"id": "2ZYFJ3GM2N", "name": "Hairdryer", "price": "$24.99"},
+    {"id": "0PUK6V6EV0", "name": "Candle Holder", "price": "$18.99"},
+    {"id": "LS4PSXUNUM", "name": "Salt & Pepper Shakers", "price": "$18.49"},
+    {"id": "9SIQT8TOJO", "name": "Bamboo Glass Jar", "price": "$5.49"},
+    {"id": "6E92ZMYYFZ", "name": "Mug", "price": "$8.99"},
+]
+
+VARIANT_PREFIXES = ["Classic", "Retro", "Premium", "Everyday", "Vintage", "Modern", "Travel", "Deluxe", "Eco", "Limited"]
+
+QUERY_TEMPLATES = [
+    "{keyword}",
+    "show me {keyword}",
+    "I'm looking for a {keyword}",
+    "{keyword} under ${budget}",
+    "gift ideas",
+    "something nice for the weekend",
+]
+
+# A recommender takes (catalog, request, tracker) and returns product ids, best first
+Recommender = Callable[[List[Dict[str, Any]], Dict[str, Any], PopularityTracker], List[str]]
+
+
+def build_catalog(size: int = len(FIXTURE_CATALOG), seed: int = 7) -> List[Dict[str, Any]]:
+    """Fixture catalog, padded with priced variants of the base products up to `size`"""
+    rng = random.Random(seed)
+    base = [dict(p) for p in FIXTURE_CATALOG]
+    catalog = list(base)
+    n = 0
+    while len(catalog) < size:
+        template = base[n % len(base)]
+        prefix = VARIANT_PREFIXES[(n // len(base)) % len(VARIANT_PREFIXES)]
+        price = float(template["price"].replace("$", "")) * rng.uniform(0.7, 1.3)
+        catalog.append({
+            "id": f"{template['id']}-{n}",
+            "name": f"{prefix} {template['name']}",
+            "price": f"${price:.2f}",
+        })
+        n += 1
+
+    for product in catalog:
+        details = get_product_category(product["name"])
+        product["category"] = details["category"]
+        product["price_range"] = details["price_range"]
+        product["url"] = f"https://cymbal-shops.retail.cymbal.dev/product/{product['id']}"
+    return catalog
+
+
+def generate_log(
+    catalog: List[Dict[str, Any]],
+    sessions: int = 500,
+    seed: int = 7,
+    start_ts: float = 1_700_000_000.0
+) -> List[Dict[str, Any]]:
+    """
+    Synthetic request log. Product demand is skewed (a few items sell a lot),
+    each session browses a little before asking for recommendations, and the
+    request's ground truth is the product the session goes on to buy.
+    """
+    rng = random.Random(seed)
+    # Zipf-like demand over a shuffled catalog
+    ranked = list(catalog)
+    rng.shuffle(ranked)
+    weights = [1.0 / (rank + 1) for rank in range(len(ranked))]
+
+    log = []
+    ts = start_ts
+    for _ in range(sessions):
+        ts += rng.uniform(5, 120)
+        target = rng.choices(ranked, weights=weights)[0]
+        same_category = [p for p in catalog if p["category"] == target["category"] and p["id"] != target["id"]]
+
+        events = [{"product_id": p["id"], "event": "view"} for p in rng.sample(same_category, min(2, len(same_category)))]
+        current = rng.choice(same_category)["id"] if same_category and rng.random() < 0.3 else None
+
+        price = float(target["price"].replace("$", ""))
+        keyword = target["name"].split()[-1].lower()
+        query = rng.choice(QUERY_TEMPLATES).format(keyword=keyword, budget=int(price * 1.2) + 1)
+
+        log.append({
+            "ts": ts,
+            "preferences": query,
+            "current_product_id": current,
+            "purchased_id": target["id"],
+            "events": events,
+        })
+    return log
+
+
+def load_log(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_log(log: List[Dict[str, Any]], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for entry in log:
+            f.write(json.dumps(entry) + "\n")
+
+
+def _recommend_products(catalog, request, tracker) -> List[str]:
+    result = recommend_from_catalog(
+        catalog,
+        request["preferences"],
+        request.get("current_product_id"),
+        tracker=tracker
+    )
+    return [r["id"] for r in result.get("recommendations", [])]
+
+
+def _most_popular(catalog, request, tracker) -> List[str]:
+    return list(tracker.top_ids())
+
+
+RECOMMENDERS: Dict[str, Recommender] = {
+    "recommend_products": _recommend_products,
+    "most_popular": _most_popular,
+}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def evaluate(
+    catalog: List[Dict[str, Any]],
+    log: List[Dict[str, Any]],
+    recommenders: Optional[Dict[str, Recommender]] = None,
+    k: int = 5
+) -> Dict[str, Dict[str, float]]:
+    """
+    Replay `log` through each recommender. Every recommender gets its own
+    popularity tracker, fed only with events that happened before the request.
+    """
+    recommenders = recommenders or RECOMMENDERS
+    report = {}
+
+    for name, recommend in recommenders.items():
+        clock = [log[0]["ts"] if log else time.time()]
+        tracker = PopularityTracker(clock=lambda: clock[0])
+        latencies = []
+        hits = 0
+        recommended = set()
+
+        for request in log:
+            clock[0] = request["ts"]
+            for event in request.get("events", []):
+                tracker.record(event["product_id"], event["event"])
+
+            started = time.perf_counter()
+            ids = recommend(catalog, request, tracker)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+
+            top = ids[:k]
+            recommended.update(top)
+            if request.get("purchased_id") in top:
+                hits += 1
+
+            # The purchase becomes visible to later requests only
+            tracker.record(request.get("purchased_id"), "purchase")
+
+        latencies.sort()
+        report[name] = {
+            "requests": len(log),
+            f"hit_rate@{k}": hits / len(log) if log else 0.0,
+            "coverage": len(recommended) / len(catalog) if catalog else 0.0,
+            "p50_ms": _percentile(latencies, 50),
+            "p99_ms": _percentile(latencies, 99),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, float]]):
+    if not report:
+        return
+    columns = list(next(iter(report.values())).keys())
+    print(f"{'recommender':<22}" + "".join(f"{c:>14}" for c in columns))
+    for name, metrics in report.items():
+        cells = []
+        for column in columns:
+            value = metrics[column]
+            cells.append(f"{value:>14d}" if isinstance(value, int) else f"{value:>14.4f}")
+        print(f"{name:<22}" + "".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline recommender evaluation")
+    parser.add_argument("--log", help="Replay this JSONL log instead of generating one")
+    parser.add_argument("--write-log", help="Write the generated log to this path")
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--catalog-size", type=int, default=len(FIXTURE_CATALOG))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.catalog_size, args.seed)
+    log = load_log(args.log) if args.log else generate_log(catalog, args.sessions, args.seed)
+    if args.write_log:
+        write_log(log, args.write_log)
+
+    print(f"Catalog: {len(catalog)} products, log: {len(log)} requests, k={args.k}")
+    print_report(evaluate(catalog, log, k=args.k))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+A tiny Redis-protocol server for local development and checks.
+
+Implements just what RedisSessionStore uses (PING, AUTH, SELECT, GET, GETEX,
+GETDEL, SET with EX/PX, DEL, EXISTS, EXPIRE, TTL, SCAN, DBSIZE, FLUSHDB, and
+WATCH/UNWATCH/MULTI/EXEC/DISCARD transactions) on one in-process dict, with
+lazy expiry. It is not Redis: no persistence, one database, no eviction, and
+a key expiring doesn't abort transactions watching it.
+
+    python resp_standin.py --port 6379
+    SESSION_STORE_URL=redis://localhost:6379/0 python simple_server.py
+
+Or in-process:
+    with RespStandIn() as server:
+        store = RedisSessionStore(server.url, namespace='sessions')
+"""
+
+import argparse
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class _Connection:
+    """Per-client transaction state"""
+
+    def __init__(self):
+        # key -> version when WATCHed
+        self.watched: Dict[bytes, int] = {}
+        # commands queued since MULTI (None: not in a transaction)
+        self.queue: Optional[List[Tuple[str, Callable, List[bytes]]]] = None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        # Replies to pipelined commands are written one by one; don't let
+        # Nagle hold them back waiting for the client's delayed ACK
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        connection = _Connection()
+        try:
+            while True:
+                try:
+                    args = self._read_command()
+                except (ConnectionError, ValueError):
+                    return
+                if args is None:
+                    return
+                self.wfile.write(self.server.standin.execute(args, connection))
+        finally:
+            self.server.standin.forget(connection)
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Inline command (e.g. typed into telnet)
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def _array(items: List[bytes]) -> bytes:
+    return b'*%d\r\n' % len(items) + b''.join(items)
+
+
+class RespStandIn:
+    """In-process Redis-protocol server on localhost (port 0 picks a free one)"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        # key -> number of the last write to it, for WATCH
+        self._versions: Dict[bytes, int] = {}
+        self._writes = 0
+        self._watchers = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.standin = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "RespStandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "RespStandIn":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- commands ---
+
+    def _live(self, key: bytes, now: float) -> Optional[Tuple[bytes, Optional[float]]]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    @staticmethod
+    def _expiry(options: List[bytes], now: float) -> Optional[float]:
+        """Absolute expiry from trailing EX/PX options (None: no expiry)"""
+        options = [o.upper() for o in options]
+        if b'EX' in options:
+            return now + int(options[options.index(b'EX') + 1])
+        if b'PX' in options:
+            return now + int(options[options.index(b'PX') + 1]) / 1000
+        return None
+
+    def _written(self, key: bytes):
+        self._writes += 1
+        if self._watchers or key in self._versions:
+            self._versions[key] = self._writes
+
+    def execute(self, args: List[bytes], connection: Optional[_Connection] = None) -> bytes:
+        if not args:
+            return b'-ERR empty command\r\n'
+        name = args[0].upper().decode('ascii', 'replace')
+        if connection is not None and name in ('WATCH', 'UNWATCH', 'MULTI', 'EXEC', 'DISCARD'):
+            with self._lock:
+                return self._transaction(name, args[1:], connection)
+        handler = getattr(self, f'_cmd_{name.lower()}', None)
+        if handler is None:
+            return f"-ERR unknown command '{name}'\r\n".encode()
+        if connection is not None and connection.queue is not None:
+            connection.queue.append((name, handler, args[1:]))
+            return b'+QUEUED\r\n'
+        with self._lock:
+            return self._run(name, handler, args[1:])
+
+    def _run(self, name: str, handler, args: List[bytes]) -> bytes:
+        try:
+            return handler(args, time.monotonic())
+        except (IndexError, ValueError):
+            return f"-ERR wrong arguments for '{name}'\r\n".encode()
+
+    def _transaction(self, name: str, args: List[bytes], connection: _Connection) -> bytes:
+        if name == 'WATCH':
+            if connection.queue is not None:
+                return b'-ERR WATCH inside MULTI is not allowed\r\n'
+            if not connection.watched:
+                self._watchers += 1
+            for key in args:
+                connection.watched.setdefault(key, self._versions.get(key, 0))
+            return b'+OK\r\n'
+        if name == 'MULTI':
+            if connection.queue is not None:
+                return b'-ERR MULTI calls can not be nested\r\n'
+            connection.queue = []
+            return b'+OK\r\n'
+        if name in ('EXEC', 'DISCARD') and connection.queue is None:
+            return f"-ERR {name} without MULTI\r\n".encode()
+        queue, connection.queue = connection.queue, None
+        aborted = any(self._versions.get(key, 0) != version for key, version in connection.watched.items())
+        self._unwatch(connection)
+        if name != 'EXEC':
+            return b'+OK\r\n'
+        if aborted:
+            return b'*-1\r\n'
+        return _array([self._run(*command) for command in queue])
+
+    def _unwatch(self, connection: _Connection):
+        if connection.watched:
+            connection.watched = {}
+            self._watchers -= 1
+            if not self._watchers:
+                # Versions only matter while someone is watching
+                self._versions.clear()
+
+    def forget(self, connection: _Connection):
+        """A client disconnected: drop its watches"""
+        with self._lock:
+            self._unwatch(connection)
+
+    def _cmd_ping(self, args, now):
+        return b'+PONG\r\n'
+
+    def _cmd_auth(self, args, now):
+        return b'+OK\r\n'
+
+    def _cmd_select(self, args, now):
+        return b'+OK\r\n'
+
+    def _cmd_get(self, args, now):
+        entry = self._live(args[0], now)
+        return _bulk(entry and entry[0])
+
+    def _cmd_getex(self, args, now):
+        entry = self._live(args[0], now)
+        if entry is None:
+            return _bulk(None)
+        expires_at = self._expiry(args[1:], now)
+        if expires_at is not None:
+            self._data[args[0]] = (entry[0], expires_at)
+            self._written(args[0])
+        return _bulk(entry[0])
+
+    def _cmd_getdel(self, args, now):
+        entry = self._live(args[0], now)
+        if entry is None:
+            return _bulk(None)
+        del self._data[args[0]]
+        self._written(args[0])
+        return _bulk(entry[0])
+
+    def _cmd_set(self, args, now):
+        self._data[args[0]] = (args[1], self._expiry(args[2:], now))
+        self._written(args[0])
+        return b'+OK\r\n'
+
+    def _cmd_del(self, args, now):
+        removed = 0
+        for key in args:
+            if self._live(key, now) is not None:
+                del self._data[key]
+                self._written(key)
+                removed += 1
+        return b':%d\r\n' % removed
+
+    def _cmd_exists(self, args, now):
+        return b':%d\r\n' % sum(self._live(key, now) is not None for key in args)
+
+    def _cmd_expire(self, args, now):
+        entry = self._live(args[0], now)
+        if entry is None:
+            return b':0\r\n'
+        self._data[args[0]] = (entry[0], now + int(args[1]))
+        self._written(args[0])
+        return b':1\r\n'
+
+    def _cmd_ttl(self, args, now):
+        entry = self._live(args[0], now)
+        if entry is None:
+            return b':-2\r\n'
+        return b':-1\r\n' if entry[1] is None else b':%d\r\n' % round(entry[1] - now)
+
+    def _cmd_scan(self, args, now):
+        # One round: cursor 0 in, cursor 0 out
+        options = [a.upper() for a in args]
+        pattern = args[options.index(b'MATCH') + 1].decode() if b'MATCH' in options else '*'
+        keys = [key for key in list(self._data)
+                if self._live(key, now) is not None and fnmatch.fnmatchcase(key.decode(), pattern)]
+        return _array([_bulk(b'0'), _array([_bulk(key) for key in keys])])
+
+    def _cmd_dbsize(self, args, now):
+        return b':%d\r\n' % sum(self._live(key, now) is not None for key in list(self._data))
+
+    def _cmd_flushdb(self, args, now):
+        for key in self._data:
+            self._written(key)
+        self._data.clear()
+        return b'+OK\r\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Redis-protocol stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = RespStandIn(args.host, args.port)
+    print(f"Serving {server.url} (Ctrl+C to stop)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
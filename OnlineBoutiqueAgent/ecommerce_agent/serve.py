@@ -0,0 +1,92 @@
+"""
+Launcher for simple_server with one or more uvicorn workers.
+
+Workers are separate processes, so anything a request leaves behind must
+live in a shared backend for the next request (which may land on another
+worker) to see it:
+
+    chat sessions, guest carts/orders  SESSION_STORE_URL (Redis protocol)
+    accounts, carts, orders            MongoDB (MONGODB_URI)
+    popularity counters                MongoDB (increments merged server-side)
+
+Decision/props caches, price history and deals are derived from requests
+and catalog scrapes, so each worker keeps its own copy.
+
+More than one worker without SESSION_STORE_URL is refused (guests would
+lose their carts between requests) unless --allow-local-state is given.
+
+    python serve.py                                   # 1 worker, port $PORT or 8000
+    SESSION_STORE_URL=redis://localhost:6379/0 python serve.py --workers 4
+    python serve.py --workers 4 --standin             # plus a local stand-in store
+
+Load test: python load_test.py --workers 1 2 4
+"""
+
+import argparse
+import os
+import socket
+import sys
+
+DEFAULT_PORT = 8000
+
+
+def _nodelay_listener(bind_socket):
+    """
+    Wrap uvicorn's Config.bind_socket so the shared listening socket has
+    TCP_NODELAY, which accepted connections inherit
+
+    With --workers > 1 uvicorn binds the socket itself (proto 0), and asyncio
+    only sets TCP_NODELAY on sockets it recognises as TCP. Keep-alive
+    responses written in two parts then wait ~40ms for a delayed ACK.
+    """
+    def bind(config):
+        sock = bind_socket(config)
+        if sock.family in (socket.AF_INET, socket.AF_INET6):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    return bind
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run simple_server under uvicorn")
+    parser.add_argument("--app", default="simple_server:app", help="ASGI app import string")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", DEFAULT_PORT)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 1)),
+                        help="worker processes (default: $WEB_CONCURRENCY or 1)")
+    parser.add_argument("--standin", action="store_true",
+                        help="start a local Redis-protocol stand-in and share sessions through it")
+    parser.add_argument("--allow-local-state", action="store_true",
+                        help="run several workers even though sessions stay per-worker")
+    args = parser.parse_args(argv)
+
+    # Workers import the app themselves and need this directory on their path
+    here = os.path.dirname(os.path.abspath(__file__))
+    os.environ["PYTHONPATH"] = os.pathsep.join(p for p in (here, os.getenv("PYTHONPATH")) if p)
+    sys.path.insert(0, here)
+
+    standin = None
+    if args.standin:
+        from resp_standin import RespStandIn
+        standin = RespStandIn().start()
+        os.environ["SESSION_STORE_URL"] = standin.url
+        print(f"🗄️  Session store stand-in at {standin.url} (in-process, not persistent)")
+
+    if args.workers > 1 and not os.getenv("SESSION_STORE_URL") and not args.allow_local_state:
+        parser.error("--workers > 1 needs SESSION_STORE_URL (or --standin for a local run); "
+                     "pass --allow-local-state to run with per-worker sessions anyway")
+    # Seen by simple_server in every worker
+    os.environ["WEB_CONCURRENCY"] = str(args.workers)
+
+    import uvicorn
+    uvicorn.Config.bind_socket = _nodelay_listener(uvicorn.Config.bind_socket)
+    try:
+        uvicorn.run(args.app, host=args.host, port=args.port, workers=args.workers,
+                    proxy_headers=True, log_level=os.getenv("LOG_LEVEL", "info"))
+    finally:
+        if standin is not None:
+            standin.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Per-session lock tables.
+
+Requests for one session (cart changes, chat turns) read a session's state,
+change it and write it back; two of them interleaving loses one change.
+Requests for different sessions must never wait on each other.
+
+A lock object per session would have to be created for every guest and
+cleaned up again. Instead a table holds a fixed number of locks and a key
+always uses the lock at hash(key) % shards (lock striping). Two sessions
+share a lock only when they land on the same shard, which costs a short
+wait now and then, never correctness.
+
+    SessionLocks        threading locks, for short critical sections on any
+                        thread (SessionStore.update uses one per store)
+    AsyncSessionLocks   asyncio locks, for a whole chat turn in a request
+                        handler; held across awaits without blocking the
+                        event loop
+
+Locks only serialize within one process. Across workers,
+RedisSessionStore.update() is made atomic by the server (WATCH/MULTI/EXEC).
+
+    turns = AsyncSessionLocks()
+    async with turns(session_id):
+        ...
+"""
+
+import asyncio
+import threading
+from typing import List
+
+DEFAULT_SHARDS = 256
+
+
+class SessionLocks:
+    """Fixed table of threading locks, one picked per key"""
+
+    def __init__(self, shards: int = DEFAULT_SHARDS):
+        self._locks: List[threading.Lock] = [threading.Lock() for _ in range(shards)]
+
+    def __call__(self, key: str) -> threading.Lock:
+        """The lock for `key` (use as a context manager)"""
+        return self._locks[hash(key) % len(self._locks)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class AsyncSessionLocks:
+    """
+    Fixed table of asyncio locks, one picked per key
+
+    Locks bind to the event loop that first waits on them, so use a table
+    from one loop (one per uvicorn worker).
+    """
+
+    def __init__(self, shards: int = DEFAULT_SHARDS):
+        self._locks: List[asyncio.Lock] = [asyncio.Lock() for _ in range(shards)]
+
+    def __call__(self, key: str) -> asyncio.Lock:
+        """The lock for `key` (use with `async with`)"""
+        return self._locks[hash(key) % len(self._locks)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,277 @@
+"""
+Append-only snapshots of in-memory session stores, for warm restarts.
+
+Without MongoDB or SESSION_STORE_URL, carts, orders and chat sessions live
+only in InMemorySessionStore. A SessionSnapshotter appends what changed in
+its attached stores to one log file every few seconds, and rewrites the log
+with just the live entries (compaction) once it holds COMPACT_RATIO times
+more records than that.
+
+On startup only an index is built: one pass over the log that splits each
+line's header and remembers where the latest value of every key is, without
+decoding any values. A key is decoded the first time it's read, so startup
+stays fast however many sessions were saved and nothing is loaded for
+sessions that never come back.
+
+Log lines are tab-separated, with JSON-encoded keys and values (neither can
+contain a raw tab or newline):
+
+    S <namespace> <key> <expires_at> <value>   set
+    T <namespace> <key> <expires_at>           touched (read): new expiry only
+    D <namespace> <key>                        deleted or evicted
+    C <namespace>                              namespace cleared
+
+expires_at is unix time (0: never). A torn last line from a crash is
+dropped on open.
+
+    snapshots = SessionSnapshotter('/var/lib/shopsage/sessions.log')
+    snapshots.attach(carts)
+    snapshots.start_periodic_snapshot()
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_SNAPSHOT_INTERVAL_SECONDS = 5
+# Compact once the log holds this many records per live entry...
+COMPACT_RATIO = 2.0
+# ...and at least this many records in total
+MIN_COMPACT_RECORDS = 1000
+
+
+def _encode_key(key: str) -> bytes:
+    return json.dumps(key).encode('utf-8')
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def _line(op: bytes, namespace: bytes, key: bytes = b'', expires_at: float = 0.0, value: bytes = b'') -> bytes:
+    if op == b'C':
+        return b'C\t%s\n' % namespace
+    if op == b'D':
+        return b'D\t%s\t%s\n' % (namespace, key)
+    if op == b'T':
+        return b'T\t%s\t%s\t%d\n' % (namespace, key, expires_at)
+    return b'S\t%s\t%s\t%d\t%s\n' % (namespace, key, expires_at, value)
+
+
+class SessionSnapshotter:
+    """
+    Snapshot log shared by several InMemorySessionStores (one per namespace)
+
+    The index maps namespace → encoded key → [offset, length, expires_at] of
+    the key's latest S line; it always mirrors the log file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        compact_ratio: float = COMPACT_RATIO,
+        min_compact_records: int = MIN_COMPACT_RECORDS,
+        clock: Callable[[], float] = time.time
+    ):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact_records = min_compact_records
+        self.clock = clock
+        self._stores: List[Any] = []
+        self._index: Dict[bytes, Dict[bytes, List[float]]] = {}
+        self._records = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._flush_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.snapshots = 0
+        self.compactions = 0
+        self.lazy_loads = 0
+        self._open()
+
+    # ------------------------------------------------------------------
+    # Log file
+    # ------------------------------------------------------------------
+
+    def _open(self):
+        """Build the index from the log (headers only) and open it for appending"""
+        started = time.perf_counter()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        good_size = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # torn write
+                    self._apply(line, offset)
+                    offset += len(line)
+                good_size = offset
+            os.truncate(self.path, good_size)
+        self._file = open(self.path, 'a+b')
+        self.open_seconds = time.perf_counter() - started
+
+    def _apply(self, line: bytes, offset: int):
+        """Update the index for one log line at `offset`"""
+        self._records += 1
+        op = line[:1]
+        if op == b'S':
+            _, namespace, key, expires_at, _ = line.split(b'\t', 4)
+            self._index.setdefault(namespace, {})[key] = [offset, len(line), int(expires_at)]
+        elif op == b'T':
+            _, namespace, key, expires_at = line[:-1].split(b'\t', 3)
+            entry = self._index.get(namespace, {}).get(key)
+            if entry is not None:
+                entry[2] = int(expires_at)
+        elif op == b'D':
+            _, namespace, key = line[:-1].split(b'\t', 2)
+            self._index.get(namespace, {}).pop(key, None)
+        elif op == b'C':
+            self._index.pop(line[2:-1], None)
+
+    def _append(self, lines: List[bytes]):
+        offset = self._file.seek(0, os.SEEK_END)
+        self._file.write(b''.join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        for line in lines:
+            self._apply(line, offset)
+            offset += len(line)
+
+    def _read_value(self, entry: List[float]) -> bytes:
+        """Raw JSON value of an S line"""
+        line = os.pread(self._file.fileno(), int(entry[1]), int(entry[0]))
+        return line.split(b'\t', 4)[4][:-1]
+
+    # ------------------------------------------------------------------
+    # Used by InMemorySessionStore
+    # ------------------------------------------------------------------
+
+    def load(self, namespace: str, key: str) -> Optional[Tuple[Any, float]]:
+        """Saved (value, expires_at) for a key, or None when absent or expired"""
+        with self._lock:
+            entry = self._index.get(namespace.encode(), {}).get(_encode_key(key))
+            if entry is None or (entry[2] and entry[2] <= self.clock()):
+                return None
+            data = self._read_value(entry)
+            self.lazy_loads += 1
+        return json.loads(data), entry[2]
+
+    def contains(self, namespace: str, key: str) -> bool:
+        with self._lock:
+            entry = self._index.get(namespace.encode(), {}).get(_encode_key(key))
+            return entry is not None and not (entry[2] and entry[2] <= self.clock())
+
+    def clear(self, namespace: str):
+        """Record that a namespace was cleared (written straight away)"""
+        with self._lock:
+            self._append([_line(b'C', namespace.encode())])
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def attach(self, store):
+        """Snapshot `store` from now on and let it read back saved entries"""
+        self._stores.append(store)
+        store.attach_snapshot(self)
+
+    def snapshot(self) -> int:
+        """Append every attached store's changes; returns the number of records"""
+        lines = []
+        for store in self._stores:
+            namespace = store.namespace.encode()
+            for op, key, value, expires_at in store.drain_changes(self.clock()):
+                if op == 'S':
+                    try:
+                        value = _dumps(value)
+                    except (RuntimeError, ValueError):
+                        # Changed by a request mid-encode - take it next time
+                        store.mark_changed(key)
+                        continue
+                lines.append(_line(op.encode(), namespace, _encode_key(key), expires_at, value))
+        with self._lock:
+            if lines:
+                self._append(lines)
+            self.snapshots += 1
+            live = sum(len(keys) for keys in self._index.values())
+            needs_compaction = self._records > max(self.min_compact_records, self.compact_ratio * live)
+        if needs_compaction:
+            self.compact()
+        return len(lines)
+
+    def compact(self):
+        """Rewrite the log with only the latest value of each live key"""
+        now = self.clock()
+        # Entries in memory win; changes made after this point are appended later
+        live = {
+            store.namespace.encode(): {
+                _encode_key(key): (_dumps(value), expires_at)
+                for key, value, expires_at in store.live_items(now)
+            }
+            for store in self._stores
+        }
+        with self._lock:
+            temp_path = self.path + '.compact'
+            lines = []
+            for namespace, keys in self._index.items():
+                in_memory = live.get(namespace, {})
+                for key, entry in keys.items():
+                    if key in in_memory or (entry[2] and entry[2] <= now):
+                        continue
+                    lines.append(_line(b'S', namespace, key, entry[2], self._read_value(entry)))
+            for namespace, items in live.items():
+                for key, (value, expires_at) in items.items():
+                    lines.append(_line(b'S', namespace, key, expires_at, value))
+            with open(temp_path, 'wb') as f:
+                f.write(b''.join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._file.close()
+            self._file = open(self.path, 'a+b')
+            self._index = {}
+            self._records = 0
+            offset = 0
+            for line in lines:
+                self._apply(line, offset)
+                offset += len(line)
+            self.compactions += 1
+
+    def start_periodic_snapshot(self, interval_seconds: float = DEFAULT_SNAPSHOT_INTERVAL_SECONDS):
+        """Snapshot in a daemon thread every `interval_seconds`"""
+        if self._flush_thread is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.snapshot()
+                except Exception as e:
+                    print(f"⚠️ Session snapshot failed: {e}")
+
+        self._flush_thread = threading.Thread(target=run, name='session-snapshot', daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        """Stop the periodic thread and write a final snapshot"""
+        self._stop.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout=5)
+            self._flush_thread = None
+        self.snapshot()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'path': self.path,
+                'saved_entries': sum(len(keys) for keys in self._index.values()),
+                'log_records': self._records,
+                'snapshots': self.snapshots,
+                'compactions': self.compactions,
+                'lazy_loads': self.lazy_loads,
+                'open_seconds': round(self.open_seconds, 4)
+            }
@@ -0,0 +1,586 @@
+"""
+Session state storage.
+
+Chat sessions, fallback carts and order history used to live in plain
+module-level dicts that grew for as long as the process ran. They now go
+through a SessionStore, one store per namespace ('sessions', 'carts', ...):
+
+    InMemorySessionStore  bounded LRU with a sliding TTL (the default)
+    RedisSessionStore     any server speaking the Redis protocol (RESP);
+                          values are JSON, expiry is the server's
+
+The backend is picked by SESSION_STORE_URL (unset: in memory,
+redis://[:password@]host:port/db: Redis). SESSION_TTL_SECONDS and
+SESSION_MAX_ENTRIES bound the in-memory store; for Redis, bound memory with
+the server's own maxmemory / maxmemory-policy allkeys-lru.
+
+Values are read-modify-write: get() a value, change it, then set() it back.
+The in-memory store hands out the stored object itself, but an external
+store only sees what is set(). When concurrent requests may change the same
+key, use update() instead: it runs the change under the key's lock (see
+session_locks.py), and on Redis as a WATCH/MULTI/EXEC transaction that is
+retried if another worker wrote the key in between.
+
+Every Redis call is a blocking round trip. Async endpoints go through an
+AsyncSessionStore, which runs them on a small thread pool so the event loop
+keeps serving other requests while one waits on the server:
+
+    carts = AsyncSessionStore(create_session_store('carts'))
+    items = await carts.update(session_id, add, list)
+
+Conformance checks (test_session_store.py, against the local stand-in in
+resp_standin.py, or a real server):
+    python -m pytest test_session_store.py
+    python test_session_store.py --url redis://localhost:6379/0
+"""
+
+import asyncio
+import functools
+import json
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+try:
+    from ecommerce_agent.session_locks import SessionLocks
+except ImportError:
+    from session_locks import SessionLocks
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_SOCKET_TIMEOUT_SECONDS = 2.0
+# Keys per SCAN round trip when counting or clearing a namespace
+SCAN_COUNT = 500
+# Optimistic transaction attempts per update() before giving up
+MAX_UPDATE_ATTEMPTS = 50
+# Threads running shared-store calls for async endpoints (see AsyncSessionStore)
+SESSION_STORE_EXECUTOR_THREADS = int(os.getenv('SESSION_STORE_EXECUTOR_THREADS', '16'))
+
+_MISSING = object()
+
+
+class SessionStoreError(RuntimeError):
+    """The store rejected a command (a Redis error reply, or a bad URL)"""
+
+
+class SessionStore(ABC):
+    """
+    Namespaced key → JSON-like value store
+
+    Example:
+        carts = create_session_store('carts')
+        items = carts.get(session_id) or []
+        items.append(item)
+        carts.set(session_id, items)
+    """
+
+    namespace: str = ''
+    # True when every worker process (and host) sees the same data
+    shared: bool = False
+    locks: SessionLocks
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        """Stored value, or default when missing or expired (a hit refreshes the TTL)"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Remove a key; True if it was there"""
+
+    @abstractmethod
+    def __contains__(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every key in this namespace"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+    def setdefault(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Stored value, or a new factory() value stored under key"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def update(self, key: str, mutate: Callable[[Any], Any], default: Callable[[], Any] = lambda: None) -> Any:
+        """
+        Atomically replace a value with mutate(value) and return the new value
+
+        mutate gets the stored value (or default() when missing), may change
+        it in place, and must return the value to store. It can run more than
+        once on a shared store, so it should only compute, not call out.
+
+        Example:
+            carts.update(session_id, lambda items: items + [item], list)
+        """
+        with self.locks(key):
+            value = self.get(key, _MISSING)
+            value = mutate(default() if value is _MISSING else value)
+            self.set(key, value)
+            return value
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        """Atomically remove a key and return its value (default when missing)"""
+        with self.locks(key):
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self.delete(key)
+            return value
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Thread-safe LRU with a sliding TTL
+
+    Every read or write pushes an entry's expiry out to now + ttl_seconds and
+    makes it the most recently used. With one TTL for the whole store, LRU
+    order is also expiry order, so expired entries are always at the front
+    and are dropped there on writes; reads drop their own expired entry.
+
+    With a SessionSnapshotter attached (session_snapshot.py), changed keys are
+    remembered for the next snapshot and a key missing from memory is looked
+    up in the saved log before it counts as missing.
+    """
+
+    def __init__(
+        self,
+        namespace: str = '',
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        # key -> (expires_at, value)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.locks = SessionLocks()
+        self.evictions = 0
+        self.expirations = 0
+        self._snapshot = None
+        # key -> 'S' (set), 'T' (read, expiry moved) or 'D' (gone) since the last snapshot
+        self._changed: Dict[str, str] = {}
+
+    def _expires_at(self, now: float) -> float:
+        return now + self.ttl_seconds if self.ttl_seconds else float('inf')
+
+    def _purge_expired(self, now: float):
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at > now:
+                return
+            del self._entries[key]
+            self.expirations += 1
+
+    def _load_saved(self, key: str) -> Any:
+        """Value from the snapshot log, installed in memory, or _MISSING"""
+        if self._snapshot is None or self._changed.get(key) == 'D':
+            return _MISSING
+        saved = self._snapshot.load(self.namespace, key)
+        if saved is None:
+            return _MISSING
+        self._entries[key] = (self._expires_at(self.clock()), saved[0])
+        self._changed.setdefault(key, 'T')
+        return saved[0]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                value = self._load_saved(key)
+                return default if value is _MISSING else value
+            now = self.clock()
+            if entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                return default
+            self._entries[key] = (self._expires_at(now), entry[1])
+            self._entries.move_to_end(key)
+            if self._snapshot is not None:
+                self._changed.setdefault(key, 'T')
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            now = self.clock()
+            self._entries[key] = (self._expires_at(now), value)
+            self._entries.move_to_end(key)
+            self._purge_expired(now)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                if self._snapshot is not None:
+                    self._changed[evicted] = 'D'
+            if self._snapshot is not None:
+                self._changed[key] = 'S'
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            if self._snapshot is not None:
+                removed = removed or (self._changed.get(key) != 'D' and self._snapshot.contains(self.namespace, key))
+                self._changed[key] = 'D'
+            return removed
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return (self._snapshot is not None and self._changed.get(key) != 'D'
+                        and self._snapshot.contains(self.namespace, key))
+            return entry[0] > self.clock()
+
+    def __len__(self) -> int:
+        """Entries in memory (saved entries not read since a restart aren't counted)"""
+        with self._lock:
+            self._purge_expired(self.clock())
+            return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._snapshot is not None:
+                self._changed.clear()
+                self._snapshot.clear(self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': 'memory',
+            'shared': False,
+            'namespace': self.namespace,
+            'size': len(self),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    # --- SessionSnapshotter hooks ---
+
+    def attach_snapshot(self, snapshot):
+        with self._lock:
+            self._snapshot = snapshot
+
+    def _wall_expiry(self, expires_at: float, now: float, wall_now: float) -> float:
+        return 0.0 if expires_at == float('inf') else wall_now + (expires_at - now)
+
+    def drain_changes(self, wall_now: float) -> List[Tuple[str, str, Any, float]]:
+        """(op, key, value, unix expiry) for every key changed since the last call"""
+        with self._lock:
+            now = self.clock()
+            changes = []
+            for key, op in self._changed.items():
+                entry = self._entries.get(key)
+                if op == 'D' or entry is None or entry[0] <= now:
+                    changes.append(('D', key, None, 0.0))
+                else:
+                    changes.append((op, key, entry[1], self._wall_expiry(entry[0], now, wall_now)))
+            self._changed = {}
+            return changes
+
+    def mark_changed(self, key: str):
+        """Take a key's value again in the next snapshot"""
+        with self._lock:
+            if key in self._entries:
+                self._changed[key] = 'S'
+
+    def live_items(self, wall_now: float) -> List[Tuple[str, Any, float]]:
+        """(key, value, unix expiry) for every unexpired entry in memory"""
+        with self._lock:
+            now = self.clock()
+            return [(key, value, self._wall_expiry(expires_at, now, wall_now))
+                    for key, (expires_at, value) in self._entries.items() if expires_at > now]
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store on a Redis-protocol server, keys prefixed with '<namespace>:'
+
+    Speaks RESP directly over one socket per store (no client library
+    needed); commands are serialized by a lock and a dropped connection is
+    reopened once per command. Reads use GETEX to slide the TTL.
+
+    update() WATCHes the key, computes the new value and writes it in a
+    MULTI/EXEC transaction, which the server discards if any client changed
+    the key after WATCH; it then tries again. Updates from this process
+    take the key's lock first, so only other workers cause retries.
+    """
+
+    shared = True
+
+    def __init__(
+        self,
+        url: str,
+        namespace: str = '',
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        timeout: float = DEFAULT_SOCKET_TIMEOUT_SECONDS
+    ):
+        parsed = urlparse(url)
+        if parsed.scheme != 'redis':
+            raise SessionStoreError(f"Unsupported session store URL: {url}")
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.namespace = namespace
+        self.prefix = f"{namespace}:" if namespace else ''
+        self.ttl_seconds = int(ttl_seconds) if ttl_seconds else None
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self.locks = SessionLocks()
+        self.update_retries = 0
+
+    # --- RESP ---
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile('rb')
+        if self.password:
+            self._roundtrip('AUTH', self.password)
+        if self.db:
+            self._roundtrip('SELECT', self.db)
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    @staticmethod
+    def _encode(args: Tuple[Any, ...]) -> bytes:
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self) -> Any:
+        line = self._reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Session store closed the connection")
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode('utf-8')
+        if kind == b'-':
+            raise SessionStoreError(body.decode('utf-8'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise SessionStoreError(f"Unexpected reply from session store: {line!r}")
+
+    def _roundtrip(self, *args: Any) -> Any:
+        self._sock.sendall(self._encode(args))
+        return self._read_reply()
+
+    def _command_locked(self, *args: Any) -> Any:
+        """One command, reconnecting once (caller holds self._lock)"""
+        for attempt in (1, 2):
+            try:
+                if self._sock is None:
+                    self._connect()
+                return self._roundtrip(*args)
+            except (OSError, ConnectionError):
+                self._disconnect()
+                if attempt == 2:
+                    raise
+
+    def _command(self, *args: Any) -> Any:
+        with self._lock:
+            return self._command_locked(*args)
+
+    # --- SessionStore ---
+
+    @staticmethod
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if self.ttl_seconds:
+            data = self._command('GETEX', self.prefix + key, 'EX', self.ttl_seconds)
+        else:
+            data = self._command('GET', self.prefix + key)
+        return default if data is None else json.loads(data)
+
+    def set(self, key: str, value: Any) -> None:
+        self._command(*self._set_args(key, value))
+
+    def delete(self, key: str) -> bool:
+        return self._command('DEL', self.prefix + key) > 0
+
+    def _set_args(self, key: str, value: Any) -> Tuple[Any, ...]:
+        if self.ttl_seconds:
+            return ('SET', self.prefix + key, self._dumps(value), 'EX', self.ttl_seconds)
+        return ('SET', self.prefix + key, self._dumps(value))
+
+    def _try_update(self, key: str, mutate: Callable[[Any], Any], default: Callable[[], Any]) -> Tuple[bool, Any]:
+        """One optimistic transaction: (committed, new value)"""
+        with self._lock:
+            # Only WATCH may reconnect: once MULTI is sent, a retry could apply twice
+            self._command_locked('WATCH', self.prefix + key)
+            try:
+                data = self._roundtrip('GET', self.prefix + key)
+                try:
+                    value = mutate(default() if data is None else json.loads(data))
+                    payload = self._encode(('MULTI',)) + self._encode(self._set_args(key, value)) + self._encode(('EXEC',))
+                except Exception:
+                    self._roundtrip('UNWATCH')
+                    raise
+                self._sock.sendall(payload)
+                self._read_reply()                # +OK
+                self._read_reply()                # +QUEUED
+                committed = self._read_reply() is not None
+            except (OSError, ConnectionError):
+                self._disconnect()
+                raise
+            return committed, value
+
+    def update(self, key: str, mutate: Callable[[Any], Any], default: Callable[[], Any] = lambda: None) -> Any:
+        with self.locks(key):
+            for _ in range(MAX_UPDATE_ATTEMPTS):
+                committed, value = self._try_update(key, mutate, default)
+                if committed:
+                    return value
+                self.update_retries += 1
+        raise SessionStoreError(f"update of {self.prefix + key} kept conflicting with other writers")
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        data = self._command('GETDEL', self.prefix + key)
+        return default if data is None else json.loads(data)
+
+    def __contains__(self, key: str) -> bool:
+        return self._command('EXISTS', self.prefix + key) > 0
+
+    def _scan(self) -> Iterator[List[bytes]]:
+        cursor = b'0'
+        while True:
+            cursor, keys = self._command('SCAN', cursor, 'MATCH', self.prefix + '*', 'COUNT', SCAN_COUNT)
+            if keys:
+                yield keys
+            if cursor in (b'0', '0'):
+                return
+
+    def __len__(self) -> int:
+        if not self.prefix:
+            return self._command('DBSIZE')
+        # SCAN may repeat a key across rounds
+        return len({key for keys in self._scan() for key in keys})
+
+    def clear(self) -> None:
+        for keys in self._scan():
+            self._command('DEL', *keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': 'redis',
+            'shared': True,
+            'namespace': self.namespace,
+            'server': f"{self.host}:{self.port}/{self.db}",
+            'ttl_seconds': self.ttl_seconds,
+            'update_retries': self.update_retries
+        }
+
+
+def create_session_store(
+    namespace: str,
+    url: Optional[str] = None,
+    ttl_seconds: Optional[float] = None,
+    max_entries: Optional[int] = None
+) -> SessionStore:
+    """
+    Store for a namespace, configured from the environment unless overridden
+    (SESSION_STORE_URL, SESSION_TTL_SECONDS, SESSION_MAX_ENTRIES)
+    """
+    url = url if url is not None else os.getenv('SESSION_STORE_URL')
+    if ttl_seconds is None:
+        ttl_seconds = float(os.getenv('SESSION_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+    if max_entries is None:
+        max_entries = int(os.getenv('SESSION_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    if url:
+        return RedisSessionStore(url, namespace=namespace, ttl_seconds=ttl_seconds)
+    return InMemorySessionStore(namespace=namespace, max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+
+store_executor = ThreadPoolExecutor(
+    max_workers=SESSION_STORE_EXECUTOR_THREADS, thread_name_prefix="session-store"
+)
+
+
+async def run_store(function: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking store call on store_executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(store_executor, functools.partial(function, *args, **kwargs))
+
+
+class AsyncSessionStore:
+    """
+    Awaitable twin of a store: every public method becomes a coroutine
+    function with the same signature
+
+    Calls on a shared store (a network round trip) run through run_store;
+    in-memory calls are plain dict work and run inline. Anything with a
+    `shared` flag can be wrapped (the cart cache is, for its version store).
+
+    Example:
+        sessions = AsyncSessionStore(create_session_store('sessions'))
+        context = await sessions.get(session_id)
+    """
+
+    def __init__(self, store: Any):
+        self._store = store
+
+    def __getattr__(self, name: str):
+        method = getattr(self._store, name)
+        if name.startswith('_') or not callable(method):
+            return method
+
+        if self._store.shared:
+            @functools.wraps(method)
+            async def call(*args, **kwargs):
+                return await run_store(method, *args, **kwargs)
+        else:
+            @functools.wraps(method)
+            async def call(*args, **kwargs):
+                return method(*args, **kwargs)
+
+        setattr(self, name, call)
+        return call
+
+    def __repr__(self) -> str:
+        return f"Async{type(self._store).__name__}"
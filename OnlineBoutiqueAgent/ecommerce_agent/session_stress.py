@@ -0,0 +1,236 @@
+"""
+Lost-update stress test for per-session state.
+
+Many writers add to the same cart at once; afterwards every quantity must
+equal the sum of what was added. Three levels:
+
+    store    threads, then processes, incrementing one cart through
+             SessionStore.update() - and, for comparison, through a plain
+             get()/set(), which is expected to lose updates
+    http     client processes POSTing /cart/add for one shared session to a
+             running server (--url) or to serve.py started with --workers N
+
+Threads on different sessions are timed against threads on one session to
+show that sessions don't wait on each other.
+
+    python session_stress.py                          # store level, memory + stand-in
+    python session_stress.py --store-url redis://localhost:6379/0
+    python session_stress.py --workers 1 4            # plus HTTP against serve.py
+    python session_stress.py --url http://localhost:8000
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from load_test import _request, _wait_ready
+from session_store import InMemorySessionStore, RedisSessionStore, SessionStore
+
+PRODUCTS = ('OLJCESPC7Z', '66VCHSJNUP', '1YMWWN1N4O')
+
+
+def _add(items: List[Dict[str, Any]], product_id: str) -> List[Dict[str, Any]]:
+    """The /cart/add change: bump the product's quantity or append it"""
+    item = next((item for item in items if item['id'] == product_id), None)
+    if item:
+        item['quantity'] += 1
+    else:
+        items.append({'id': product_id, 'quantity': 1})
+    return items
+
+
+def _naive_add(store: SessionStore, key: str, product_id: str):
+    items = store.get(key) or []
+    # Let another writer in between the read and the write, as real work would
+    time.sleep(0)
+    store.set(key, _add(items, product_id))
+
+
+def _atomic_add(store: SessionStore, key: str, product_id: str):
+    store.update(key, lambda items: _add(items, product_id), list)
+
+
+def _quantities(items: List[Dict[str, Any]]) -> Dict[str, int]:
+    return {item['id']: item['quantity'] for item in items or []}
+
+
+def _lost(expected: Dict[str, int], items: List[Dict[str, Any]]) -> int:
+    got = _quantities(items)
+    return sum(count - got.get(product_id, 0) for product_id, count in expected.items())
+
+
+def run_threads(store: SessionStore, add: Callable, threads: int, adds: int,
+                shared_key: bool = True) -> Tuple[int, float]:
+    """`threads` writers doing `adds` each; returns (lost updates, seconds)"""
+    keys = [f"stress-{uuid.uuid4().hex[:8]}" for _ in range(1 if shared_key else threads)]
+    barrier = threading.Barrier(threads)
+
+    def writer(n: int):
+        key = keys[0] if shared_key else keys[n]
+        barrier.wait()
+        for i in range(adds):
+            add(store, key, PRODUCTS[(n + i) % len(PRODUCTS)])
+
+    workers = [threading.Thread(target=writer, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    lost = 0
+    for n, key in enumerate(keys):
+        expected: Dict[str, int] = {}
+        for writer_n in (range(threads) if shared_key else (n,)):
+            for i in range(adds):
+                product_id = PRODUCTS[(writer_n + i) % len(PRODUCTS)]
+                expected[product_id] = expected.get(product_id, 0) + 1
+        lost += _lost(expected, store.get(key))
+        store.delete(key)
+    return lost, elapsed
+
+
+def _process_writer(args: Tuple[str, str, int, int]) -> int:
+    url, key, n, adds = args
+    store = RedisSessionStore(url, namespace='stress')
+    for i in range(adds):
+        _atomic_add(store, key, PRODUCTS[(n + i) % len(PRODUCTS)])
+    return store.update_retries
+
+
+def run_processes(url: str, processes: int, adds: int) -> Tuple[int, int, float]:
+    """Writer processes on one key of a shared store: (lost updates, retries, seconds)"""
+    key = f"stress-{uuid.uuid4().hex[:8]}"
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        retries = sum(pool.map(_process_writer, [(url, key, n, adds) for n in range(processes)]))
+    elapsed = time.perf_counter() - started
+    expected: Dict[str, int] = {}
+    for n in range(processes):
+        for i in range(adds):
+            product_id = PRODUCTS[(n + i) % len(PRODUCTS)]
+            expected[product_id] = expected.get(product_id, 0) + 1
+    store = RedisSessionStore(url, namespace='stress')
+    lost = _lost(expected, store.get(key))
+    store.delete(key)
+    return lost, retries, elapsed
+
+
+def _http_client(args: Tuple[str, str, int, int]) -> int:
+    """Add `adds` items to the shared session, a new connection each time; returns errors"""
+    url, session_id, n, adds = args
+    parsed = urlparse(url)
+    errors = 0
+    for i in range(adds):
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        try:
+            _request(conn, 'POST', '/cart/add', {
+                'session_id': session_id, 'product_id': PRODUCTS[(n + i) % len(PRODUCTS)],
+                'product_name': 'Stress item', 'price': 1.0, 'quantity': 1
+            })
+        except Exception:
+            errors += 1
+        finally:
+            conn.close()
+    return errors
+
+
+def run_http(url: str, clients: int, adds: int) -> Tuple[int, int, float]:
+    """Client processes adding to one guest cart: (lost updates, errors, seconds)"""
+    session_id = f"stress-{uuid.uuid4().hex[:8]}"
+    started = time.perf_counter()
+    with multiprocessing.Pool(clients) as pool:
+        errors = sum(pool.map(_http_client, [(url, session_id, n, adds) for n in range(clients)]))
+    elapsed = time.perf_counter() - started
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    cart = _request(conn, 'GET', f'/cart/{session_id}')['cart']
+    conn.close()
+    added = clients * adds - errors
+    return added - sum(item['quantity'] for item in cart), errors, elapsed
+
+
+def _serve(workers: int, args, store_url: str) -> subprocess.Popen:
+    env = dict(os.environ, SESSION_STORE_URL=store_url, LOG_LEVEL='warning')
+    command = [sys.executable, os.path.join(HERE, 'serve.py'), '--app', args.app, '--host', '127.0.0.1',
+               '--port', str(args.port), '--workers', str(workers)]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    _wait_ready(f"http://127.0.0.1:{args.port}", server)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-session lost-update stress test")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--adds", type=int, default=200, help="adds per writer")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--store-url", help="shared store to test (default: start the local stand-in)")
+    parser.add_argument("--workers", type=int, nargs="*", default=[], help="also test serve.py over HTTP")
+    parser.add_argument("--url", help="also test an already running server over HTTP")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--app", default="simple_server:app")
+    args = parser.parse_args()
+
+    standin = None
+    store_url = args.store_url
+    if not store_url:
+        from resp_standin import RespStandIn
+        standin = RespStandIn().start()
+        store_url = standin.url
+
+    failures = 0
+    try:
+        total = args.threads * args.adds
+        print(f"{args.threads} threads x {args.adds} adds on one cart ({total} adds)")
+        for name, store in (('memory', InMemorySessionStore(namespace='stress')),
+                            ('redis', RedisSessionStore(store_url, namespace='stress'))):
+            naive_lost, _ = run_threads(store, _naive_add, args.threads, args.adds)
+            lost, same_seconds = run_threads(store, _atomic_add, args.threads, args.adds)
+            _, spread_seconds = run_threads(store, _atomic_add, args.threads, args.adds, shared_key=False)
+            print(f"  {name:<7} get/set lost {naive_lost:>5}   update() lost {lost:>3}   "
+                  f"one cart {total / same_seconds:>7.0f} adds/s   "
+                  f"{args.threads} carts {total / spread_seconds:>7.0f} adds/s")
+            failures += lost
+
+        lost, retries, seconds = run_processes(store_url, args.processes, args.adds)
+        print(f"{args.processes} processes x {args.adds} adds on one cart: update() lost {lost}, "
+              f"{retries} transaction retries, {args.processes * args.adds / seconds:.0f} adds/s")
+        failures += lost
+
+        targets = [(f"serve.py --workers {n}", n) for n in args.workers]
+        if args.url:
+            targets.append((args.url, None))
+        for label, workers in targets:
+            server = _serve(workers, args, store_url) if workers else None
+            try:
+                url = args.url if workers is None else f"http://127.0.0.1:{args.port}"
+                lost, errors, seconds = run_http(url, args.processes, args.adds)
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.wait(timeout=30)
+            print(f"{label}: {args.processes} clients x {args.adds} /cart/add on one session: "
+                  f"lost {lost}, errors {errors}, {args.processes * args.adds / seconds:.0f} req/s")
+            failures += lost + errors
+    finally:
+        if standin is not None:
+            standin.stop()
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
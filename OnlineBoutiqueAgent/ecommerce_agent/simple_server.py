@@ -6,9 +6,11 @@ Directly uses product search functions without complex agent orchestration
 from fastapi import FastAPI, HTTPException, Header, File, UploadFile, Form
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple, Iterator, AsyncIterator
+from contextlib import asynccontextmanager
+import asyncio
 import sys
 import os
 import io
@@ -24,10 +26,21 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from agents.product_finder_agent.agent import search_products, get_product_details
 from agents.export_agent.agent import generate_order_pdf
 from tambo_ui_engine import TamboUIDecisionEngine
+# SDK encoder (orjson when installed); tambo_ui_engine has already put the SDK on the path
+from commerce_genui.fast_decision import dumps as dumps_json
+from popularity import popularity_tracker
+from chat_router import chat_router
+from product_records import freeze_products
+from session_store import AsyncSessionStore, create_session_store
+from order_numbers import new_order_number, normalize_order_number
+from cart_cache import DEFAULT_TTL_SECONDS as DEFAULT_CART_CACHE_TTL_SECONDS, CartCache, CartView
+from session_locks import AsyncSessionLocks
+from session_snapshot import DEFAULT_SNAPSHOT_INTERVAL_SECONDS, SessionSnapshotter
+from context_sync import context_delta, context_version, public_context, rebase_turn, sync_context
 
 # Import database and auth
 try:
-    from database import User, Cart, Order, db
+    from database import User, Cart, Order, Popularity, db, AsyncUser, AsyncCart, AsyncOrder
     from auth import hash_password, verify_password, create_access_token, decode_access_token
     MONGODB_ENABLED = True
     print("✅ MongoDB enabled - authentication and database features active")
@@ -39,6 +52,14 @@ except Exception as e:
         print(f"⚠️ MongoDB disabled due to error: {e}")
     MONGODB_ENABLED = False
 
+# Persist popularity counters (used by the recommendation fallback) when MongoDB is available
+if MONGODB_ENABLED:
+    try:
+        popularity_tracker.attach_store(Popularity)
+        popularity_tracker.start_periodic_flush()
+    except Exception as e:
+        print(f"⚠️ Popularity counters not persisted: {e}")
+
 app = FastAPI(
     title="Cymbal Shops E-commerce API",
     description="Backend API with Tambo Generative UI",
@@ -56,13 +77,21 @@ app.add_middleware(
 
 # Initialize
 ui_engine = TamboUIDecisionEngine()
-sessions: Dict[str, Dict] = {}
+# Chat contexts (bounded, expiring; SESSION_STORE_URL moves them out of process)
+sessions = create_session_store('sessions')
+# Store calls from async handlers go through these (a shared store blocks on the network)
+async_sessions = AsyncSessionStore(sessions)
+# One chat turn at a time per session (per worker); other sessions don't wait
+chat_turns = AsyncSessionLocks()
 
 
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
     user_id: Optional[str] = None  # Added for authenticated users
+    # Compact replies: context is a delta against context_version (see context_sync)
+    compact: bool = False
+    context_version: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
@@ -89,12 +118,10 @@ class AuthResponse(BaseModel):
     token: str
     user: Dict[str, Any]
     message: str
-ui_engine = TamboUIDecisionEngine()
-sessions: Dict[str, Dict] = {}
 
 
-def get_current_user(authorization: Optional[str] = None) -> Optional[dict]:
-    """Get current user from authorization header"""
+def _token_user_id(authorization: Optional[str]) -> Optional[str]:
+    """User id from a "Bearer <token>" authorization header, if valid"""
     if not MONGODB_ENABLED or not authorization:
         return None
     
@@ -108,13 +135,48 @@ def get_current_user(authorization: Optional[str] = None) -> Optional[dict]:
         
         if not payload:
             return None
-        
-        user = User.find_by_id(payload.get("sub"))
-        return user
+        return payload.get("sub")
     except:
         return None
 
 
+def get_current_user(authorization: Optional[str] = None) -> Optional[dict]:
+    """Get current user from authorization header (blocking - for chat handlers, which run in threads)"""
+    user_id = _token_user_id(authorization)
+    return User.find_by_id(user_id) if user_id else None
+
+
+async def current_user(authorization: Optional[str] = None) -> Optional[dict]:
+    """get_current_user for async endpoints: the lookup doesn't block the event loop"""
+    user_id = _token_user_id(authorization)
+    return await AsyncUser.find_by_id(user_id) if user_id else None
+
+
+# Signed-in users' carts, written through by every cart change (see cart_cache.py).
+# With a shared session store (several workers or hosts) every hit is checked
+# against the cart version published there; several workers without one would
+# serve each other's stale carts, so the cache is off.
+cart_cache = CartCache(
+    ttl_seconds=float(os.getenv(
+        'CART_CACHE_TTL_SECONDS',
+        0 if int(os.getenv('WEB_CONCURRENCY', '1')) > 1 and not sessions.shared else DEFAULT_CART_CACHE_TTL_SECONDS
+    )),
+    versions=create_session_store('cart_versions') if sessions.shared else None
+)
+async_cart_cache = AsyncSessionStore(cart_cache)
+
+
+def get_user_cart(user_id: str) -> CartView:
+    """A signed-in user's cart, from the cache or MongoDB (blocking - for chat handlers)"""
+    return cart_cache.get(user_id) or cart_cache.put(user_id, Cart.get_or_create(user_id))
+
+
+async def user_cart(user_id: str) -> CartView:
+    """get_user_cart for async endpoints"""
+    return (await async_cart_cache.get(user_id)
+            or await async_cart_cache.put(user_id, await AsyncCart.get_or_create(user_id)))
+
+
 @app.get("/")
 async def root():
     return {
@@ -129,401 +191,506 @@ async def root():
 async def health():
     return {
         "status": "healthy",
-        "components": len(ui_engine.registered_components)
+        "components": len(ui_engine.registered_components),
+        "decision_cache": ui_engine.cache_stats(),
+        "session_store": await async_sessions.stats(),
+        "session_snapshot": session_snapshots.stats() if session_snapshots else None,
+        "cart_cache": cart_cache.stats() if MONGODB_ENABLED else None
     }
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)):
-    """Process chat message and return UI component"""
-    print('\n' + '='*100)
-    print('📨 [BACKEND] /chat endpoint called')
-    print('='*100)
-    print(f'📝 [REQUEST] Message: "{request.message}"')
-    print(f'🔑 [REQUEST] Session ID: {request.session_id}')
-    print(f'🔐 [REQUEST] Authorization header: {authorization[:50] if authorization else "❌ None"}...')
-    print(f'👤 [REQUEST] User ID: {request.user_id}')
-    
-    try:
-        # Try to get user from authorization header OR from session_id (if it contains a token)
-        user = None
-        if MONGODB_ENABLED:
-            print(f'💾 [AUTH] MongoDB enabled - checking authentication...')
-            # First try authorization header
-            if authorization:
-                user = get_current_user(authorization)
-            
-            # If no user from header, try to decode session_id as token
-            if not user and request.session_id and request.session_id.startswith('user_'):
-                # Session ID format: user_{user_id}
-                user_id = request.session_id.replace('user_', '')
-                user = User.find_by_id(user_id)
-        
-        session_id = request.session_id or f"session_{hash(request.message)}"
-        user_id = user["_id"] if user else None
-        
-        # Initialize session
-        if session_id not in sessions:
-            sessions[session_id] = {
-                'products': [],
-                'cart_items': [],
-                'history': []
-            }
-        
-        context = sessions[session_id]
-        user_message = request.message.lower()
-        
-        # Check if user wants to login
-        login_keywords = ['login', 'log in', 'sign in', 'signin']
-        if any(keyword in user_message for keyword in login_keywords) and 'create' not in user_message and 'signup' not in user_message:
+def _chat_login(request: ChatRequest, authorization: Optional[str], session_id: str, context: Dict) -> ChatResponse:
+    return ChatResponse(
+        agent_response="Please login to your account to continue shopping and checkout.",
+        ui_component='LoginForm',
+        ui_props={},
+        ui_reason='User requested login',
+        context=context
+    )
+
+
+def _chat_signup(request: ChatRequest, authorization: Optional[str], session_id: str, context: Dict) -> ChatResponse:
+    return ChatResponse(
+        agent_response="Create your account to start shopping and save your cart!",
+        ui_component='SignupForm',
+        ui_props={},
+        ui_reason='User requested signup',
+        context=context
+    )
+
+
+def _chat_orders(request: ChatRequest, authorization: Optional[str], session_id: str, context: Dict) -> ChatResponse:
+    if MONGODB_ENABLED:
+        user = get_current_user(authorization)
+        if not user:
             return ChatResponse(
-                agent_response="Please login to your account to continue shopping and checkout.",
+                agent_response="You need to login to view your order history. Please login or create an account.",
                 ui_component='LoginForm',
-                ui_props={},
-                ui_reason='User requested login',
-                context=context
-            )
-        
-        # Check if user wants to signup
-        signup_keywords = ['signup', 'sign up', 'create account', 'register', 'new account']
-        if any(keyword in user_message for keyword in signup_keywords):
-            return ChatResponse(
-                agent_response="Create your account to start shopping and save your cart!",
-                ui_component='SignupForm',
-                ui_props={},
-                ui_reason='User requested signup',
+                ui_props={
+                    'message': 'Login to view your order history'
+                },
+                ui_reason='Order history requires authentication',
                 context=context
             )
         
-        # Check if user wants to view order history
-        order_keywords = ['order history', 'my orders', 'past orders', 'previous orders', 'show orders']
-        print(f"🔍 CHECKING ORDER KEYWORDS in message: '{user_message}'")
-        print(f"🔍 Keywords to check: {order_keywords}")
-        keyword_match = any(keyword in user_message for keyword in order_keywords)
-        print(f"🔍 Keyword match result: {keyword_match}")
-        
-        if keyword_match:
-            print(f"✅ ORDER HISTORY REQUEST DETECTED!")
-            print(f"📊 MongoDB enabled: {MONGODB_ENABLED}")
-            print(f"🔑 Authorization header: {authorization[:50] if authorization else 'None'}...")
-            
-            if MONGODB_ENABLED:
-                print(f"🔄 Getting current user from token...")
-                user = get_current_user(authorization)
-                print(f"👤 User retrieved: {user['email'] if user else 'None'}")
-                print(f"👤 User ID: {user['_id'] if user else 'None'}")
-                
-                if not user:
-                    print(f"❌ No user found - returning LoginForm")
-                    return ChatResponse(
-                        agent_response="You need to login to view your order history. Please login or create an account.",
-                        ui_component='LoginForm',
-                        ui_props={
-                            'message': 'Login to view your order history'
-                        },
-                        ui_reason='Order history requires authentication',
-                        context=context
-                    )
-                
-                # Get user orders
-                print(f"📥 Calling Order.get_user_orders for user_id: {user['_id']}")
-                orders = Order.get_user_orders(user["_id"])
-                print(f"📦 Raw orders count: {len(orders)}")
-                print(f"📦 Orders type: {type(orders)}")
-                
-                for idx, order in enumerate(orders):
-                    print(f"  📋 Order {idx + 1}:")
-                    print(f"     - ID: {order['_id']}")
-                    print(f"     - Items count: {len(order['items'])}")
-                    print(f"     - Total: ${order['total']}")
-                    print(f"     - Status: {order['status']}")
-                    print(f"     - Created: {order['created_at']}")
-                    print(f"     - Raw items: {order['items']}")
-                
-                print(f"🔄 Starting order formatting...")
-                formatted_orders = []
-                for order in orders:
-                    # Ensure items have proper structure
-                    formatted_items = []
-                    for item in order.get('items', []):
-                        formatted_items.append({
-                            'id': item.get('id', ''),
-                            'name': item.get('name', 'Unknown'),
-                            'price': item.get('price', 0),
-                            'quantity': item.get('quantity', 1),
-                            'image': item.get('image', '')
-                        })
-                    
-                    formatted_orders.append({
-                        'orderId': order['_id'][:8],
-                        'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
-                        'items': formatted_items,
-                        'total': order['total'],
-                        'status': order['status']
-                    })
-                
-                print(f"✅ Formatted orders count: {len(formatted_orders)}")
-                print(f"📊 Full formatted_orders array:")
-                for idx, fo in enumerate(formatted_orders):
-                    print(f"   Order {idx + 1}: {fo}")
-                
-                if orders:
-                    total_items = sum(len(o['items']) for o in orders)
-                    agent_response = f"Here are your {len(orders)} past order{'s' if len(orders) > 1 else ''}: {total_items} total items purchased."
-                    print(f"✅ Agent response: {agent_response}")
-                else:
-                    agent_response = "You don't have any orders yet. Start shopping!"
-                    print(f"⚠️ No orders - empty response")
-                
-                print(f"📤 RETURNING ChatResponse:")
-                print(f"   - agent_response: {agent_response}")
-                print(f"   - ui_component: OrderHistory")
-                print(f"   - ui_props.orders length: {len(formatted_orders)}")
-                print(f"   - ui_props: {{'orders': {formatted_orders}}}")
-                
-                return ChatResponse(
-                    agent_response=agent_response,
-                    ui_component='OrderHistory',
-                    ui_props={
-                        'orders': formatted_orders
-                    },
-                    ui_reason='Displaying order history',
-                    context=context
-                )
-            else:
-                orders = order_history.get(session_id, [])
-                formatted_orders = []
-                for order in orders:
-                    formatted_orders.append({
-                        'orderId': order['order_id'],
-                        'date': order['date'],
-                        'items': order['items'],
-                        'total': order['total'],
-                        'status': order['status']
-                    })
-                
-                return ChatResponse(
-                    agent_response=f"Here are your {len(formatted_orders)} past orders:" if orders else "You don't have any orders yet.",
-                    ui_component='OrderHistory',
-                    ui_props={
-                        'orders': formatted_orders
-                    },
-                    ui_reason='Displaying order history',
-                    context=context
-                )
-        
-        # Check if user wants to view cart (CHECK THIS BEFORE PROFILE!)
-        cart_keywords = ['show cart', 'my cart', 'view cart', 'see cart', 'cart items', 'what\'s in my cart', 'whats in my cart', 'show my cart', 'show me my cart', 'show me cart', 'display cart', 'display my cart']
-        if any(keyword in user_message for keyword in cart_keywords):
-            print(f"🛒 CART REQUEST DETECTED!")
-            if MONGODB_ENABLED:
-                user = get_current_user(authorization)
-                if not user:
-                    return ChatResponse(
-                        agent_response="Please login to view your cart.",
-                        ui_component='LoginForm',
-                        ui_props={},
-                        ui_reason='Cart requires authentication',
-                        context=context
-                    )
-                
-                # Get user cart from MongoDB
-                cart = Cart.get_or_create(user["_id"])
-                cart_items = cart['items']
-            else:
-                # Get cart items from memory
-                cart_items = global_cart.get(session_id, [])
-            
-            total = sum(item['price'] * item['quantity'] for item in cart_items)
-            
-            # Format for CheckoutWizard
-            formatted_cart = []
-            for item in cart_items:
-                formatted_cart.append({
+        page = Order.get_order_page(user["_id"])
+        orders = page['orders']
+        formatted_orders = []
+        for order in orders:
+            # Ensure items have proper structure
+            formatted_items = []
+            for item in order.get('items', []):
+                formatted_items.append({
                     'id': item.get('id', ''),
-                    'name': item.get('name', 'Product'),
+                    'name': item.get('name', 'Unknown'),
                     'price': item.get('price', 0),
                     'quantity': item.get('quantity', 1),
-                    'image': item.get('image', 'https://picsum.photos/seed/cart/100/100')
+                    'image': item.get('image', '')
                 })
             
-            if cart_items:
-                agent_response = f"Here's your cart with {sum(item['quantity'] for item in cart_items)} item(s) totaling ${total:.2f}"
-            else:
-                agent_response = "Your cart is empty. Browse products to add items!"
-            
-            print(f"✅ Returning CheckoutWizard with {len(formatted_cart)} items")
+            formatted_orders.append({
+                'orderId': Order.display_number(order),
+                'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+                'items': formatted_items,
+                'total': order['total'],
+                'status': order['status']
+            })
+        
+        if orders:
+            total_items = sum(len(o['items']) for o in orders)
+            recent = "most recent " if page['next_cursor'] else "past "
+            agent_response = f"Here are your {len(orders)} {recent}order{'s' if len(orders) > 1 else ''}: {total_items} total items purchased."
+        else:
+            agent_response = "You don't have any orders yet. Start shopping!"
+        
+        return ChatResponse(
+            agent_response=agent_response,
+            ui_component='OrderHistory',
+            ui_props={
+                'orders': formatted_orders
+            },
+            ui_reason='Displaying order history',
+            context=context
+        )
+    
+    orders = order_history.get(session_id, [])
+    formatted_orders = []
+    for order in orders:
+        formatted_orders.append({
+            'orderId': order['order_id'],
+            'date': order['date'],
+            'items': order['items'],
+            'total': order['total'],
+            'status': order['status']
+        })
+    
+    return ChatResponse(
+        agent_response=f"Here are your {len(formatted_orders)} past orders:" if orders else "You don't have any orders yet.",
+        ui_component='OrderHistory',
+        ui_props={
+            'orders': formatted_orders
+        },
+        ui_reason='Displaying order history',
+        context=context
+    )
+
+
+def _chat_cart(request: ChatRequest, authorization: Optional[str], session_id: str, context: Dict) -> ChatResponse:
+    if MONGODB_ENABLED:
+        user = get_current_user(authorization)
+        if not user:
             return ChatResponse(
-                agent_response=agent_response,
-                ui_component='CheckoutWizard',
-                ui_props={
-                    'cartItems': formatted_cart,
-                    'expressMode': False,
-                    'shippingCost': 0
-                },
-                ui_reason='Displaying cart contents',
+                agent_response="Please login to view your cart.",
+                ui_component='LoginForm',
+                ui_props={},
+                ui_reason='Cart requires authentication',
                 context=context
             )
         
-        # Check if user wants to view their profile
-        profile_keywords = ['show my profile', 'view profile', 'my account', 'account details', 'profile page', 'my profile', 'view my profile', 'show profile']
-        if any(keyword in user_message for keyword in profile_keywords):
-            print(f"🔍 PROFILE REQUEST - MongoDB: {MONGODB_ENABLED}")
-            if MONGODB_ENABLED:
-                user = get_current_user(authorization)
-                print(f"👤 User from token: {user['email'] if user else 'None'}")
-                if not user:
-                    return ChatResponse(
-                        agent_response="You need to login to view your profile. Please login or create an account.",
-                        ui_component='LoginForm',
-                        ui_props={
-                            'message': 'Login to view your profile'
-                        },
-                        ui_reason='Profile requires authentication',
-                        context=context
-                    )
-                
-                # Get user profile data
-                try:
-                    user_id = user["_id"]
-                    
-                    # Get cart
-                    cart = Cart.get_or_create(user_id)
-                    cart_items = cart.get('items', [])
-                    
-                    # Get orders
-                    orders = Order.get_user_orders(user_id)
-                    
-                    # Format orders
-                    formatted_orders = []
-                    for order in orders:
-                        formatted_orders.append({
-                            'orderId': order['_id'][:8],
-                            'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
-                            'items': order['items'],
-                            'total': order['total'],
-                            'status': order['status']
-                        })
-                    
-                    # Format cart items
-                    formatted_cart = []
-                    for item in cart_items:
-                        formatted_cart.append({
-                            'id': item.get('id', ''),
-                            'name': item.get('name', 'Product'),
-                            'price': item.get('price', 0),
-                            'quantity': item.get('quantity', 1),
-                            'image': item.get('image', 'https://picsum.photos/seed/cart/100/100')
-                        })
-                    
-                    profile_data = {
-                        'user': {
-                            'id': user['_id'],
-                            'email': user['email'],
-                            'username': user['username'],
-                            'full_name': user.get('full_name', user['username']),
-                            'phone': user.get('phone', ''),
-                            'address': user.get('address', ''),
-                            'created_at': user['created_at'].strftime("%Y-%m-%d %H:%M:%S") if 'created_at' in user else ''
-                        },
-                        'cart_items': formatted_cart,
-                        'orders': formatted_orders,
-                        'total_cart_items': sum(item['quantity'] for item in cart_items),
-                        'total_orders': len(formatted_orders)
-                    }
-                    
-                    print(f"📊 Profile data: User={user['email']}, Cart={len(cart_items)}, Orders={len(orders)}")
-                    
-                    return ChatResponse(
-                        agent_response=f"Here's your profile, {user.get('full_name', user['username'])}! You have {len(cart_items)} items in your cart and {len(orders)} past orders.",
-                        ui_component='UserProfile',
-                        ui_props=profile_data,
-                        ui_reason='Displaying user profile',
-                        context=context
-                    )
-                except Exception as e:
-                    print(f"❌ Error loading profile: {e}")
-                    return ChatResponse(
-                        agent_response="Sorry, there was an error loading your profile.",
-                        ui_component='LoginForm',
-                        ui_props={},
-                        ui_reason='Profile error',
-                        context=context
-                    )
-            else:
-                return ChatResponse(
-                    agent_response="Profile feature requires database connection. Please configure MongoDB.",
-                    ui_component='LoginForm',
-                    ui_props={},
-                    ui_reason='MongoDB not configured',
-                    context=context
-                )
-        
-        # Otherwise, search products
-        search_result = search_products(request.message)
-        
-        # Build response
-        if search_result.get('status') == 'success':
-            products = search_result.get('products', [])
-            context['products'] = products
-            
-            if products:
-                names = [p['name'] for p in products[:3]]
-                agent_response = f"Here are some products I found: {', '.join(names)}"
-                if len(products) > 3:
-                    agent_response += f" and {len(products) - 3} more."
-            else:
-                agent_response = f"No products found matching '{request.message}'. Try 'sunglasses', 'shirts', or 'shoes'."
-        else:
-            agent_response = f"Error searching: {search_result.get('error_message', 'Unknown error')}"
-            products = []
+        # Signed-in cart, from the cache or MongoDB
+        cart = get_user_cart(user["_id"])
+    else:
+        # Get cart items from memory
+        cart = CartView.build(global_cart.get(session_id, []))
+    
+    if cart.items:
+        agent_response = f"Here's your cart with {cart.total_items} item(s) totaling ${cart.total_price:.2f}"
+    else:
+        agent_response = "Your cart is empty. Browse products to add items!"
+    
+    return ChatResponse(
+        agent_response=agent_response,
+        ui_component='CheckoutWizard',
+        ui_props=cart.checkout_props(),
+        ui_reason='Displaying cart contents',
+        context=context
+    )
+
+
+def _chat_profile(request: ChatRequest, authorization: Optional[str], session_id: str, context: Dict) -> ChatResponse:
+    if not MONGODB_ENABLED:
+        return ChatResponse(
+            agent_response="Profile feature requires database connection. Please configure MongoDB.",
+            ui_component='LoginForm',
+            ui_props={},
+            ui_reason='MongoDB not configured',
+            context=context
+        )
+    
+    user = get_current_user(authorization)
+    if not user:
+        return ChatResponse(
+            agent_response="You need to login to view your profile. Please login or create an account.",
+            ui_component='LoginForm',
+            ui_props={
+                'message': 'Login to view your profile'
+            },
+            ui_reason='Profile requires authentication',
+            context=context
+        )
+    
+    try:
+        user_id = user["_id"]
+        cart = get_user_cart(user_id)
+        page = Order.get_order_page(user_id)
+        orders = page['orders']
+        # Counted only when there is more than the first page
+        total_orders = Order.count_user_orders(user_id) if page['next_cursor'] else len(orders)
         
-        # Format products for UI
-        formatted_products = []
-        for p in products:
-            try:
-                price_str = p.get('price', '$0')
-                price_num = float(price_str.replace('$', '')) if '$' in price_str else 0
-            except:
-                price_num = 0
-            
-            # Use scraped image URL or fallback to placeholder
-            product_id = p.get('id', 'default')
-            image_url = p.get('image') or f'https://picsum.photos/seed/{product_id}/300/300'
-            
-            formatted_products.append({
-                'id': product_id,
-                'name': p.get('name', 'Product'),
-                'price': price_num,
-                'image': image_url,
-                'description': p.get('description') or p.get('name', 'No description'),
-                'category': 'Products',
-                'rating': 4.5,
-                'inStock': True
+        formatted_orders = []
+        for order in orders:
+            formatted_orders.append({
+                'orderId': Order.display_number(order),
+                'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+                'items': order['items'],
+                'total': order['total'],
+                'status': order['status']
             })
         
-        # Decide UI component
-        ui_config = ui_engine.decide_ui_component(
-            user_message=request.message,
-            agent_response=agent_response,
+        profile_data = {
+            'user': {
+                'id': user['_id'],
+                'email': user['email'],
+                'username': user['username'],
+                'full_name': user.get('full_name', user['username']),
+                'phone': user.get('phone', ''),
+                'address': user.get('address', ''),
+                'created_at': user['created_at'].strftime("%Y-%m-%d %H:%M:%S") if 'created_at' in user else ''
+            },
+            'cart_items': list(cart.cart_items),
+            'orders': formatted_orders,
+            'total_cart_items': cart.total_items,
+            'total_orders': total_orders
+        }
+        
+        return ChatResponse(
+            agent_response=f"Here's your profile, {user.get('full_name', user['username'])}! You have {len(cart.items)} items in your cart and {total_orders} past orders.",
+            ui_component='UserProfile',
+            ui_props=profile_data,
+            ui_reason='Displaying user profile',
             context=context
         )
-        
-        # Set products in props
-        ui_config.props['products'] = formatted_products
-        
+    except Exception as e:
+        print(f"❌ Error loading profile: {e}")
         return ChatResponse(
-            agent_response=agent_response,
-            ui_component=ui_config.component_name,
-            ui_props=ui_config.props,
-            ui_reason=ui_config.reason,
+            agent_response="Sorry, there was an error loading your profile.",
+            ui_component='LoginForm',
+            ui_props={},
+            ui_reason='Profile error',
             context=context
         )
+
+
+def _search_results(request: ChatRequest, context: Dict) -> Tuple[List[Dict[str, Any]], str]:
+    """Run the product search, keep the results in the session and write the reply"""
+    search_result = search_products(request.message)
+    
+    # Build response
+    if search_result.get('status') == 'success':
+        products = search_result.get('products', [])
+        context['products'] = products
+        popularity_tracker.record_many((p.get('id') for p in products), 'search')
+        
+        if products:
+            names = [p['name'] for p in products[:3]]
+            agent_response = f"Here are some products I found: {', '.join(names)}"
+            if len(products) > 3:
+                agent_response += f" and {len(products) - 3} more."
+        else:
+            agent_response = f"No products found matching '{request.message}'. Try 'sunglasses', 'shirts', or 'shoes'."
+    else:
+        agent_response = f"Error searching: {search_result.get('error_message', 'Unknown error')}"
+        products = []
+    return products, agent_response
+
+
+def _format_products(products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Products in the shape ProductGrid expects"""
+    formatted_products = []
+    for p in products:
+        try:
+            price_str = p.get('price', '$0')
+            price_num = float(price_str.replace('$', '')) if '$' in price_str else 0
+        except:
+            price_num = 0
+        
+        # Use scraped image URL or fallback to placeholder
+        product_id = p.get('id', 'default')
+        image_url = p.get('image') or f'https://picsum.photos/seed/{product_id}/300/300'
+        
+        formatted_products.append({
+            'id': product_id,
+            'name': p.get('name', 'Product'),
+            'price': price_num,
+            'image': image_url,
+            'description': p.get('description') or p.get('name', 'No description'),
+            'category': 'Products',
+            'rating': 4.5,
+            'inStock': True
+        })
+    return formatted_products
+
+
+def _chat_search(request: ChatRequest, authorization: Optional[str], session_id: str, context: Dict) -> ChatResponse:
+    products, agent_response = _search_results(request, context)
+    
+    # Decide UI component
+    ui_config = ui_engine.decide_ui_component(
+        user_message=request.message,
+        agent_response=agent_response,
+        context=context
+    )
+    
+    # Set products in props
+    ui_config.props['products'] = _format_products(products)
+    
+    return ChatResponse(
+        agent_response=agent_response,
+        ui_component=ui_config.component_name,
+        ui_props=ui_config.props,
+        ui_reason=ui_config.reason,
+        context=context
+    )
+
+
+# Route name (from chat_router) -> handler; precedence lives in chat_router.CHAT_ROUTES
+CHAT_HANDLERS = {
+    'login': _chat_login,
+    'signup': _chat_signup,
+    'orders': _chat_orders,
+    'cart': _chat_cart,
+    'profile': _chat_profile,
+    'search': _chat_search,
+}
+
+
+async def _chat_session(request: ChatRequest, authorization: Optional[str]) -> Tuple[str, Dict, Optional[dict]]:
+    """Session id, session context (created on first use) and the signed-in user, if any"""
+    # Try to get user from authorization header OR from session_id (if it contains a token)
+    user = None
+    if MONGODB_ENABLED:
+        # First try authorization header
+        if authorization:
+            user = await current_user(authorization)
+        
+        # If no user from header, try to decode session_id as token
+        if not user and request.session_id and request.session_id.startswith('user_'):
+            # Session ID format: user_{user_id}
+            user_id = request.session_id.replace('user_', '')
+            user = await AsyncUser.find_by_id(user_id)
+    
+    session_id = request.session_id or f"session_{hash(request.message)}"
+    
+    # Requests without a session id get a throwaway context (see _save_session)
+    context = await async_sessions.get(session_id) if request.session_id else None
+    if context is None:
+        context = {
+            'products': [],
+            'cart_items': [],
+            'history': []
+        }
+        # Versioned from the start, so saving tells this turn's changes apart
+        sync_context(context)
+    # External stores hand back plain lists; re-freeze once (free when already frozen)
+    context['products'] = freeze_products(context.get('products'))
+    
+    return session_id, context, user
+
+
+def _reply_context(request: ChatRequest, context: Dict, ui_props: Dict[str, Any]) -> Dict[str, Any]:
+    """Context sent with a turn's reply: the whole session, or a delta in compact mode"""
+    sync_context(context)
+    if request.compact:
+        return context_delta(context, request.context_version, ui_props)
+    return public_context(context)
+
+
+async def _save_session(request: ChatRequest, session_id: str, context: Dict) -> Dict:
+    """
+    Write a turn's context back to the store and return it as saved
+    (sessionless turns aren't kept); reply from the returned context
+    
+    The turn lock only covers this worker. If a turn on another worker saved
+    the session after this one loaded it, this turn's changes are rebased
+    onto that context (see context_sync.rebase_turn) inside one atomic
+    update(), instead of overwriting it.
+    """
+    if not request.session_id:
+        return context
+    # Not synced yet this turn, so still the version it was loaded at
+    read_version = context_version(context)
+    
+    def save(stored):
+        if stored is None or context_version(stored) == read_version:
+            sync_context(context)
+            return context
+        return rebase_turn(stored, context, read_version)
+    
+    return await async_sessions.update(session_id, save)
+
+
+@asynccontextmanager
+async def _chat_turn(request: ChatRequest):
+    """
+    Hold the session's turn lock from loading its context to saving it, so
+    turns on this worker run one after another (turns on other workers are
+    merged on save, see _save_session)
+    """
+    if not request.session_id:
+        yield
+        return
+    async with chat_turns(request.session_id):
+        yield
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, authorization: Optional[str] = Header(None)):
+    """Process chat message and return UI component"""
+    try:
+        async with _chat_turn(request):
+            session_id, context, user = await _chat_session(request, authorization)
+            route = chat_router.route(request.message)
+            print(f"📨 /chat [{route}] session={session_id} user={user['_id'] if user else None}")
+            # Off the event loop: searches scrape the catalog, and other sessions keep being served
+            response = await asyncio.to_thread(CHAT_HANDLERS[route], request, authorization, session_id, context)
+            context = await _save_session(request, session_id, context)
+            response.context = _reply_context(request, context, response.ui_props)
+        return response
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================================================
+# STREAMING CHAT (Server-Sent Events)
+# ============================================================================
+
+# Products per ui_props event after the first
+PRODUCT_BATCH_SIZE = 4
+
+
+def _sse(event: str, data: Any) -> bytes:
+    """One Server-Sent Event with a JSON payload (JSON never contains a raw newline)"""
+    return b"event: " + event.encode() + b"\ndata: " + dumps_json(data) + b"\n\n"
+
+
+def _props_events(props: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    ui_props in batches: the first event carries every prop and the first
+    products; each later event carries only more products to append
+    """
+    products = props.get('products')
+    if not isinstance(products, (list, tuple)) or len(products) <= PRODUCT_BATCH_SIZE:
+        yield _sse('ui_props', props)
+        return
+    yield _sse('ui_props', {**props, 'products': products[:PRODUCT_BATCH_SIZE]})
+    for start in range(PRODUCT_BATCH_SIZE, len(products), PRODUCT_BATCH_SIZE):
+        yield _sse('ui_props', {'products': products[start:start + PRODUCT_BATCH_SIZE]})
+
+
+def _response_events(response: ChatResponse) -> Iterator[bytes]:
+    """A finished ChatResponse as events, in stream order"""
+    yield _sse('ui_component', response.ui_component)
+    yield _sse('ui_reason', response.ui_reason)
+    yield from _props_events(response.ui_props)
+    yield _sse('agent_response', response.agent_response)
+    yield _sse('context', response.context)
+
+
+async def _search_events(request: ChatRequest, context: Dict, turn: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """
+    Search turn: component first (before the scrape), then products, then the
+    reply; the final props are left in turn['ui_props'] for the context event
+    """
+    # The message alone almost always decides the component - send it right away
+    early = ui_engine.decide_ui_component(request.message, "", context, build_props=False)
+    yield _sse('ui_component', early.component_name)
+    yield _sse('ui_reason', early.reason)
+    
+    products, agent_response = await asyncio.to_thread(_search_results, request, context)
+    ui_config = ui_engine.decide_ui_component(
+        user_message=request.message,
+        agent_response=agent_response,
+        context=context
+    )
+    if ui_config.component_name != early.component_name:
+        # The reply text changed the decision - send the final one (same as /chat)
+        yield _sse('ui_component', ui_config.component_name)
+        yield _sse('ui_reason', ui_config.reason)
+    
+    ui_config.props['products'] = _format_products(products)
+    for event in _props_events(ui_config.props):
+        yield event
+    yield _sse('agent_response', agent_response)
+    turn['ui_props'] = ui_config.props
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, authorization: Optional[str] = Header(None)):
+    """
+    /chat as Server-Sent Events, so the UI can render before the turn finishes
+    
+    Event types are ChatResponse fields, sent in this order:
+        ui_component  component name (search turns send it before scraping;
+                      a second ui_component/ui_reason pair replaces the first)
+        ui_reason     explanation
+        ui_props      props with the first products, then {"products": [...]}
+                      batches to append
+        agent_response
+        context       whole context, or a delta when the request is compact
+    A failure mid-stream is sent as an `error` event with {"detail": ...}.
+    """
+    route = chat_router.route(request.message)
+    
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            # The turn lock is taken once the stream starts, so a turn queued
+            # behind another one loads the context that one saved
+            async with _chat_turn(request):
+                session_id, context, user = await _chat_session(request, authorization)
+                print(f"📨 /chat/stream [{route}] session={session_id} user={user['_id'] if user else None}")
+                if route == 'search':
+                    turn = {}
+                    async for event in _search_events(request, context, turn):
+                        yield event
+                    context = await _save_session(request, session_id, context)
+                    yield _sse('context', _reply_context(request, context, turn['ui_props']))
+                else:
+                    response = await asyncio.to_thread(CHAT_HANDLERS[route], request, authorization, session_id, context)
+                    context = await _save_session(request, session_id, context)
+                    response.context = _reply_context(request, context, response.ui_props)
+                    for event in _response_events(response):
+                        yield event
+        except Exception as e:
+            yield _sse('error', {'detail': str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 # ============================================================================
 # AUTHENTICATION ENDPOINTS
 # ============================================================================
@@ -536,15 +703,15 @@ async def signup(request: SignupRequest):
     
     try:
         # Check if user already exists
-        if User.find_by_email(request.email):
+        if await AsyncUser.find_by_email(request.email):
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        if User.find_by_username(request.username):
+        if await AsyncUser.find_by_username(request.username):
             raise HTTPException(status_code=400, detail="Username already taken")
         
         # Create user
         hashed_pwd = hash_password(request.password)
-        user = User.create(
+        user = await AsyncUser.create(
             email=request.email,
             username=request.username,
             hashed_password=hashed_pwd
@@ -578,7 +745,7 @@ async def login(request: LoginRequest):
     
     try:
         # Find user
-        user = User.find_by_email(request.email)
+        user = await AsyncUser.find_by_email(request.email)
         
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
@@ -613,7 +780,7 @@ async def get_me(authorization: Optional[str] = Header(None)):
     if not MONGODB_ENABLED:
         raise HTTPException(status_code=503, detail="MongoDB not configured")
     
-    user = get_current_user(authorization)
+    user = await current_user(authorization)
     
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
@@ -635,7 +802,7 @@ async def get_profile(authorization: Optional[str] = Header(None)):
     if not MONGODB_ENABLED:
         raise HTTPException(status_code=503, detail="MongoDB not configured")
     
-    user = get_current_user(authorization)
+    user = await current_user(authorization)
     
     if not user:
         raise HTTPException(status_code=401, detail="Please login to view your profile")
@@ -644,34 +811,25 @@ async def get_profile(authorization: Optional[str] = Header(None)):
         user_id = user["_id"]
         
         # Get cart
-        cart = Cart.get_or_create(user_id)
-        cart_items = cart.get('items', [])
+        cart = await user_cart(user_id)
         
-        # Get orders
-        orders = Order.get_user_orders(user_id)
+        # Get the most recent orders
+        page = await AsyncOrder.get_order_page(user_id)
+        orders = page['orders']
+        # Counted only when there is more than the first page
+        total_orders = await AsyncOrder.count_user_orders(user_id) if page['next_cursor'] else len(orders)
         
         # Format orders
         formatted_orders = []
         for order in orders:
             formatted_orders.append({
-                'orderId': order['_id'][:8],
+                'orderId': Order.display_number(order),
                 'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
                 'items': order['items'],
                 'total': order['total'],
                 'status': order['status']
             })
         
-        # Format cart items
-        formatted_cart = []
-        for item in cart_items:
-            formatted_cart.append({
-                'id': item.get('id', ''),
-                'name': item.get('name', 'Product'),
-                'price': item.get('price', 0),
-                'quantity': item.get('quantity', 1),
-                'image': item.get('image', 'https://picsum.photos/seed/cart/100/100')
-            })
-        
         return {
             'status': 'success',
             'user': {
@@ -683,10 +841,10 @@ async def get_profile(authorization: Optional[str] = Header(None)):
                 'address': user.get('address', ''),
                 'created_at': user['created_at'].strftime("%Y-%m-%d %H:%M:%S") if 'created_at' in user else ''
             },
-            'cart_items': formatted_cart,
+            'cart_items': list(cart.cart_items),
             'orders': formatted_orders,
-            'total_cart_items': sum(item['quantity'] for item in cart_items),
-            'total_orders': len(formatted_orders)
+            'total_cart_items': cart.total_items,
+            'total_orders': total_orders
         }
     
     except Exception as e:
@@ -699,7 +857,7 @@ async def update_profile(request: dict, authorization: Optional[str] = Header(No
     if not MONGODB_ENABLED:
         raise HTTPException(status_code=503, detail="MongoDB not configured")
     
-    user = get_current_user(authorization)
+    user = await current_user(authorization)
     
     if not user:
         raise HTTPException(status_code=401, detail="Please login to update your profile")
@@ -713,7 +871,7 @@ async def update_profile(request: dict, authorization: Optional[str] = Header(No
             updates['full_name'] = request['full_name']
         if 'email' in request:
             # Check if email already exists for another user
-            existing_user = User.find_by_email(request['email'])
+            existing_user = await AsyncUser.find_by_email(request['email'])
             if existing_user and existing_user['_id'] != user_id:
                 raise HTTPException(status_code=400, detail="Email already in use by another account")
             updates['email'] = request['email']
@@ -726,7 +884,7 @@ async def update_profile(request: dict, authorization: Optional[str] = Header(No
             raise HTTPException(status_code=400, detail="No valid fields to update")
         
         # Update user profile
-        updated_user = User.update_profile(user_id, updates)
+        updated_user = await AsyncUser.update_profile(user_id, updates)
         
         if not updated_user:
             raise HTTPException(status_code=500, detail="Failed to update profile")
@@ -758,30 +916,71 @@ async def list_components():
     }
 
 
-# Global cart storage (fallback for non-MongoDB mode)
-global_cart: Dict[str, List[Dict]] = {}
+# Cart items per session (fallback for non-MongoDB mode)
+global_cart = create_session_store('carts')
+async_global_cart = AsyncSessionStore(global_cart)
 
-# Global order history (fallback for non-MongoDB mode)
-order_history: Dict[str, List[Dict]] = {}
+# Orders per session (fallback for non-MongoDB mode)
+order_history = create_session_store('orders')
+async_order_history = AsyncSessionStore(order_history)
+
+# uvicorn --workers defaults to $WEB_CONCURRENCY (serve.py sets it as well)
+if int(os.getenv('WEB_CONCURRENCY', '1')) > 1 and not sessions.shared:
+    print("⚠️ Several workers without SESSION_STORE_URL - chat sessions and carts are per-worker")
+    print("   Start through serve.py, or set SESSION_STORE_URL=redis://host:6379/0")
+
+# In-memory stores survive restarts through a snapshot log (one process only -
+# with a shared store the store itself persists)
+session_snapshots: Optional[SessionSnapshotter] = None
+if os.getenv('SESSION_SNAPSHOT_PATH') and not sessions.shared:
+    if int(os.getenv('WEB_CONCURRENCY', '1')) > 1:
+        print("⚠️ SESSION_SNAPSHOT_PATH ignored with several workers")
+    else:
+        session_snapshots = SessionSnapshotter(os.getenv('SESSION_SNAPSHOT_PATH'))
+        for store in (sessions, global_cart, order_history):
+            session_snapshots.attach(store)
+        session_snapshots.start_periodic_snapshot(
+            float(os.getenv('SESSION_SNAPSHOT_INTERVAL_SECONDS', DEFAULT_SNAPSHOT_INTERVAL_SECONDS))
+        )
+        print(f"💾 Session snapshots: {session_snapshots.path} "
+              f"({session_snapshots.stats()['saved_entries']} saved entries indexed)")
+
+
+@app.on_event("shutdown")
+def _write_final_snapshot():
+    if session_snapshots is not None:
+        session_snapshots.stop()
 
 
 # ============================================================================
 # CART ENDPOINTS
 # ============================================================================
 
+def _quantity_to_add(value: Any) -> int:
+    """A requested quantity as a whole number of at least 1 (400 otherwise)"""
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError, OverflowError):
+        quantity = 0
+    # int() would also take True, 2.5 or " 3 " - only whole numbers as such count
+    if isinstance(value, bool) or (quantity != value and str(value) != str(quantity)) or quantity < 1:
+        raise HTTPException(status_code=400, detail="Quantity must be a whole number of at least 1")
+    return quantity
+
+
 @app.post("/cart/add")
 async def add_to_cart(request: dict, authorization: Optional[str] = Header(None)):
     """Add item(s) to cart"""
     try:
         product_id = request.get('product_id')
-        quantity = request.get('quantity', 1)
+        quantity = _quantity_to_add(request.get('quantity', 1))
         product_name = request.get('product_name', 'Product')
         price = request.get('price', 0)
         image = request.get('image', '')
         
         if MONGODB_ENABLED:
             # Get current user
-            user = get_current_user(authorization)
+            user = await current_user(authorization)
             if not user:
                 raise HTTPException(status_code=401, detail="Please login to add items to cart")
             
@@ -795,39 +994,43 @@ async def add_to_cart(request: dict, authorization: Optional[str] = Header(None)
                 'image': image,
                 'quantity': quantity
             }
-            cart = Cart.add_item(user_id, item)
+            cart = await async_cart_cache.put(user_id, await AsyncCart.add_item(user_id, item))
+            popularity_tracker.record(product_id, 'cart_add', quantity)
             
             return {
                 'status': 'success',
-                'cart': cart['items'],
-                'total_items': sum(item['quantity'] for item in cart['items']),
+                'cart': cart.items,
+                'total_items': cart.total_items,
+                'cart_version': cart.version,
                 'message': f'Added {product_name} to your cart'
             }
         else:
             # Fallback to in-memory cart
             session_id = request.get('session_id', 'default')
             
-            if session_id not in global_cart:
-                global_cart[session_id] = []
-            
-            # Check if product already in cart
-            existing_item = next((item for item in global_cart[session_id] if item['id'] == product_id), None)
+            def add(cart_items):
+                # Check if product already in cart
+                existing_item = next((item for item in cart_items if item['id'] == product_id), None)
+                
+                if existing_item:
+                    existing_item['quantity'] += quantity
+                else:
+                    cart_items.append({
+                        'id': product_id,
+                        'name': product_name,
+                        'price': price,
+                        'image': image,
+                        'quantity': quantity
+                    })
+                return cart_items
             
-            if existing_item:
-                existing_item['quantity'] += quantity
-            else:
-                global_cart[session_id].append({
-                    'id': product_id,
-                    'name': product_name,
-                    'price': price,
-                    'image': image,
-                    'quantity': quantity
-                })
+            cart_items = await async_global_cart.update(session_id, add, list)
+            popularity_tracker.record(product_id, 'cart_add', quantity)
             
             return {
                 'status': 'success',
-                'cart': global_cart[session_id],
-                'total_items': sum(item['quantity'] for item in global_cart[session_id])
+                'cart': cart_items,
+                'total_items': sum(item['quantity'] for item in cart_items)
             }
     except HTTPException:
         raise
@@ -842,27 +1045,29 @@ async def remove_from_cart(request: dict, authorization: Optional[str] = Header(
         product_id = request.get('product_id')
         
         if MONGODB_ENABLED:
-            user = get_current_user(authorization)
+            user = await current_user(authorization)
             if not user:
                 raise HTTPException(status_code=401, detail="Please login to modify cart")
             
             user_id = user["_id"]
-            cart = Cart.remove_item(user_id, product_id)
+            cart = await async_cart_cache.put(user_id, await AsyncCart.remove_item(user_id, product_id))
             
             return {
                 'status': 'success',
-                'cart': cart['items'],
-                'total_items': sum(item['quantity'] for item in cart['items'])
+                'cart': cart.items,
+                'total_items': cart.total_items,
+                'cart_version': cart.version
             }
         else:
             session_id = request.get('session_id', 'default')
             
-            if session_id in global_cart:
-                global_cart[session_id] = [item for item in global_cart[session_id] if item['id'] != product_id]
+            cart_items = await async_global_cart.update(
+                session_id, lambda items: [item for item in items if item['id'] != product_id], list
+            )
             
             return {
             'status': 'success',
-            'cart': global_cart.get(session_id, [])
+            'cart': cart_items
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -876,17 +1081,20 @@ async def update_cart_quantity(request: dict):
         product_id = request.get('product_id')
         quantity = request.get('quantity', 1)
         
-        if session_id in global_cart:
-            item = next((item for item in global_cart[session_id] if item['id'] == product_id), None)
+        def set_quantity(cart_items):
+            item = next((item for item in cart_items if item['id'] == product_id), None)
             if item:
                 if quantity <= 0:
-                    global_cart[session_id].remove(item)
+                    cart_items.remove(item)
                 else:
                     item['quantity'] = quantity
+            return cart_items
+        
+        cart_items = await async_global_cart.update(session_id, set_quantity, list)
         
         return {
             'status': 'success',
-            'cart': global_cart.get(session_id, [])
+            'cart': cart_items
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -896,7 +1104,7 @@ async def update_cart_quantity(request: dict):
 async def get_cart(session_id: str, authorization: Optional[str] = Header(None)):
     """Get cart contents with UI component"""
     if MONGODB_ENABLED:
-        user = get_current_user(authorization)
+        user = await current_user(authorization)
         if not user:
             return {
                 'status': 'error',
@@ -908,36 +1116,19 @@ async def get_cart(session_id: str, authorization: Optional[str] = Header(None))
                 'ui_props': {}
             }
         
-        user_id = user["_id"]
-        cart = Cart.get_or_create(user_id)
-        cart_items = cart['items']
+        # Totals and CheckoutWizard props come precomputed with the cached cart
+        cart = await user_cart(user["_id"])
     else:
-        cart_items = global_cart.get(session_id, [])
-    
-    total = sum(item['price'] * item['quantity'] for item in cart_items)
-    
-    # Format as CheckoutWizard component data
-    formatted_cart = []
-    for item in cart_items:
-        formatted_cart.append({
-            'id': item.get('id', ''),
-            'name': item.get('name', 'Product'),
-            'price': item.get('price', 0),
-            'quantity': item.get('quantity', 1),
-            'image': item.get('image', 'https://picsum.photos/seed/cart/100/100')
-        })
+        cart = CartView.build(await async_global_cart.get(session_id, []))
     
     return {
         'status': 'success',
-        'cart': cart_items,
-        'total_items': sum(item['quantity'] for item in cart_items),
-        'total_price': total,
+        'cart': cart.items,
+        'total_items': cart.total_items,
+        'total_price': cart.total_price,
+        'cart_version': cart.version,
         'ui_component': 'CheckoutWizard',
-        'ui_props': {
-            'cartItems': formatted_cart,
-            'expressMode': False,
-            'shippingCost': 0
-        }
+        'ui_props': cart.checkout_props()
     }
 
 
@@ -949,7 +1140,7 @@ async def recommend_products(request: dict):
         session_id = request.get('session_id', 'default')
         
         # Get user's cart for context
-        cart_items = global_cart.get(session_id, [])
+        cart_items = await async_global_cart.get(session_id, [])
         
         # Search for products matching the query
         search_result = search_products(query)
@@ -994,7 +1185,7 @@ async def checkout(request: dict, authorization: Optional[str] = Header(None)):
         
         if MONGODB_ENABLED:
             # Require authentication for checkout
-            user = get_current_user(authorization)
+            user = await current_user(authorization)
             if not user:
                 return {
                     'status': 'error',
@@ -1007,9 +1198,10 @@ async def checkout(request: dict, authorization: Optional[str] = Header(None)):
             
             user_id = user["_id"]
             
-            # Get user's cart
-            cart = Cart.get_or_create(user_id)
-            cart_items = cart['items']
+            # Empty the stored cart and take its items in one write (never the
+            # cached copy, which may miss a change made on another worker)
+            cart = await AsyncCart.take_items(user_id)
+            cart_items = cart['items'] if cart else []
             
             if not cart_items:
                 return {
@@ -1017,37 +1209,44 @@ async def checkout(request: dict, authorization: Optional[str] = Header(None)):
                     'message': 'Cart is empty'
                 }
             
+            await async_cart_cache.put(user_id, dict(cart, items=[], version=cart.get('version', 0) + 1))
             total = sum(item['price'] * item['quantity'] for item in cart_items)
             
             # Create order in database
-            order = Order.create(
-                user_id=user_id,
-                items=cart_items,
-                shipping_info=shipping_info,
-                total=total
-            )
+            try:
+                order = await AsyncOrder.create(
+                    user_id=user_id,
+                    items=cart_items,
+                    shipping_info=shipping_info,
+                    total=total
+                )
+            except Exception:
+                # Nothing was ordered - the items go back into the cart
+                await async_cart_cache.put(user_id, await AsyncCart.restore_items(user_id, cart_items))
+                raise
             
-            # Clear cart
-            Cart.clear(user_id)
+            for item in cart_items:
+                popularity_tracker.record(item.get('id'), 'purchase', item.get('quantity', 1))
             
             return {
                 'status': 'success',
                 'order': {
-                    'order_id': order['_id'],
+                    'order_id': order['number'],
                     'items': order['items'],
                     'total': order['total'],
                     'shipping_info': order['shipping_info'],
                     'status': order['status'],
                     'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S")
                 },
-                'message': f'Order {order["_id"][:8]} placed successfully!'
+                'message': f'Order {order["number"]} placed successfully!'
             }
         
         else:
             # Fallback to in-memory mode
             session_id = request.get('session_id', 'default')
             
-            cart_items = global_cart.get(session_id, [])
+            # Taken in one step, so a concurrent checkout can't order the same items
+            cart_items = await async_global_cart.pop(session_id, [])
             if not cart_items:
                 return {
                     'status': 'error',
@@ -1057,7 +1256,7 @@ async def checkout(request: dict, authorization: Optional[str] = Header(None)):
             total = sum(item['price'] * item['quantity'] for item in cart_items)
             
             # Create order
-            order_id = f"ORD-{abs(hash(session_id + str(len(cart_items))))}"[-8:]
+            order_id = new_order_number()
             
             order = {
                 'order_id': order_id,
@@ -1069,12 +1268,9 @@ async def checkout(request: dict, authorization: Optional[str] = Header(None)):
             }
             
             # Save to order history
-            if session_id not in order_history:
-                order_history[session_id] = []
-            order_history[session_id].append(order)
-            
-            # Clear cart after checkout
-            global_cart[session_id] = []
+            await async_order_history.update(session_id, lambda orders: orders + [order], list)
+            for item in cart_items:
+                popularity_tracker.record(item.get('id'), 'purchase', item.get('quantity', 1))
             
             return {
                 'status': 'success',
@@ -1088,24 +1284,48 @@ async def checkout(request: dict, authorization: Optional[str] = Header(None)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _memory_order_page(orders: List[Dict[str, Any]], limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """get_order_page for in-memory order history (kept oldest first); the cursor is an offset"""
+    try:
+        start = int(cursor) if cursor else 0
+    except ValueError:
+        raise ValueError(f"Invalid order cursor: {cursor!r}")
+    newest_first = orders[::-1]
+    end = start + max(1, min(limit, 100))
+    return {
+        'orders': newest_first[start:end],
+        'next_cursor': str(end) if end < len(newest_first) else None
+    }
+
+
+def _memory_order(orders: List[Dict[str, Any]], number: str) -> Optional[Dict[str, Any]]:
+    """An in-memory order by its number (as typed, or as stored by older versions), or None"""
+    numbers = {number, normalize_order_number(number)}
+    return next((order for order in orders if order['order_id'] in numbers), None)
+
+
+def _order_summary(formatted: Dict[str, Any]) -> Dict[str, Any]:
+    """A formatted order with item counts in place of the items"""
+    items = formatted.pop('items', None) or []
+    formatted['itemCount'] = len(items)
+    formatted['totalQuantity'] = sum(item.get('quantity', 1) for item in items)
+    return formatted
+
+
 @app.get("/orders/{session_id}")
-async def get_orders(session_id: str, authorization: Optional[str] = Header(None)):
-    """Get order history for a user"""
-    print(f"\n{'='*80}")
-    print(f"📥 GET /orders/{session_id} endpoint called")
-    print(f"🔑 Authorization header: {authorization[:50] if authorization else 'None'}...")
-    print(f"📊 MongoDB enabled: {MONGODB_ENABLED}")
-    print(f"{'='*80}\n")
+async def get_orders(session_id: str, authorization: Optional[str] = Header(None),
+                     limit: int = 20, cursor: Optional[str] = None, summary: bool = False):
+    """
+    Get order history for a user, newest first, one page at a time
     
+    Query parameters: limit (max 100), cursor (next_cursor from the previous
+    page) and summary (item counts instead of items, for compact lists).
+    """
     try:
         if MONGODB_ENABLED:
-            print(f"🔄 Getting current user from authorization token...")
-            user = get_current_user(authorization)
-            print(f"👤 User retrieved: {user['email'] if user else 'None'}")
-            print(f"👤 User ID: {user['_id'] if user else 'None'}")
+            user = await current_user(authorization)
             
             if not user:
-                print(f"❌ No user found - returning error response")
                 return {
                     'status': 'error',
                     'orders': [],
@@ -1116,60 +1336,112 @@ async def get_orders(session_id: str, authorization: Optional[str] = Header(None
                 }
             
             user_id = user["_id"]
-            print(f"📥 Fetching orders for user_id: {user_id}")
-            orders = Order.get_user_orders(user_id)
-            print(f"📦 Raw orders retrieved: {len(orders)}")
-            
-            for idx, order in enumerate(orders):
-                print(f"  📋 Raw Order {idx + 1}: ID={order['_id']}, Items={len(order.get('items', []))}, Total=${order.get('total', 0)}")
+            page = await AsyncOrder.get_order_page(user_id, limit, cursor, 'summary' if summary else 'list')
+            orders = page['orders']
+            # One page holds them all unless there are more pages (or this isn't the first)
+            total_orders = (
+                await AsyncOrder.count_user_orders(user_id) if page['next_cursor'] or cursor else len(orders)
+            )
             
             # Format for UI
-            print(f"🔄 Formatting orders for UI...")
             formatted_orders = []
             for order in orders:
-                formatted_orders.append({
-                    'orderId': order['_id'][:8],
+                formatted = {
+                    'orderId': Order.display_number(order),
                     'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
-                    'items': order['items'],
                     'total': order['total'],
-                    'status': order['status'],
-                    'shipping_info': order.get('shipping_info', {})
-                })
-            
-            return {
-                'status': 'success',
-                'orders': formatted_orders,
-                'total_orders': len(formatted_orders),
-                'ui_component': 'OrderHistory',
-                'ui_props': {
-                    'orders': formatted_orders
+                    'status': order['status']
                 }
-            }
+                if summary:
+                    formatted['itemCount'] = order['item_count']
+                    formatted['totalQuantity'] = order['total_quantity']
+                else:
+                    formatted['items'] = order['items']
+                    formatted['shipping_info'] = order.get('shipping_info', {})
+                formatted_orders.append(formatted)
         
         else:
             # Fallback to in-memory mode
-            orders = order_history.get(session_id, [])
+            all_orders = await async_order_history.get(session_id, [])
+            page = _memory_order_page(all_orders, limit, cursor)
+            total_orders = len(all_orders)
             
             formatted_orders = []
-            for order in orders:
-                formatted_orders.append({
+            for order in page['orders']:
+                formatted = {
                     'orderId': order['order_id'],
                     'date': order['date'],
                     'items': order['items'],
                     'total': order['total'],
                     'status': order['status'],
                     'shipping_info': order.get('shipping_info', {})
-                })
-            return {
-                'status': 'success',
-                'orders': formatted_orders,
-                'total_orders': len(formatted_orders),
-                'ui_component': 'OrderHistory',
-                'ui_props': {
-                    'orders': formatted_orders
                 }
+                if summary:
+                    del formatted['shipping_info']
+                    formatted = _order_summary(formatted)
+                formatted_orders.append(formatted)
+        
+        return {
+            'status': 'success',
+            'orders': formatted_orders,
+            # All of the user's orders; next_cursor is set when there are more pages
+            'total_orders': total_orders,
+            'next_cursor': page['next_cursor'],
+            'ui_component': 'OrderHistory',
+            'ui_props': {
+                'orders': formatted_orders
             }
+        }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/orders/{session_id}/{order_number}")
+async def get_order(session_id: str, order_number: str, authorization: Optional[str] = Header(None)):
+    """Get one order by its number (order tracking)"""
+    try:
+        if MONGODB_ENABLED:
+            user = await current_user(authorization)
+            if not user:
+                raise HTTPException(status_code=401, detail='Please login to view your orders')
+            order = await AsyncOrder.get_by_number(user["_id"], order_number)
+            if order:
+                order = {
+                    'orderId': Order.display_number(order),
+                    'date': order['created_at'].strftime("%Y-%m-%d %H:%M:%S"),
+                    'items': order['items'],
+                    'total': order['total'],
+                    'status': order['status'],
+                    'shipping_info': order.get('shipping_info', {})
+                }
+        else:
+            order = _memory_order(await async_order_history.get(session_id, []), order_number)
+            if order:
+                order = {
+                    'orderId': order['order_id'],
+                    'date': order['date'],
+                    'items': order['items'],
+                    'total': order['total'],
+                    'status': order['status'],
+                    'shipping_info': order.get('shipping_info', {})
+                }
+        
+        if not order:
+            raise HTTPException(status_code=404, detail=f'Order {order_number} not found')
+        return {
+            'status': 'success',
+            'order': order,
+            'ui_component': 'OrderHistory',
+            'ui_props': {
+                'orders': [order]
+            }
+        }
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1195,37 +1467,37 @@ async def export_order_pdf(request: dict, authorization: str = Header(None)):
         
         if MONGODB_ENABLED:
             # Get orders from MongoDB
-            user = get_current_user(authorization)
+            user = await current_user(authorization)
             if not user:
                 print("❌ User not authenticated!")
                 raise HTTPException(status_code=401, detail='Please login to export orders')
             
             print(f"✅ User authenticated: {user.get('email')}")
-            all_orders = Order.get_user_orders(user["_id"])
-            print(f"📋 Total user orders: {len(all_orders)}")
             
             # Filter orders based on parameters
             if order_id:
-                # Export specific order
+                # Export specific order - one indexed read by its number
                 print(f"🔍 Looking for order ID: {order_id}")
-                orders = [o for o in all_orders if str(o.get('_id'))[:8] == order_id[:8]]
-                if not orders:
+                order = await AsyncOrder.get_by_number(user["_id"], order_id)
+                if not order:
                     print(f"❌ Order {order_id} not found!")
                     raise HTTPException(status_code=404, detail=f'Order {order_id} not found')
-                print(f"✅ Found order: {orders[0].get('_id')}")
-            elif export_all:
-                # Export all orders
-                orders = all_orders
-                print(f"📦 Exporting all {len(orders)} orders")
+                orders = [order]
+                print(f"✅ Found order: {order.get('_id')}")
             else:
-                # Default: export last order (backward compatible)
-                if all_orders:
-                    orders = [all_orders[-1]]
-                    print(f"📦 Exporting last order (default)")
+                # Default, and export_all until multi-order PDFs exist: the
+                # latest order - one indexed read however many orders there are
+                orders = (await AsyncOrder.get_order_page(user["_id"], limit=1, view='full'))['orders']
+                print(f"📦 Exporting last order")
         else:
             # Fallback to in-memory
-            orders = order_history.get(session_id, [])
+            orders = await async_order_history.get(session_id, [])
             print(f"📋 In-memory orders found: {len(orders)}")
+            if order_id:
+                order = _memory_order(orders, order_id)
+                if not order:
+                    raise HTTPException(status_code=404, detail=f'Order {order_id} not found')
+                orders = [order]
         
         if not orders:
             print("❌ No orders found!")
@@ -1250,8 +1522,8 @@ async def export_order_pdf(request: dict, authorization: str = Header(None)):
         shipping = order.get('shipping_info', {})
         shipping_address = f"{shipping.get('name', 'N/A')}, {shipping.get('address', 'N/A')}, {shipping.get('city', 'N/A')} {shipping.get('zip', 'N/A')}"
         
-        # Get order ID (MongoDB uses _id, in-memory uses order_id)
-        order_id = order.get('order_id') or order.get('_id', 'N/A')
+        # Get order number (MongoDB uses number, or the _id prefix for older orders; in-memory uses order_id)
+        order_id = order.get('order_id') or (Order.display_number(order) if '_id' in order else 'N/A')
         
         # Format order data to match export_agent expectations
         order_data = {
@@ -1330,6 +1602,8 @@ async def virtual_tryon(
         print(f"📸 User image: {user_image.filename}")
         print(f"🆔 Product ID: {product_id}")
         
+        popularity_tracker.record(product_id, 'view')
+        
         # Read user image
         user_image_bytes = await user_image.read()
         print(f"✅ User image loaded: {len(user_image_bytes)} bytes")
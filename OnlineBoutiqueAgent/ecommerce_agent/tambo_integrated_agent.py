@@ -12,9 +12,11 @@ from google.adk.sessions import Session
 try:
     from ecommerce_agent.agent import root_agent, runner, tambo_ui_engine
     from ecommerce_agent.agents.order_placement_agent.agent import order_placement_agent
+    from ecommerce_agent.product_records import freeze_product, freeze_products
 except ImportError:
     from agent import root_agent, runner, tambo_ui_engine
     from agents.order_placement_agent.agent import order_placement_agent
+    from product_records import freeze_product, freeze_products
 
 
 class TamboIntegratedAgent:
@@ -112,7 +114,7 @@ class TamboIntegratedAgent:
     
     def set_products(self, products: list):
         """Manually set products in context (for demo/testing)"""
-        self.context['products'] = products
+        self.context['products'] = freeze_products(products)
     
     def set_cart_items(self, cart_items: list):
         """Manually set cart items in context (for demo/testing)"""
@@ -120,7 +122,7 @@ class TamboIntegratedAgent:
     
     def select_product(self, product: dict):
         """Set the currently selected product"""
-        self.context['selected_product'] = product
+        self.context['selected_product'] = freeze_product(product)
 
 
 # Create singleton instance
@@ -6,7 +6,48 @@ based on agent responses and user intent.
 
 from typing import Dict, List, Any, Optional
 from pydantic import BaseModel
+from datetime import datetime, timezone
 import json
+import os
+import sys
+import time
+
+try:
+    from commerce_genui.intent_engine import IntentEngine, IntentRule
+    from commerce_genui.decision_cache import (
+        DEFAULT_CACHE_SIZE, DecisionCache, Unfingerprintable, context_fingerprint, normalize_message
+    )
+except ImportError:
+    # Monorepo checkout without the SDK installed - use it from commerce-genui/
+    sys.path.insert(0, os.path.abspath(os.path.join(
+        os.path.dirname(__file__), '..', '..', 'commerce-genui', 'packages', 'core'
+    )))
+    from commerce_genui.intent_engine import IntentEngine, IntentRule
+    from commerce_genui.decision_cache import (
+        DEFAULT_CACHE_SIZE, DecisionCache, Unfingerprintable, context_fingerprint, normalize_message
+    )
+
+try:
+    from ecommerce_agent.bundle_solver import (
+        BundleSolver, BUNDLE_DISCOUNT_PERCENT, DEFAULT_OUTFIT_CATEGORIES, parse_budget, parse_price
+    )
+    from ecommerce_agent.deals_engine import deals_engine
+    from ecommerce_agent.price_history import price_history
+    from ecommerce_agent.product_records import freeze_product, freeze_products
+except ImportError:
+    from bundle_solver import (
+        BundleSolver, BUNDLE_DISCOUNT_PERCENT, DEFAULT_OUTFIT_CATEGORIES, parse_budget, parse_price
+    )
+    from deals_engine import deals_engine
+    from price_history import price_history
+    from product_records import freeze_product, freeze_products
+
+# Props worth memoizing (they run the bundle solver), with the context keys they read
+CACHED_PROPS_FIELDS = {
+    'OutfitBoard': ('products', 'outfit_categories', 'outfit_items', 'budget'),
+    'BundleBuilder': ('products', 'bundle_categories', 'bundle_items', 'budget'),
+}
+
 
 class UIComponentConfig(BaseModel):
     """Configuration for a UI component to be rendered"""
@@ -24,7 +65,7 @@ class TamboUIDecisionEngine:
     - Current context (cart, products, etc.)
     """
     
-    def __init__(self):
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
         self.registered_components = {
             'ProductGrid': 'Shows products in a grid layout',
             'ComparisonTable': 'Compares multiple products side by side',
@@ -38,6 +79,18 @@ class TamboUIDecisionEngine:
             'PriceTrendChart': 'Historical price trend visualization'
         }
         
+        # Bundle/outfit solver plus (key, candidate index) of the last product list it saw,
+        # swapped as one tuple so concurrent requests never pair a key with another's index
+        self.bundle_solver = BundleSolver()
+        self._bundle_index = None
+        self.price_history = price_history
+        self.deals_engine = deals_engine
+        
+        # Normalized message -> component, and solver-backed props by context
+        # fingerprint (cache_size=0 disables both)
+        self.decision_cache = DecisionCache(cache_size)
+        self._props_cache = DecisionCache(cache_size)
+        
         # Intent to component mapping
         self.intent_mappings = {
             # Budget-related
@@ -85,55 +138,53 @@ class TamboUIDecisionEngine:
             'browse': ['ProductGrid'],
             'search': ['ProductGrid'],
         }
+        
+        # Shared SDK matcher: each keyword votes for its components, the first
+        # listed component at a higher priority than the rest
+        self.intent_engine = IntentEngine(
+            IntentRule((keyword,), component, 2 if rank == 0 else 1)
+            for keyword, component_list in self.intent_mappings.items()
+            for rank, component in enumerate(component_list)
+        )
     
     def analyze_intent(self, user_message: str, agent_response: str = "") -> List[str]:
         """
         Analyze user message and agent response to determine intent
-        Returns list of relevant component names
+        Returns relevant component names, best match first
         """
-        components = set()
-        message_lower = user_message.lower()
-        response_lower = agent_response.lower()
-        
-        # Check user message for intent keywords
-        for keyword, component_list in self.intent_mappings.items():
-            if keyword in message_lower or keyword in response_lower:
-                components.update(component_list)
+        components = [scored.label for scored in self.intent_engine.score(user_message, agent_response)]
         
         # Default to ProductGrid if no specific intent found
-        if not components:
-            components.add('ProductGrid')
-        
-        return list(components)
+        return components or ['ProductGrid']
     
     def decide_ui_component(
         self,
         user_message: str,
         agent_response: str,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        build_props: bool = True
     ) -> UIComponentConfig:
         """
         Main decision function - returns the best UI component to render
         This is called after each agent response
+        
+        build_props=False only picks the component (props are left empty)
         """
         context = context or {}
         
-        # Analyze intent
-        candidate_components = self.analyze_intent(user_message, agent_response)
-        
-        # Prioritize based on context
-        if context.get('cart_items') and len(context['cart_items']) > 0:
-            # If cart has items, prioritize cart-related components
-            if 'SmartCartOptimizer' in candidate_components:
-                candidate_components.insert(0, 'SmartCartOptimizer')
-            if 'checkout' in user_message.lower() or 'buy' in user_message.lower():
-                candidate_components.insert(0, 'CheckoutWizard')
-        
-        # Get the highest priority component
-        selected_component = candidate_components[0] if candidate_components else 'ProductGrid'
+        # The choice depends only on the text and on whether the cart has items
+        message = normalize_message(user_message)
+        key = (message, normalize_message(agent_response), bool(context.get('cart_items')))
+        selected_component = self.decision_cache.get(key)
+        if selected_component is None:
+            selected_component = self.decision_cache.put(
+                key, self._select_component(user_message, agent_response, context)
+            )
         
         # Build props based on component and context
-        props = self._build_props(selected_component, context)
+        props = {}
+        if build_props:
+            props = self._cached_props(selected_component, message, {**context, 'user_message': user_message})
         
         # Determine reason for selection
         reason = self._get_selection_reason(selected_component, user_message)
@@ -145,53 +196,56 @@ class TamboUIDecisionEngine:
             reason=reason
         )
     
-    def _convert_product_features_to_array(self, product: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Convert product features from object format to array format
-        Old format: {"features": {"color": "red", "size": "M"}}
-        New format: {"features": [{"key": "color", "value": "red"}, {"key": "size", "value": "M"}]}
-        """
-        if 'features' not in product:
-            # If no features, add empty array
-            product['features'] = []
-            return product
-        
-        features = product['features']
-        
-        # If already in array format, return as is
-        if isinstance(features, list):
-            return product
+    def _select_component(self, user_message: str, agent_response: str, context: Dict[str, Any]) -> str:
+        """Best component for the message, preferring cart components when the cart has items"""
+        # Analyze intent
+        candidate_components = self.analyze_intent(user_message, agent_response)
         
-        # Convert object to array format
-        if isinstance(features, dict):
-            product['features'] = [
-                {"key": key, "value": value}
-                for key, value in features.items()
-            ]
-        else:
-            # If features is neither dict nor list, set to empty array
-            product['features'] = []
+        # Prioritize based on context
+        if context.get('cart_items') and len(context['cart_items']) > 0:
+            # If cart has items, prioritize cart-related components
+            if 'SmartCartOptimizer' in candidate_components:
+                candidate_components.insert(0, 'SmartCartOptimizer')
+            if 'checkout' in user_message.lower() or 'buy' in user_message.lower():
+                candidate_components.insert(0, 'CheckoutWizard')
         
-        return product
+        # Get the highest priority component
+        return candidate_components[0] if candidate_components else 'ProductGrid'
+    
+    def _cached_props(self, component_name: str, message: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """_build_props, memoized for the solver-backed components (budget comes from the message)"""
+        fields = CACHED_PROPS_FIELDS.get(component_name)
+        if fields is None:
+            return self._build_props(component_name, context)
+        try:
+            key = (component_name, message, context_fingerprint(context, fields))
+        except Unfingerprintable:
+            return self._build_props(component_name, context)
+        props = self._props_cache.get(key)
+        if props is None:
+            props = self._props_cache.put(key, self._build_props(component_name, context))
+        # Callers get their own top-level dict (they set 'products'); nested values are shared
+        return dict(props)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Decision cache size and hit rate (solver-backed props under "props")"""
+        stats = self.decision_cache.stats()
+        stats['props'] = self._props_cache.stats()
+        return stats
     
     def _build_props(self, component_name: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Build props for the selected component based on context"""
         
         if component_name == 'ProductGrid':
-            products = context.get('products', [])
-            # Convert all products to new features format
-            converted_products = [self._convert_product_features_to_array(p.copy()) for p in products]
+            # Records are normalized and frozen at ingest - share them, don't copy
             return {
-                'products': converted_products,
+                'products': freeze_products(context.get('products')),
                 'columns': 4
             }
         
         elif component_name == 'ComparisonTable':
-            products = context.get('products', [])[:4]  # Max 4 for comparison
-            # Convert all products to new features format
-            converted_products = [self._convert_product_features_to_array(p.copy()) for p in products]
             return {
-                'products': converted_products
+                'products': freeze_products(context.get('products'))[:4]  # Max 4 for comparison
             }
         
         elif component_name == 'BudgetSlider':
@@ -204,23 +258,8 @@ class TamboUIDecisionEngine:
             }
         
         elif component_name == 'DealBadgePanel':
-            products = context.get('products', [])
-            # Convert products to deals format
-            deals = []
-            for i, product in enumerate(products[:6]):
-                discount = 15 + (i * 5)  # Simulated discounts
-                original_price = product.get('price', 100)
-                deals.append({
-                    'id': product.get('id', f'deal-{i}'),
-                    'productName': product.get('name', 'Product'),
-                    'originalPrice': original_price,
-                    'discountedPrice': original_price * (1 - discount / 100),
-                    'discountPercent': discount,
-                    'badge': f'{discount}% OFF',
-                    'image': product.get('image', ''),
-                    'expiresIn': '24 hours'
-                })
-            return {'deals': deals}
+            # Ranked at catalog refresh time - nothing to compute per request
+            return {'deals': self.deals_engine.top_deals()}
         
         elif component_name == 'TryOnStudio':
             product = context.get('selected_product') or (context.get('products', [{}])[0] if context.get('products') else {})
@@ -230,16 +269,40 @@ class TamboUIDecisionEngine:
             }
         
         elif component_name == 'OutfitBoard':
+            index = self._get_bundle_index(context.get('products', []))
+            categories = list(dict.fromkeys(context.get('outfit_categories') or DEFAULT_OUTFIT_CATEGORIES))
+            outfits = self._solve_bundles(index, categories, context)
+            # Only a complete outfit is preselected; a missing category shows as an empty column
+            selected = context.get('outfit_items') or (outfits[0].items if outfits and outfits[0].complete else [])
             return {
-                'availableItems': context.get('products', []),
-                'currentOutfit': context.get('outfit_items', [])
+                'categories': [
+                    {
+                        'name': category.title(),
+                        'items': [self._bundle_item(c.product) for c in index.by_category.get(category, [])]
+                    }
+                    for category in categories
+                ],
+                'selectedOutfit': [self._bundle_item(item) for item in selected],
+                'missingCategories': list(outfits[0].missing_categories) if outfits else []
             }
         
         elif component_name == 'BundleBuilder':
+            products = context.get('products', [])
+            index = self._get_bundle_index(products)
+            # Default to one item from each of the first three categories on offer
+            categories = context.get('bundle_categories') or index.categories()[:3]
+            bundles = self._solve_bundles(index, categories, context)
+            items = [self._bundle_item(item) for item in (
+                context.get('bundle_items') or (bundles[0].items if bundles and bundles[0].complete else [])
+            )]
+            # The priciest item anchors the bundle; the rest are the add-ons it discounts.
+            # Nothing fits (budget, missing category): offer the top product on its own
+            items.sort(key=lambda item: -item['price'])
             return {
-                'availableProducts': context.get('products', []),
-                'selectedProducts': context.get('bundle_items', []),
-                'bundleDiscount': 15
+                'mainProduct': items[0] if items else self._bundle_item(products[0] if products else {}),
+                'suggestedItems': items[1:],
+                'discountPercent': BUNDLE_DISCOUNT_PERCENT,
+                'missingCategories': list(bundles[0].missing_categories) if bundles else []
             }
         
         elif component_name == 'CheckoutWizard':
@@ -256,14 +319,65 @@ class TamboUIDecisionEngine:
         
         elif component_name == 'PriceTrendChart':
             product = context.get('selected_product') or (context.get('products', [{}])[0] if context.get('products') else {})
+            days = context.get('price_window_days', 30)
+            # Day-aligned buckets line up with the store's daily segments
+            start = (int(time.time()) // 86400 - (days - 1)) * 86400
+            series = self.price_history.query(product.get('id', ''), start, start + days * 86400 - 1, buckets=days)
+            lows = [point['min'] for point in series]
+            highs = [point['max'] for point in series]
+            current_price = parse_price(product.get('price', 100)) or 0
             return {
                 'productName': product.get('name', 'Product'),
-                'currentPrice': product.get('price', 100),
-                'priceDropAlert': context.get('price_alert', False)
+                'currentPrice': current_price,
+                'priceDropAlert': context.get('price_alert', False),
+                'product': {
+                    'id': product.get('id', ''),
+                    'name': product.get('name', 'Product'),
+                    'currentPrice': current_price
+                },
+                'priceHistory': [
+                    {
+                        'date': datetime.fromtimestamp(point['ts'], timezone.utc).strftime('%Y-%m-%d'),
+                        'price': point['last'],
+                        'low': point['min'],
+                        'high': point['max']
+                    }
+                    for point in series
+                ],
+                'lowestPrice': min(lows) if lows else current_price,
+                'highestPrice': max(highs) if highs else current_price,
+                # Mean of per-bucket closing prices
+                'averagePrice': round(sum(p['last'] for p in series) / len(series), 2) if series else current_price
             }
         
         return {}
     
+    def _get_bundle_index(self, products: List[Dict[str, Any]]):
+        """Return the solver's candidate index, rebuilding only when the product list changes"""
+        key = tuple((p.get('id'), p.get('price')) for p in products)
+        cached = self._bundle_index
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        index = self.bundle_solver.build_index(products)
+        self._bundle_index = (key, index)
+        return index
+    
+    def _solve_bundles(self, index, categories, context: Dict[str, Any]):
+        """Run the bundle solver with the budget from context or the user's message"""
+        budget = context.get('budget') or parse_budget(context.get('user_message', ''))
+        return self.bundle_solver.solve(index, categories, budget=budget)
+    
+    def _bundle_item(self, product: Dict[str, Any]) -> Dict[str, Any]:
+        """A product as BundleBuilder/OutfitBoard items expect it (numeric price, slot as category)"""
+        product_id = product.get('id', '')
+        return {
+            'id': product_id,
+            'name': product.get('name', 'Item'),
+            'price': parse_price(product.get('price')) or 0,
+            'image': product.get('image') or f'https://picsum.photos/seed/{product_id or "bundle"}/200/200',
+            'category': self.bundle_solver.category_fn(product).title()
+        }
+    
     def _get_selection_reason(self, component_name: str, user_message: str) -> str:
         """Generate human-readable reason for component selection"""
         
@@ -382,16 +496,17 @@ def get_tambo_ui_config() -> Dict[str, Any]:
                 "path": "./frontend/components/OutfitBoard.tsx",
                 "description": "Mix and match outfit builder",
                 "props_schema": {
-                    "availableItems": "array",
-                    "currentOutfit": "array"
+                    "categories": "array",
+                    "selectedOutfit": "array"
                 }
             },
             "BundleBuilder": {
                 "path": "./frontend/components/BundleBuilder.tsx",
                 "description": "Create product bundles",
                 "props_schema": {
-                    "availableProducts": "array",
-                    "selectedProducts": "array"
+                    "mainProduct": "object",
+                    "suggestedItems": "array",
+                    "discountPercent": "number"
                 }
             },
             "CheckoutWizard": {
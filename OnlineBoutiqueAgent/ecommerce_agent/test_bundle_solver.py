@@ -0,0 +1,126 @@
+"""
+Bundle solver checks: the branch-and-bound search against brute force.
+
+    python -m pytest test_bundle_solver.py
+"""
+
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bundle_solver import BundleSolver, default_score, parse_budget
+
+CATEGORIES = ('top', 'bottom', 'footwear', 'accessory')
+
+
+def _catalog(rng: random.Random, size: int):
+    return [
+        {
+            'id': f'p{i}',
+            'name': f'Product {i}',
+            'slot': rng.choice(CATEGORIES),
+            'price': f'${rng.uniform(5, 120):.2f}',
+            # Coarse scores so ties (broken by price) actually happen
+            'rating': rng.choice([3.0, 3.5, 4.0, 4.5, 5.0]),
+        }
+        for i in range(size)
+    ]
+
+
+def _brute_force(index, categories, budget, top_n):
+    """Every combination, ranked the way the solver ranks: score desc, then price asc"""
+    slots = [index.by_category[c] for c in categories if index.by_category.get(c)]
+    if not slots:
+        return []
+    combos = []
+    for picks in itertools.product(*slots):
+        price = sum(c.price for c in picks)
+        if budget is None or price <= budget:
+            combos.append((sum(c.score for c in picks), price))
+    combos.sort(key=lambda combo: (-combo[0], combo[1]))
+    return combos[:top_n]
+
+
+def test_matches_brute_force():
+    rng = random.Random(7)
+    solver = BundleSolver()
+    for _ in range(200):
+        index = solver.build_index(_catalog(rng, rng.randint(4, 30)))
+        categories = rng.sample(CATEGORIES, rng.randint(1, 4))
+        budget = rng.choice([None, 60.0, 120.0, 200.0])
+        top_n = rng.randint(1, 4)
+        bundles = solver.solve(index, categories, budget=budget, top_n=top_n, latency_budget_ms=1000)
+        expected = _brute_force(index, categories, budget, top_n)
+        assert len(bundles) == len(expected)
+        for bundle, (score, price) in zip(bundles, expected):
+            assert abs(bundle.score - score) < 1e-9
+            assert abs(bundle.total_price - price) < 1e-6
+            assert budget is None or bundle.total_price <= budget
+
+
+def test_one_item_per_category():
+    solver = BundleSolver()
+    index = solver.build_index(_catalog(random.Random(1), 40))
+    for bundle in solver.solve(index, ['top', 'footwear', 'accessory'], budget=250):
+        assert sorted(item['slot'] for item in bundle.items) == ['accessory', 'footwear', 'top']
+        assert bundle.complete
+
+
+def test_missing_category_is_marked():
+    solver = BundleSolver()
+    index = solver.build_index([
+        {'id': 'a', 'name': 'Tank Top', 'price': '$18.99'},
+        {'id': 'b', 'name': 'Loafers', 'price': '$89.99'},
+    ])
+    bundles = solver.solve(index, ['top', 'footwear', 'accessory'])
+    assert bundles and not bundles[0].complete
+    assert bundles[0].missing_categories == ('accessory',)
+    assert bundles[0].to_dict()['missingCategories'] == ['accessory']
+    assert solver.solve(index, ['accessory']) == []
+
+
+def test_over_budget_returns_nothing():
+    solver = BundleSolver()
+    index = solver.build_index([
+        {'id': 'a', 'name': 'Tank Top', 'price': '$18.99'},
+        {'id': 'b', 'name': 'Loafers', 'price': '$89.99'},
+    ])
+    assert solver.solve(index, ['top', 'footwear'], budget=100) == []
+    assert len(solver.solve(index, ['top', 'footwear'], budget=110)) == 1
+
+
+def test_unparseable_values():
+    solver = BundleSolver()
+    index = solver.build_index([
+        {'id': 'a', 'name': 'Tank Top', 'price': 'call us'},
+        {'id': 'b', 'name': 'Shirt', 'price': '$1,019.50', 'rating': 'n/a'},
+    ])
+    assert [c.product['id'] for c in index.by_category['top']] == ['b']
+    assert index.by_category['top'][0].price == 1019.5
+    assert default_score({'rating': {'stars': 5}}) == 1.0
+    assert parse_budget("something under $150 please") == 150.0
+    assert parse_budget("anything nice") is None
+
+
+def test_ui_props_match_frontend_schemas():
+    from tambo_ui_engine import TamboUIDecisionEngine
+
+    engine = TamboUIDecisionEngine()
+    products = [
+        {'id': 'a', 'name': 'Tank Top', 'price': '$18.99'},
+        {'id': 'b', 'name': 'Loafers', 'price': '$89.99'},
+        {'id': 'c', 'name': 'Sunglasses', 'price': '$19.99'},
+    ]
+    bundle = engine._build_props('BundleBuilder', {'products': products, 'user_message': 'bundle'})
+    assert bundle['mainProduct']['id'] == 'b' and bundle['mainProduct']['price'] == 89.99
+    assert [item['category'] for item in bundle['suggestedItems']] == ['Accessory', 'Top']
+    assert bundle['discountPercent'] == 15
+
+    outfit = engine._build_props('OutfitBoard', {'products': products[:2], 'user_message': 'outfit'})
+    assert [c['name'] for c in outfit['categories']] == ['Top', 'Footwear', 'Accessory']
+    assert outfit['categories'][2]['items'] == [] and outfit['missingCategories'] == ['accessory']
+    # Incomplete outfits aren't preselected
+    assert outfit['selectedOutfit'] == []
@@ -0,0 +1,88 @@
+"""
+Cart cache checks: write-through views, version checks between processes,
+out-of-order writes, TTL and LRU bounds.
+
+    python -m pytest test_cart_cache.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cart_cache import CartCache, CartView
+from session_store import InMemorySessionStore
+
+ITEM = {'id': 'OLJCESPC7Z', 'name': 'Sunglasses', 'price': 19.99, 'quantity': 2}
+
+
+def _cart(version, quantity=2):
+    return {'_id': 'c1', 'user_id': 'u1', 'items': [dict(ITEM, quantity=quantity)], 'version': version}
+
+
+def test_views_carry_totals_and_checkout_props():
+    view = CartView.from_cart(_cart(3))
+    assert view.total_items == 2 and round(view.total_price, 2) == 39.98 and view.version == 3
+    props = view.checkout_props()
+    assert props['cartItems'][0]['image'] and props['cartItems'][0]['quantity'] == 2
+    # Carts written before versions existed
+    assert CartView.from_cart({'items': []}).version == 0
+
+
+def test_writes_go_through():
+    cache = CartCache()
+    assert cache.get('u1') is None
+    view = cache.put('u1', _cart(1))
+    assert cache.get('u1') is view
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_older_write_does_not_replace_newer():
+    cache = CartCache()
+    newer = cache.put('u1', _cart(5, quantity=3))
+    # A request that read version 4 finishing late
+    assert cache.put('u1', _cart(4)) is newer
+    assert cache.get('u1') is newer and cache.stats()['stale_writes'] == 1
+
+
+def test_change_on_another_worker_is_seen():
+    versions = InMemorySessionStore(namespace='cart_versions')
+    here, there = CartCache(versions=versions), CartCache(versions=versions)
+    assert here.shared and not CartCache().shared
+    here.put('u1', _cart(1))
+    assert here.get('u1').version == 1
+
+    there.put('u1', _cart(2, quantity=5))
+    assert here.get('u1') is None and here.stats()['outdated'] == 1
+    assert there.get('u1').total_items == 5
+
+    # A late, older write never lowers the published version
+    here.put('u1', _cart(1))
+    assert versions.get('u1') == 2 and here.get('u1') is None
+
+
+def test_version_expired_from_the_store_is_a_miss():
+    versions = InMemorySessionStore(namespace='cart_versions')
+    cache = CartCache(versions=versions)
+    cache.put('u1', _cart(1))
+    versions.delete('u1')
+    assert cache.get('u1') is None
+
+
+def test_ttl_and_lru_bounds():
+    now = [0.0]
+    cache = CartCache(ttl_seconds=10, max_entries=2, clock=lambda: now[0])
+    for user_id in ('a', 'b'):
+        cache.put(user_id, _cart(1))
+    cache.get('a')
+    cache.put('c', _cart(1))
+    # 'b' was least recently used
+    assert cache.get('b') is None and cache.get('a') and cache.get('c')
+    now[0] = 10
+    assert cache.get('a') is None and cache.stats()['entries'] == 1
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = CartCache(ttl_seconds=0)
+    assert cache.put('u1', _cart(1)).total_items == 2
+    assert cache.get('u1') is None
@@ -0,0 +1,51 @@
+"""
+Chat router checks: the compiled router against the keyword cascade it replaced.
+
+    python -m pytest test_chat_router.py
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from chat_router import BENCHMARK_MESSAGES, CHAT_ROUTES, ChatRouter, Route, cascade_route
+
+FILLER = ['please', 'show', 'my', 'me', 'the', 'in', 'new', 'sign', 'cart', 'red', 'sunglasses', "what's", '?', '!']
+
+
+def test_examples():
+    router = ChatRouter()
+    assert router.route("Show me my cart") == 'cart'
+    assert router.route("red sunglasses") == 'search'
+    assert router.route("Sign in") == 'login'
+    # "create account" vetoes login even though "login" fires
+    assert router.route("login or create account") == 'signup'
+    assert router.route("my cart, not my account") == 'cart'
+    assert router.route("") == 'search'
+
+
+def test_matches_cascade():
+    router = ChatRouter()
+    keywords = [k for route in CHAT_ROUTES for k in route.keywords + route.unless]
+    rng = random.Random(2)
+    messages = list(BENCHMARK_MESSAGES)
+    for _ in range(5000):
+        words = rng.choices(FILLER + keywords, k=rng.randint(0, 6))
+        # Glue some words together so keywords also appear inside other words
+        messages.append(''.join(w + rng.choice([' ', ' ', '']) for w in words).upper() if rng.random() < 0.2
+                        else ' '.join(words))
+    for message in messages:
+        assert router.route(message) == cascade_route(message), message
+
+
+def test_overlapping_keywords_are_all_seen():
+    routes = (
+        Route('a', ('cart',)),
+        Route('b', ('art', 'car'), unless=('cartoon',)),
+    )
+    router = ChatRouter(routes, default='none')
+    for message in ('cartoon', 'art', 'cart', 'a car', 'cartoon art', 'nothing'):
+        assert router.route(message) == cascade_route(message, routes, 'none'), message
+    assert router.route('cartoon art') == 'a'
@@ -0,0 +1,113 @@
+"""
+Compact context checks: a client applying deltas ends up with the session's context.
+
+    python -m pytest test_context_sync.py
+"""
+
+import copy
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from context_sync import (
+    MAX_HISTORY_ENTRIES, context_delta, context_version, public_context, rebase_turn, sync_context
+)
+
+
+def _apply(client, delta, rendered_products=None):
+    """What a client does with a compact context; returns its new (version, context)"""
+    version, context = client
+    assert delta['base'] is None or delta['base'] == version
+    context = {} if delta['base'] is None else dict(context)
+    context.update(copy.deepcopy(delta['set']))
+    for key in delta['unset']:
+        context.pop(key, None)
+    if 'product_ids' in delta:
+        by_id = {p['id']: p for p in rendered_products}
+        context['products'] = [by_id[i] for i in delta['product_ids']]
+    return delta['version'], context
+
+
+def test_random_turns_replay():
+    rng = random.Random(4)
+    context = {'products': [], 'cart_items': [], 'history': []}
+    clients = [(None, {}), (None, {})]
+    for turn in range(300):
+        action = rng.random()
+        if action < 0.3:
+            context['products'] = [{'id': f'P{rng.randint(0, 9)}', 'name': 'x'} for _ in range(rng.randint(0, 3))]
+        elif action < 0.5:
+            context['cart_items'] = context['cart_items'] + [{'id': 'OLJCESPC7Z', 'quantity': 1}]
+        elif action < 0.6 and 'selected_product' in context:
+            del context['selected_product']
+        elif action < 0.6:
+            context['selected_product'] = {'id': 'P1'}
+        context['history'] = context['history'] + [{'user': f'turn {turn}'}]
+        sync_context(context)
+
+        # Render the context products plus some extras, as search turns do
+        rendered = (list(context['products']) + [{'id': 'EXTRA'}]) if rng.random() < 0.5 else None
+        i = rng.randrange(len(clients))
+        if rng.random() < 0.1:
+            # Sometimes a client sends garbage or a version from the future
+            clients[i] = (rng.choice(['nonsense', 'abc-999999', None]), clients[i][1])
+        clients[i] = _apply(clients[i], context_delta(context, clients[i][0], {'products': rendered}), rendered)
+        assert clients[i][1] == public_context(context)
+
+
+def test_unchanged_turn_keeps_version_and_sends_nothing():
+    context = {'products': [], 'cart_items': []}
+    version = sync_context(context)
+    assert sync_context(context) == version
+    assert context_delta(context, version) == {'version': version, 'base': version, 'set': {}, 'unset': []}
+
+
+def test_new_epoch_gets_a_snapshot():
+    old = {'cart_items': [1]}
+    version = sync_context(old)
+    # An expired session comes back as a new context with a new epoch
+    new = {'cart_items': [1]}
+    sync_context(new)
+    delta = context_delta(new, version)
+    assert delta['base'] is None and delta['set'] == {'cart_items': [1]}
+
+
+def test_products_go_by_id_only_when_all_rendered():
+    context = {'products': [{'id': 'A'}, {'id': 'B'}]}
+    sync_context(context)
+    assert context_delta(context, None, {'products': [{'id': 'B'}, {'id': 'A'}]})['product_ids'] == ['A', 'B']
+    partial = context_delta(context, None, {'products': [{'id': 'A'}]})
+    assert 'product_ids' not in partial and partial['set']['products'] == context['products']
+
+
+def test_history_is_capped():
+    context = {'history': [{'user': str(i)} for i in range(MAX_HISTORY_ENTRIES + 5)]}
+    sync_context(context)
+    assert len(context['history']) == MAX_HISTORY_ENTRIES and context['history'][0] == {'user': '5'}
+
+
+def test_concurrent_turns_are_rebased():
+    saved = {'products': [], 'cart_items': [], 'history': []}
+    read_version = sync_context(saved)
+    # Two workers load the same version; one saves first
+    first, second = copy.deepcopy(saved), copy.deepcopy(saved)
+    first['products'] = [{'id': 'A'}]
+    sync_context(first)
+    second['cart_items'] = [{'id': 'OLJCESPC7Z', 'quantity': 1}]
+    second['selected_product'] = {'id': 'B'}
+    del second['history']
+
+    rebased = rebase_turn(first, second, read_version)
+    assert public_context(rebased) == {
+        'products': [{'id': 'A'}],
+        'cart_items': [{'id': 'OLJCESPC7Z', 'quantity': 1}],
+        'selected_product': {'id': 'B'},
+    }
+    assert public_context(first) == {'products': [{'id': 'A'}], 'cart_items': [], 'history': []}
+    # Retrying (a conflicting transaction) gives the same result
+    assert rebase_turn(first, second, read_version) == rebased
+    # A client of the first turn catches up with a delta
+    client = _apply((context_version(first), public_context(first)), context_delta(rebased, context_version(first)))
+    assert client == (context_version(rebased), public_context(rebased))
@@ -0,0 +1,39 @@
+"""
+Order number checks: shape of new numbers and reading typed ones back.
+
+    python -m pytest test_order_numbers.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from order_numbers import ORDER_NUMBER_ALPHABET, ORDER_NUMBER_LENGTH, new_order_number, normalize_order_number
+
+
+def test_new_numbers_use_the_alphabet():
+    numbers = {new_order_number() for _ in range(1000)}
+    assert len(numbers) == 1000
+    for number in numbers:
+        assert len(number) == ORDER_NUMBER_LENGTH and set(number) <= set(ORDER_NUMBER_ALPHABET)
+    assert not set('ILOU') & set(ORDER_NUMBER_ALPHABET)
+
+
+def test_new_numbers_read_back_unchanged():
+    for _ in range(1000):
+        number = new_order_number()
+        assert normalize_order_number(number) == number
+        assert normalize_order_number(number.lower()) == number
+
+
+def test_typed_numbers_are_normalized():
+    assert normalize_order_number(" 7k3q-x9md ") == "7K3QX9MD"
+    assert normalize_order_number("7K3Q X9MD") == "7K3QX9MD"
+    # Letters people type for digits
+    assert normalize_order_number("O1Il0000") == "01110000"
+
+
+def test_other_strings_are_not_numbers():
+    for text in ("", None, "7K3QX9M", "7K3QX9MD1", "7K3QX9MU", "ORD-1234", "7K3QX9M!"):
+        assert normalize_order_number(text) is None, text
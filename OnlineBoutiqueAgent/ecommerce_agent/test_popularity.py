@@ -0,0 +1,109 @@
+"""
+Popularity tracker checks: decay, the precomputed top-k and merging through a store.
+
+    python -m pytest test_popularity.py
+"""
+
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from popularity import EVENT_WEIGHTS, PopularityTracker
+
+HOUR = 3600.0
+
+
+class DictStore:
+    """PopularityStore in a dict, with the same decay-then-add semantics as database.Popularity"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add_scores(self, increments, as_of, decay_rate):
+        for product_id, increment in increments.items():
+            score, stored_as_of = self.rows.get(product_id, (0.0, as_of))
+            self.rows[product_id] = (increment + score * math.exp(-decay_rate * (as_of - stored_as_of)), as_of)
+
+    def load_scores(self):
+        return [(product_id, score, as_of) for product_id, (score, as_of) in self.rows.items()]
+
+
+def test_scores_halve_every_half_life():
+    now = [0.0]
+    tracker = PopularityTracker(half_life_seconds=HOUR, clock=lambda: now[0])
+    tracker.record('a', 'cart_add', quantity=2)
+    assert tracker.score('a') == EVENT_WEIGHTS['cart_add'] * 2
+    now[0] = 2 * HOUR
+    assert abs(tracker.score('a') - 1.5) < 1e-9
+    tracker.record('a', 'unknown')
+    tracker.record('', 'view')
+    assert len(tracker) == 1
+
+
+def test_top_ids_match_a_full_sort():
+    now = [0.0]
+    rng = random.Random(3)
+    tracker = PopularityTracker(half_life_seconds=HOUR, top_k=5, clock=lambda: now[0])
+    for _ in range(2000):
+        now[0] += rng.uniform(0, 120)
+        tracker.record(f'p{rng.randint(0, 30)}', rng.choice(list(EVENT_WEIGHTS)))
+    ranked = sorted(
+        {f'p{i}' for i in range(31) if tracker.score(f'p{i}')},
+        key=tracker.score, reverse=True
+    )
+    assert tracker.top_ids() == tuple(ranked[:5])
+
+
+def test_rebase_keeps_scores():
+    now = [0.0]
+    tracker = PopularityTracker(half_life_seconds=60, clock=lambda: now[0])
+    tracker.record('a', 'purchase')
+    # Far enough out that the next write re-bases the landmark
+    now[0] = 60 * 100
+    tracker.record('b', 'view')
+    assert tracker.top_ids() == ('b', 'a')
+    assert tracker.score('b') == 1.0 and tracker.score('a') < 1e-20
+
+
+def test_workers_merge_through_the_store():
+    now = [0.0]
+    store = DictStore()
+    first = PopularityTracker(half_life_seconds=HOUR, clock=lambda: now[0])
+    second = PopularityTracker(half_life_seconds=HOUR, clock=lambda: now[0])
+    first.attach_store(store)
+    second.attach_store(store)
+
+    first.record('a', 'purchase')
+    second.record('b', 'view')
+    now[0] = HOUR
+    assert first.flush() == 1 and second.flush() == 1
+    first.flush()
+    # Both see both increments, decayed by one half-life
+    for tracker in (first, second):
+        assert abs(tracker.score('a') - 2.5) < 1e-9
+        assert abs(tracker.score('b') - 0.5) < 1e-9
+        assert tracker.top_ids() == ('a', 'b')
+
+
+def test_failed_flush_keeps_increments():
+    class FailingStore(DictStore):
+        fail = True
+
+        def add_scores(self, increments, as_of, decay_rate):
+            if self.fail:
+                raise ConnectionError("store down")
+            super().add_scores(increments, as_of, decay_rate)
+
+    store = FailingStore()
+    tracker = PopularityTracker(clock=lambda: 0.0)
+    tracker.attach_store(store)
+    tracker.record('a', 'view')
+    try:
+        tracker.flush()
+    except ConnectionError:
+        pass
+    store.fail = False
+    assert tracker.flush() == 1 and store.rows['a'][0] == 1.0
@@ -0,0 +1,97 @@
+"""
+Price history checks: downsampled range queries against a plain scan.
+
+    python -m pytest test_price_history.py
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from price_history import BLOCK_SIZE, SEGMENT_SECONDS, PriceHistoryStore
+
+START = 1_700_000_000 // SEGMENT_SECONDS * SEGMENT_SECONDS
+
+
+def _scan(points, start, end, buckets):
+    """The query, answered from the raw points"""
+    span = max(end - start, 1)
+    out = {}
+    for ts, cents in points:
+        if start <= ts <= end:
+            b = min((ts - start) * buckets // span, buckets - 1)
+            lo, hi, _ = out.get(b, (cents, cents, cents))
+            out[b] = (min(lo, cents), max(hi, cents), cents)
+    return [
+        {'ts': start + b * span // buckets, 'min': lo / 100, 'max': hi / 100, 'last': last / 100}
+        for b, (lo, hi, last) in sorted(out.items())
+    ]
+
+
+def _history(rng, count):
+    store = PriceHistoryStore(min_interval_seconds=0)
+    points = []
+    ts, cents = START, 2000
+    for _ in range(count):
+        # Mostly dense (full blocks within an hour), sometimes gaps of hours or days
+        ts += rng.choice([1, 5, 30, 30, 600, 5000, 2 * SEGMENT_SECONDS])
+        cents = max(1, cents + rng.randint(-150, 150))
+        assert store.record('p', cents / 100, ts)
+        points.append((ts, cents))
+    return store, points
+
+
+def test_range_queries_match_a_scan():
+    rng = random.Random(11)
+    store, points = _history(rng, 5000)
+    first, last = points[0][0], points[-1][0]
+    for _ in range(300):
+        start = rng.randint(first - SEGMENT_SECONDS, last)
+        end = start + rng.choice([60, 3600, SEGMENT_SECONDS, 7 * SEGMENT_SECONDS, last - first])
+        buckets = rng.choice([1, 7, 24, 30, 90])
+        assert store.query('p', start, end, buckets) == _scan(points, start, end, buckets)
+
+
+def test_day_aligned_window_uses_summaries():
+    rng = random.Random(5)
+    store, points = _history(rng, 3000)
+    start = points[0][0] // SEGMENT_SECONDS * SEGMENT_SECONDS
+    days = (points[-1][0] - start) // SEGMENT_SECONDS + 1
+    end = start + days * SEGMENT_SECONDS - 1
+    assert store.query('p', start, end, days) == _scan(points, start, end, days)
+
+
+def test_block_boundaries():
+    store = PriceHistoryStore(min_interval_seconds=0)
+    # More than a block's worth inside one hour, then a price delta too wide for int32
+    points = [(START + i, 1000 + i % 7) for i in range(BLOCK_SIZE * 2 + 3)]
+    points.append((START + BLOCK_SIZE * 3, 2 ** 33))
+    for ts, cents in points:
+        store.record('p', cents / 100, ts)
+    assert len(store._series['p'].block_first) == 4
+    assert store.query('p', START, START + 3599, 4) == _scan(points, START, START + 3599, 4)
+    assert store.latest('p') == (points[-1][0], points[-1][1] / 100)
+
+
+def test_coalescing_and_bad_input():
+    store = PriceHistoryStore(min_interval_seconds=60)
+    assert store.record('p', '$19.99', START)
+    assert not store.record('p', '$19.99', START + 30)
+    assert store.record('p', '$18.99', START + 30)
+    assert store.record('p', '$18.99', START + 120)
+    assert not store.record('p', 'sold out', START + 200) and not store.record('', '$1', START)
+    # Out-of-order observations are clamped to the last timestamp
+    assert store.record('p', '$17.99', START)
+    assert store.latest('p') == (START + 120, 17.99)
+    assert store.query('p', START, START + 3599, 1) == [{'ts': START, 'min': 17.99, 'max': 19.99, 'last': 17.99}]
+    assert store.query('missing', START, START + 10) == [] and store.query('p', START + 10, START) == []
+
+
+def test_record_catalog():
+    store = PriceHistoryStore()
+    catalog = [{'id': 'a', 'price': '$5.49'}, {'id': 'b', 'price': '$1,018.00'}, {'id': 'c'}]
+    assert store.record_catalog(catalog, START) == 2
+    assert 'b' in store and 'c' not in store
+    assert store.latest('b') == (START, 1018.0)
@@ -0,0 +1,59 @@
+"""
+Product record checks: normalization at ingest, immutability and sharing.
+
+    python -m pytest test_product_records.py
+"""
+
+import copy
+import json
+import os
+import pickle
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from product_records import ProductRecord, freeze_product, freeze_products, normalize_features
+
+
+def test_features_are_normalized():
+    assert normalize_features({'color': 'black', 'size': 'M'}) == (
+        {'key': 'color', 'value': 'black'}, {'key': 'size', 'value': 'M'}
+    )
+    assert normalize_features([{'key': 'color', 'value': 'red'}]) == ({'key': 'color', 'value': 'red'},)
+    assert normalize_features(None) == () and normalize_features('waterproof') == ()
+    record = freeze_product({'id': 'OLJCESPC7Z', 'features': {'color': 'black'}})
+    assert all(type(f) is ProductRecord for f in record['features'])
+
+
+def test_records_are_immutable():
+    record = freeze_product({'id': 'OLJCESPC7Z', 'price': '$19.99'})
+    for mutate in (
+        lambda: record.__setitem__('price', '$1'),
+        lambda: record.__delitem__('price'),
+        lambda: record.update(price='$1'),
+        lambda: record.pop('price'),
+        lambda: record.setdefault('stock', 0),
+        record.clear,
+    ):
+        with pytest.raises(TypeError):
+            mutate()
+    assert dict(record, price='$1')['price'] == '$1' and record['price'] == '$19.99'
+
+
+def test_records_are_shared_not_copied():
+    products = freeze_products([{'id': 'a'}, {'id': 'b', 'features': {'size': 'L'}}])
+    assert freeze_products(products) is products
+    assert freeze_product(products[0]) is products[0]
+    assert copy.deepcopy(products[1]) is products[1]
+    # A list of records is re-wrapped, but the records themselves are reused
+    assert freeze_products(list(products))[1] is products[1]
+    assert freeze_products(None) == ()
+
+
+def test_records_serialize_like_dicts():
+    record = freeze_product({'id': 'a', 'features': {'color': 'black'}})
+    assert json.loads(json.dumps(record)) == {'id': 'a', 'features': [{'key': 'color', 'value': 'black'}]}
+    restored = pickle.loads(pickle.dumps(record))
+    assert type(restored) is ProductRecord and restored == record
@@ -0,0 +1,58 @@
+"""
+Recommender evaluation checks: metrics and no look-ahead in the replay.
+
+Needs google-adk (the recommender under test is the agent's):
+
+    python -m pytest test_recommender_eval.py
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('google.adk')
+
+from recommender_eval import build_catalog, evaluate, generate_log, load_log, write_log
+
+
+def test_metrics():
+    catalog = build_catalog(20)
+    log = generate_log(catalog, sessions=50)
+    report = evaluate(catalog, log, {
+        'oracle': lambda catalog, request, tracker: [request['purchased_id']],
+        'nothing': lambda catalog, request, tracker: [],
+    }, k=3)
+    assert report['oracle']['hit_rate@3'] == 1.0 and report['oracle']['requests'] == 50
+    assert report['oracle']['coverage'] == len({r['purchased_id'] for r in log}) / 20
+    assert report['nothing']['hit_rate@3'] == 0.0 and report['nothing']['coverage'] == 0.0
+
+
+def test_purchases_are_only_visible_to_later_requests():
+    catalog = build_catalog()
+    request = {'ts': 1_700_000_000.0, 'preferences': 'mug', 'current_product_id': None,
+               'purchased_id': catalog[0]['id'], 'events': []}
+    seen = []
+    evaluate(catalog, [request, dict(request, ts=request['ts'] + 60)], {
+        'popular': lambda catalog, request, tracker: seen.append(tracker.top_ids()) or []
+    })
+    assert seen == [(), (catalog[0]['id'],)]
+
+
+def test_log_round_trip(tmp_path):
+    catalog = build_catalog(30, seed=3)
+    log = generate_log(catalog, sessions=20, seed=3)
+    assert log == generate_log(catalog, sessions=20, seed=3)
+    assert {r['purchased_id'] for r in log} <= {p['id'] for p in catalog}
+    path = str(tmp_path / 'log.jsonl')
+    write_log(log, path)
+    assert load_log(path) == log
+
+
+def test_recommend_products_runs_offline():
+    catalog = build_catalog()
+    report = evaluate(catalog, generate_log(catalog, sessions=30), k=5)
+    for metrics in report.values():
+        assert 0.0 <= metrics['hit_rate@5'] <= 1.0 and metrics['p99_ms'] >= metrics['p50_ms']
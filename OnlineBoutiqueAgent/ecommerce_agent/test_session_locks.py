@@ -0,0 +1,69 @@
+"""
+Session lock checks: one lock per key, updates under it are never lost, and
+other sessions don't wait on a held one.
+
+    python -m pytest test_session_locks.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from session_locks import AsyncSessionLocks, SessionLocks
+from session_store import InMemorySessionStore
+
+
+def test_a_key_always_gets_the_same_lock():
+    locks = SessionLocks(shards=16)
+    assert len(locks) == 16
+    assert locks('session-a') is locks('session-a')
+    assert len({id(locks(f'session-{i}')) for i in range(1000)}) == 16
+
+
+def test_updates_under_the_lock_are_not_lost():
+    store = InMemorySessionStore(namespace='carts')
+
+    def add():
+        for _ in range(200):
+            store.update('cart', lambda count: count + 1, int)
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get('cart') == 8 * 200
+
+
+def test_turns_for_one_session_run_one_at_a_time():
+    turns = AsyncSessionLocks(shards=1024)
+    log = []
+
+    async def turn(session_id, name):
+        async with turns(session_id):
+            log.append(f'{name} start')
+            await asyncio.sleep(0.01)
+            log.append(f'{name} end')
+
+    async def run():
+        await asyncio.gather(turn('a', 'first'), turn('a', 'second'))
+
+    asyncio.run(run())
+    assert log == ['first start', 'first end', 'second start', 'second end']
+
+
+def test_other_sessions_do_not_wait():
+    turns = AsyncSessionLocks(shards=1024)
+    other = next(f'b{i}' for i in range(1024) if turns(f'b{i}') is not turns('a'))
+
+    async def run():
+        async with turns('a'):
+            # Times out if the other session's lock is held too
+            await asyncio.wait_for(turns(other).acquire(), timeout=1)
+            turns(other).release()
+            return True
+
+    assert asyncio.run(run())
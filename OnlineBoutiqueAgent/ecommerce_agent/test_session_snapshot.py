@@ -0,0 +1,121 @@
+"""
+Session snapshot checks: a restarted process sees what the stores held at
+the last snapshot, including after compaction and a torn last write.
+
+    python -m pytest test_session_snapshot.py
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from session_snapshot import SessionSnapshotter
+from session_store import InMemorySessionStore
+
+NAMESPACES = ('sessions', 'carts')
+
+
+def _restart(path, **options):
+    """A new process: fresh snapshotter and stores over the same log"""
+    snapshots = SessionSnapshotter(str(path), **options)
+    stores = {namespace: InMemorySessionStore(namespace=namespace) for namespace in NAMESPACES}
+    for store in stores.values():
+        snapshots.attach(store)
+    return snapshots, stores
+
+
+def _contents(store, keys):
+    return {key: store.get(key) for key in keys if key in store}
+
+
+def test_restart_replays_sets_deletes_and_clears(tmp_path):
+    path = tmp_path / 'sessions.log'
+    snapshots, stores = _restart(path)
+    stores['carts'].set('a', [{'id': 'OLJCESPC7Z', 'quantity': 1}])
+    stores['carts'].set('b', [])
+    stores['sessions'].set('a', {'history': ['hi']})
+    snapshots.snapshot()
+    stores['carts'].update('a', lambda items: items + [{'id': '66VCHSJNUP', 'quantity': 2}])
+    stores['carts'].delete('b')
+    stores['sessions'].clear()
+    snapshots.stop()
+
+    snapshots, stores = _restart(path)
+    # Only the index is built on open; values are decoded when first read
+    assert snapshots.stats()['saved_entries'] == 1 and snapshots.stats()['lazy_loads'] == 0
+    assert stores['carts'].get('a') == [{'id': 'OLJCESPC7Z', 'quantity': 1}, {'id': '66VCHSJNUP', 'quantity': 2}]
+    assert 'b' not in stores['carts'] and stores['sessions'].get('a') is None
+    assert snapshots.stats()['lazy_loads'] == 1
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = tmp_path / 'sessions.log'
+    snapshots, stores = _restart(path)
+    stores['carts'].set('a', [1])
+    snapshots.stop()
+    good_size = os.path.getsize(path)
+    # A crash in the middle of the next append
+    with open(path, 'ab') as f:
+        f.write(b'S\tcarts\t"a"\t0\t[1,2')
+
+    snapshots, stores = _restart(path)
+    assert os.path.getsize(path) == good_size
+    assert stores['carts'].get('a') == [1]
+    # The log stays appendable after the torn line is cut off
+    stores['carts'].set('b', [2])
+    snapshots.stop()
+    snapshots, stores = _restart(path)
+    assert _contents(stores['carts'], 'ab') == {'a': [1], 'b': [2]}
+
+
+def test_expired_entries_are_not_replayed(tmp_path):
+    path = tmp_path / 'sessions.log'
+    now = [1000.0]
+    snapshots = SessionSnapshotter(str(path), clock=lambda: now[0])
+    store = InMemorySessionStore(namespace='carts', ttl_seconds=60, clock=lambda: now[0])
+    snapshots.attach(store)
+    store.set('a', [1])
+    snapshots.stop()
+
+    now[0] += 61
+    snapshots = SessionSnapshotter(str(path), clock=lambda: now[0])
+    store = InMemorySessionStore(namespace='carts', ttl_seconds=60, clock=lambda: now[0])
+    snapshots.attach(store)
+    assert store.get('a') is None and 'a' not in store
+
+
+def test_random_changes_replay_through_compactions(tmp_path):
+    path = tmp_path / 'sessions.log'
+    rng = random.Random(7)
+    expected = {namespace: {} for namespace in NAMESPACES}
+    keys = [f'k{i}' for i in range(20)]
+    snapshots, stores = _restart(path, min_compact_records=50)
+    for step in range(2000):
+        namespace = rng.choice(NAMESPACES)
+        key = rng.choice(keys)
+        action = rng.random()
+        if action < 0.5:
+            value = {'step': step, 'items': list(range(rng.randint(0, 3)))}
+            stores[namespace].set(key, value)
+            expected[namespace][key] = value
+        elif action < 0.7:
+            stores[namespace].delete(key)
+            expected[namespace].pop(key, None)
+        elif action < 0.995:
+            assert stores[namespace].get(key) == expected[namespace].get(key)
+        else:
+            stores[namespace].clear()
+            expected[namespace] = {}
+        if rng.random() < 0.05:
+            snapshots.snapshot()
+        if rng.random() < 0.01:
+            snapshots.stop()
+            snapshots, stores = _restart(path, min_compact_records=50)
+    assert snapshots.compactions > 0
+    snapshots.stop()
+
+    snapshots, stores = _restart(path, min_compact_records=50)
+    for namespace in NAMESPACES:
+        assert _contents(stores[namespace], keys) == expected[namespace]
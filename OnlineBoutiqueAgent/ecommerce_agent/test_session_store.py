@@ -0,0 +1,117 @@
+"""
+Session store conformance checks.
+
+Every backend must behave the same (check_store). Redis is checked against
+the local stand-in in resp_standin.py, or a real server with --url:
+
+    python -m pytest test_session_store.py
+    python test_session_store.py --url redis://localhost:6379/0
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from resp_standin import RespStandIn
+from session_store import InMemorySessionStore, RedisSessionStore, SessionStore
+
+
+def check_store(store: SessionStore) -> None:
+    """Behaviour every backend must share (raises AssertionError)"""
+    store.clear()
+    assert store.get('missing') is None and store.get('missing', []) == []
+    assert 'cart' not in store and len(store) == 0
+
+    cart = store.setdefault('cart', list)
+    cart.append({'id': 'OLJCESPC7Z', 'name': 'Sunglasses', 'price': 19.99, 'quantity': 1})
+    store.set('cart', cart)
+    assert 'cart' in store and len(store) == 1
+    assert store.get('cart') == [{'id': 'OLJCESPC7Z', 'name': 'Sunglasses', 'price': 19.99, 'quantity': 1}]
+
+    context = {'products': ({'id': 'p1', 'features': ({'key': 'color', 'value': 'black'},)},),
+               'history': [{'user': 'hi ✓', 'assistant': 'hello'}]}
+    store.set('session', context)
+    loaded = store.get('session')
+    assert loaded['history'] == context['history']
+    assert loaded['products'][0]['features'][0] == {'key': 'color', 'value': 'black'}
+
+    assert store.delete('cart') and not store.delete('cart')
+    assert store.get('cart') is None and len(store) == 1
+
+    assert store.update('count', lambda n: n + 1, int) == 1
+    assert store.update('count', lambda n: n + 1, int) == 2 and store.get('count') == 2
+    assert store.pop('count') == 2 and store.pop('count', 0) == 0 and 'count' not in store
+    store.clear()
+    assert len(store) == 0
+
+
+def test_incomplete_backend_fails_on_construction():
+    class NoStats(SessionStore):
+        def get(self, key, default=None): return default
+        def set(self, key, value): pass
+        def delete(self, key): return False
+        def __contains__(self, key): return False
+        def __len__(self): return 0
+        def clear(self): pass
+
+    with pytest.raises(TypeError):
+        NoStats()
+
+
+def test_memory_store():
+    check_store(InMemorySessionStore(namespace='check'))
+
+
+def test_memory_bounds():
+    now = [0.0]
+    store = InMemorySessionStore(max_entries=3, ttl_seconds=10, clock=lambda: now[0])
+    for key in 'abc':
+        store.set(key, key)
+    store.get('a')                      # a is now most recently used
+    store.set('d', 'd')                 # evicts b
+    assert 'b' not in store and store.evictions == 1
+    now[0] = 5
+    store.get('a')                      # a slides to 15
+    now[0] = 12
+    assert store.get('c') is None and store.get('a') == 'a'
+    store.set('e', 'e')                 # purges expired d from the front
+    assert len(store) == 2 and store.expirations == 2
+
+
+def test_redis_standin():
+    with RespStandIn() as server:
+        store = RedisSessionStore(server.url, namespace='check', ttl_seconds=1)
+        check_store(store)
+        # Sliding expiry is the server's: a read pushes it out, idleness ends it
+        store.set('idle', 1)
+        time.sleep(0.6)
+        assert store.get('idle') == 1
+        time.sleep(0.6)
+        assert store.get('idle') == 1
+        time.sleep(1.1)
+        assert store.get('idle') is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session store conformance check")
+    parser.add_argument("--url", help="Redis-protocol server to check (default: the local stand-in)")
+    args = parser.parse_args()
+
+    test_memory_bounds()
+    test_memory_store()
+    print("memory: ok")
+    if args.url:
+        check_store(RedisSessionStore(args.url, namespace='session_store_check'))
+        print(f"redis {args.url}: ok")
+    else:
+        test_redis_standin()
+        print("redis stand-in: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+simple_server endpoint checks, in in-memory mode (no MongoDB).
+
+Needs the server's own dependencies (google-adk) and httpx for FastAPI's
+TestClient. The catalog scrape is replaced by a fixed product list:
+
+    python -m pytest test_simple_server.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('google.adk')
+pytest.importorskip('httpx')
+
+from fastapi.testclient import TestClient
+
+import simple_server
+from resp_standin import RespStandIn
+from session_store import AsyncSessionStore, RedisSessionStore
+
+PRODUCTS = [
+    {'id': f'P{i}', 'name': f'Sunglasses {i}', 'price': f'${10 + i}.99', 'image': ''}
+    for i in range(10)
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(simple_server, 'search_products', lambda query: {'status': 'success', 'products': PRODUCTS})
+    return TestClient(simple_server.app)
+
+
+def _events(body: str):
+    """(event, data) pairs of a Server-Sent Events body"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def _session():
+    return f'test-{uuid.uuid4().hex[:8]}'
+
+
+def test_stream_matches_chat(client):
+    message = {'message': 'red sunglasses', 'session_id': _session()}
+    reply = client.post('/chat', json=message).json()
+
+    response = client.post('/chat/stream', json=message)
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = _events(response.text)
+    names = [name for name, _ in events]
+    assert names[:2] == ['ui_component', 'ui_reason'] and names[-2:] == ['agent_response', 'context']
+
+    # The last ui_component wins; later ui_props events append products
+    component = [data for name, data in events if name == 'ui_component'][-1]
+    batches = [data for name, data in events if name == 'ui_props']
+    assert len(batches) == 3 and all(set(batch) == {'products'} for batch in batches[1:])
+    props = dict(batches[0], products=[p for batch in batches for p in batch['products']])
+    assert component == reply['ui_component']
+    assert props == reply['ui_props']
+    assert events[-2][1] == reply['agent_response']
+
+
+def test_stream_non_search_turn(client):
+    events = _events(client.post('/chat/stream', json={'message': 'show my cart', 'session_id': _session()}).text)
+    assert [name for name, _ in events] == ['ui_component', 'ui_reason', 'ui_props', 'agent_response', 'context']
+    assert events[0][1] == 'CheckoutWizard'
+
+
+def test_turns_saved_by_other_workers_are_kept(monkeypatch):
+    with RespStandIn() as server:
+        store = RedisSessionStore(server.url, namespace='sessions')
+        monkeypatch.setattr(simple_server, 'async_sessions', AsyncSessionStore(store))
+        request = simple_server.ChatRequest(message='red sunglasses', session_id=_session())
+
+        async def turns():
+            # Both turns load the session before either saves (as on two workers)
+            _, mine, _ = await simple_server._chat_session(request, None)
+            _, theirs, _ = await simple_server._chat_session(request, None)
+            theirs['products'] = PRODUCTS[:2]
+            await simple_server._save_session(request, request.session_id, theirs)
+            mine['cart_items'] = [{'id': 'P1', 'quantity': 1}]
+            return await simple_server._save_session(request, request.session_id, mine)
+
+        saved = asyncio.run(turns())
+        assert store.get(request.session_id) == saved
+    assert saved['products'] == PRODUCTS[:2] and saved['cart_items'] == [{'id': 'P1', 'quantity': 1}]
+
+
+@pytest.mark.parametrize('quantity', [0, -1, 2.5, '2.5', 'two', None, True, [1], {'$literal': 1}])
+def test_cart_add_rejects_bad_quantities(client, quantity):
+    session_id = _session()
+    response = client.post('/cart/add', json={'session_id': session_id, 'product_id': 'P1', 'quantity': quantity})
+    assert response.status_code == 400
+    assert client.get(f'/cart/{session_id}').json()['cart'] == []
+
+
+def test_cart_add_takes_whole_numbers(client):
+    session_id = _session()
+    for quantity in (2, '3', 1.0):
+        client.post('/cart/add', json={'session_id': session_id, 'product_id': 'P1', 'price': 10, 'quantity': quantity})
+    assert client.get(f'/cart/{session_id}').json()['total_items'] == 6
+
+
+def test_order_pages_report_every_order(client):
+    session_id = _session()
+    for i in range(3):
+        client.post('/cart/add', json={'session_id': session_id, 'product_id': f'P{i}', 'price': 10})
+        assert client.post('/checkout', json={'session_id': session_id}).json()['status'] == 'success'
+
+    first = client.get(f'/orders/{session_id}', params={'limit': 2}).json()
+    assert len(first['orders']) == 2 and first['total_orders'] == 3 and first['next_cursor']
+    rest = client.get(f'/orders/{session_id}', params={'limit': 2, 'cursor': first['next_cursor']}).json()
+    assert len(rest['orders']) == 1 and rest['total_orders'] == 3 and rest['next_cursor'] is None
@@ -0,0 +1,83 @@
+"""
+TamboUIDecisionEngine checks: intent ranking through the shared SDK engine.
+
+    python -m pytest test_tambo_ui_engine.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from tambo_ui_engine import TamboUIDecisionEngine
+
+
+def test_first_listed_component_ranks_first():
+    engine = TamboUIDecisionEngine()
+    for keyword, components in engine.intent_mappings.items():
+        assert engine.analyze_intent(f"{keyword}")[0] == components[0], keyword
+
+
+def test_keywords_vote_together():
+    engine = TamboUIDecisionEngine()
+    assert engine.analyze_intent("bundle them together") == ['BundleBuilder', 'DealBadgePanel', 'OutfitBoard']
+    assert engine.analyze_intent("cheap deal")[:2] == ['BudgetSlider', 'DealBadgePanel']
+    # The agent's reply counts too
+    assert engine.analyze_intent("", "here is a bundle") == ['BundleBuilder', 'DealBadgePanel']
+    assert engine.analyze_intent("red sunglasses") == ['ProductGrid']
+
+
+def test_cart_context_prefers_checkout():
+    engine = TamboUIDecisionEngine()
+    cart = {'cart_items': [{'id': 'OLJCESPC7Z', 'quantity': 1}]}
+    assert engine.decide_ui_component("buy now", "", cart, build_props=False).component_name == 'CheckoutWizard'
+    assert engine.decide_ui_component("optimize", "", cart, build_props=False).component_name == 'SmartCartOptimizer'
+    assert engine.decide_ui_component("red sunglasses", "", {}, build_props=False).component_name == 'ProductGrid'
+
+
+def test_keywords_match_whole_words():
+    engine = TamboUIDecisionEngine()
+    # "set" inside "settings", "fit" inside "outfit", "vs" inside "canvas"
+    assert engine.analyze_intent("account settings") == ['ProductGrid']
+    assert engine.analyze_intent("fitness tracker") == ['ProductGrid']
+    assert engine.analyze_intent("an outfit") == ['OutfitBoard', 'BundleBuilder']
+    assert engine.analyze_intent("canvas bag") == ['ProductGrid']
+    # Plurals and punctuation still match
+    assert engine.analyze_intent("outfits?")[0] == 'OutfitBoard'
+    assert engine.analyze_intent("Compare: A vs. B")[0] == 'ComparisonTable'
+
+
+OUTFIT_PRODUCTS = (
+    {'id': 'a', 'name': 'Tank Top', 'price': '$18.99'},
+    {'id': 'b', 'name': 'Loafers', 'price': '$89.99'},
+    {'id': 'c', 'name': 'Sunglasses', 'price': '$19.99'},
+)
+
+
+def test_decisions_are_memoized_by_normalized_message():
+    engine = TamboUIDecisionEngine()
+    first = engine.decide_ui_component("Compare these", "", {}, build_props=False)
+    second = engine.decide_ui_component("  COMPARE these ", "", {}, build_props=False)
+    assert first.component_name == second.component_name == 'ComparisonTable'
+    assert engine.cache_stats()['hits'] == 1
+
+
+def test_memoized_props_are_copies():
+    engine = TamboUIDecisionEngine()
+    context = {'products': OUTFIT_PRODUCTS}
+    first = engine.decide_ui_component("build an outfit", "", context)
+    first.props['products'] = ['from another response']
+    second = engine.decide_ui_component("build an outfit", "", context)
+    assert engine.cache_stats()['props']['hits'] == 1
+    assert 'products' not in second.props
+    assert [item['id'] for item in second.props['selectedOutfit']] == ['a', 'b', 'c']
+
+
+def test_props_follow_the_context():
+    engine = TamboUIDecisionEngine()
+    full = engine.decide_ui_component("build an outfit", "", {'products': OUTFIT_PRODUCTS})
+    partial = engine.decide_ui_component("build an outfit", "", {'products': OUTFIT_PRODUCTS[:2]})
+    assert full.props['missingCategories'] == [] and partial.props['missingCategories'] == ['accessory']
+    # The budget is part of the message, so it is part of the key too
+    cheap = engine.decide_ui_component("build an outfit under $50", "", {'products': OUTFIT_PRODUCTS})
+    assert cheap.props['selectedOutfit'] == []
@@ -18,7 +18,12 @@ Example usage:
 
 from .decision_engine import CommerceGenUI, UIIntent, ComponentRegistry
 from .intent_schema import CommerceIntent, UIDecision
-from .registry import ComponentConfig, register_component
+from .intent_engine import IntentEngine, ScoredIntent
+from .batch import BatchDecisions
+from .classifier import IntentClassifier
+from .decision_cache import DecisionCache
+from .fast_decision import FastDecision
+from .registry import ComponentConfig, register_component, clear_registry
 
 __version__ = "0.1.0"
 
@@ -28,6 +33,13 @@ __all__ = [
     "ComponentRegistry",
     "CommerceIntent",
     "UIDecision",
+    "IntentEngine",
+    "ScoredIntent",
+    "BatchDecisions",
+    "IntentClassifier",
+    "DecisionCache",
+    "FastDecision",
     "ComponentConfig",
-    "register_component"
+    "register_component",
+    "clear_registry"
 ]
@@ -0,0 +1,168 @@
+"""
+Batch Decisions - Replay many chat turns through the decision engine
+
+decide_ui builds and validates a full UIDecision (props, reason,
+alternatives) for every call. For offline evaluation only the intent and the
+component matter, so the batch path reuses the SDK's compiled intent matcher
+and component index, skips pydantic entirely and returns compact parallel
+arrays of ids. Large batches can be spread across a process pool; workers
+receive a small picklable snapshot of the matcher once, not per turn.
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .intent_engine import IntentEngine
+from .intent_schema import CommerceIntent
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# (user_message, agent_response, context)
+Turn = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+@dataclass
+class BatchDecisions:
+    """
+    Decisions for a batch of turns as parallel arrays
+
+    intent_ids[i] indexes `intents`, component_ids[i] indexes `components`
+    """
+    intents: Tuple[str, ...]
+    components: Tuple[str, ...]
+    intent_ids: array
+    component_ids: array
+    confidence: array
+
+    def __len__(self) -> int:
+        return len(self.intent_ids)
+
+    def intent(self, i: int) -> str:
+        return self.intents[self.intent_ids[i]]
+
+    def component(self, i: int) -> str:
+        return self.components[self.component_ids[i]]
+
+
+class BatchDecider:
+    """
+    Picklable snapshot of an SDK's decision tables
+
+    Component choice depends only on the intent and on whether the cart has
+    items, so it is precomputed for both cases from select_component.
+    """
+
+    def __init__(self, sdk, confidence: float):
+        self.engine: IntentEngine = sdk.intent_engine
+        self.classifier = sdk.classifier
+        self.classifier_threshold = sdk.classifier_threshold
+        self.default_intent = CommerceIntent.BROWSE_PRODUCTS
+        self.confidence = confidence
+        self.intents: Tuple[str, ...] = tuple(i.value for i in CommerceIntent)
+        intent_ids = {value: n for n, value in enumerate(self.intents)}
+
+        components: Dict[str, int] = {}
+        # intent value -> (intent id, component id without cart, component id with cart)
+        self.table: Dict[str, Tuple[int, int, int]] = {}
+        for intent in CommerceIntent:
+            without_cart = sdk.select_component(intent, {})
+            with_cart = sdk.select_component(intent, {"cart_items": [None]})
+            self.table[intent.value] = (
+                intent_ids[intent.value],
+                components.setdefault(without_cart, len(components)),
+                components.setdefault(with_cart, len(components)),
+            )
+        self.components: Tuple[str, ...] = tuple(components)
+
+    def decide_chunk(self, turns: Sequence[Tuple[str, str, bool]]) -> Tuple[array, array, array]:
+        """(intent ids, component ids, confidences) for (message, response, cart_has_items) turns"""
+        best = self.engine.best
+        classifier = self.classifier
+        threshold = self.classifier_threshold
+        table = self.table
+        default = self.default_intent
+        intent_ids = array("H")
+        component_ids = array("H")
+        confidence = array("f")
+        for message, response, has_cart in turns:
+            intent, score = None, self.confidence
+            if classifier is not None:
+                label, probability = classifier.predict(message, top_k=1)[0]
+                if probability >= threshold and isinstance(label, CommerceIntent):
+                    intent, score = label, probability
+            if intent is None:
+                intent = best(message, response, default=default)
+            ids = table[intent.value if isinstance(intent, CommerceIntent) else intent]
+            intent_ids.append(ids[0])
+            component_ids.append(ids[2] if has_cart else ids[1])
+            confidence.append(score)
+        return intent_ids, component_ids, confidence
+
+
+# Per-process decider, installed once by the pool initializer
+_worker_decider: Optional[BatchDecider] = None
+
+
+def _init_worker(decider: BatchDecider):
+    global _worker_decider
+    _worker_decider = decider
+
+
+def _decide_in_worker(turns: Sequence[Tuple[str, str, bool]]) -> Tuple[array, array, array]:
+    return _worker_decider.decide_chunk(turns)
+
+
+def _compact(turns: Iterable[Turn]) -> List[Tuple[str, str, bool]]:
+    """Keep only what the decision depends on (contexts stay in this process)"""
+    return [
+        (message or "", response or "", bool(context and context.get("cart_items")))
+        for message, response, context in turns
+    ]
+
+
+def decide_batch(
+    sdk,
+    turns: Iterable[Turn],
+    processes: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    confidence: float = 0.95
+) -> BatchDecisions:
+    """
+    Decide intent and component for every turn
+
+    Args:
+        sdk: CommerceGenUI whose patterns and components are used
+        turns: (user_message, agent_response, context) tuples
+        processes: Worker processes; None or 1 decides in this process
+        chunk_size: Turns per worker task
+        confidence: Confidence recorded for keyword-pattern decisions
+    """
+    decider = BatchDecider(sdk, confidence)
+    compact = _compact(turns)
+    intent_ids = array("H")
+    component_ids = array("H")
+    confidences = array("f")
+
+    if processes and processes > 1 and len(compact) > chunk_size:
+        chunks = [compact[i:i + chunk_size] for i in range(0, len(compact), chunk_size)]
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(decider,)
+        ) as pool:
+            for chunk_intents, chunk_components, chunk_confidence in pool.map(_decide_in_worker, chunks):
+                intent_ids.extend(chunk_intents)
+                component_ids.extend(chunk_components)
+                confidences.extend(chunk_confidence)
+    else:
+        intent_ids, component_ids, confidences = decider.decide_chunk(compact)
+
+    return BatchDecisions(
+        intents=decider.intents,
+        components=decider.components,
+        intent_ids=intent_ids,
+        component_ids=component_ids,
+        confidence=confidences
+    )
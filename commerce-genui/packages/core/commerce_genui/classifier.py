@@ -0,0 +1,317 @@
+"""
+Intent Classifier - Optional CPU-only linear model for intent detection
+
+Messages are turned into hashed n-gram features (word unigrams, bigrams and
+5-character stems) and scored by a softmax-regression model in NumPy.
+Probabilities are calibrated with temperature scaling fitted on a held-out
+split the model was not trained on, so they can be used directly as
+decision confidence. CommerceGenUI
+uses the classifier when its top probability clears a threshold and falls
+back to keyword patterns otherwise.
+
+Requires NumPy (pip install commerce-genui[ml]).
+
+Usage:
+    python -m commerce_genui.classifier train examples.jsonl model.npz
+    python -m commerce_genui.classifier predict model.npz "where is my parcel"
+
+Examples file (JSON lines):
+    {"text": "what's in my basket", "intent": "VIEW_CART"}
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is an optional extra
+    np = None
+
+from .intent_schema import CommerceIntent
+
+DEFAULT_N_FEATURES = 2 ** 14
+STEM_LENGTH = 5
+
+_TOKEN = re.compile(r"[a-z0-9$]+(?:'[a-z]+)?")
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError(
+            "IntentClassifier requires NumPy. Install it with: pip install commerce-genui[ml]"
+        )
+
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    """Read (text, intent) pairs from a JSON lines file"""
+    examples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row["text"], row["intent"]))
+    return examples
+
+
+class HashedNgramFeaturizer:
+    """
+    Text → sparse L2-normalised feature vector via the hashing trick
+
+    Hashes are crc32, so a saved model means the same thing in every process
+    (Python's str hash is salted per process).
+    """
+
+    def __init__(self, n_features: int = DEFAULT_N_FEATURES):
+        self.n_features = n_features
+
+    def features(self, text: str) -> Tuple[Any, Any]:
+        """(column indices, values) for one text"""
+        tokens = _TOKEN.findall(text.lower())
+        # Sentence marker keeps every row non-empty and pairs with the first word
+        grams = ["<s>"]
+        previous = "<s>"
+        for token in tokens:
+            grams.append("w:" + token)
+            grams.append("b:" + previous + " " + token)
+            if len(token) > STEM_LENGTH:
+                grams.append("p:" + token[:STEM_LENGTH])
+            previous = token
+
+        counts: Dict[int, float] = {}
+        n_features = self.n_features
+        for gram in grams:
+            column = zlib.crc32(gram.encode("utf-8")) % n_features
+            counts[column] = counts.get(column, 0.0) + 1.0
+
+        columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        values /= math.sqrt(float(values @ values))
+        return columns, values
+
+    def batch(self, texts: Sequence[str]) -> Tuple[Any, Any, Any]:
+        """(row ids, column indices, values) for many texts, rows in order"""
+        rows, columns, values = [], [], []
+        for row, text in enumerate(texts):
+            c, v = self.features(text)
+            rows.append(np.full(len(c), row, dtype=np.int64))
+            columns.append(c)
+            values.append(v)
+        return np.concatenate(rows), np.concatenate(columns), np.concatenate(values)
+
+
+class IntentClassifier:
+    """
+    Hashed n-gram softmax regression with calibrated probabilities
+
+    Example:
+        clf = IntentClassifier.train(load_examples("intents.jsonl"))
+        clf.predict("where is my parcel")
+        # [(CommerceIntent.TRACK_ORDER, 0.91), (CommerceIntent.VIEW_ORDER_HISTORY, 0.06), ...]
+        sdk.use_classifier(clf)
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[Any],
+        weights: Any,
+        bias: Any,
+        temperature: float = 1.0,
+        n_features: int = DEFAULT_N_FEATURES
+    ):
+        _require_numpy()
+        self.labels = list(labels)
+        self.weights = weights
+        self.bias = bias
+        self.temperature = temperature
+        self.featurizer = HashedNgramFeaturizer(n_features)
+
+    # ------------------------------------------------------------------
+    # Inference
+    # ------------------------------------------------------------------
+
+    def probabilities(self, text: str) -> Any:
+        """Calibrated probability per label (aligned with self.labels)"""
+        columns, values = self.featurizer.features(text)
+        logits = (values @ self.weights[columns] + self.bias) / self.temperature
+        logits -= logits.max()
+        exp = np.exp(logits)
+        return exp / exp.sum()
+
+    def predict(self, text: str, top_k: Optional[int] = None) -> List[Tuple[Any, float]]:
+        """Labels with their probabilities, most likely first"""
+        probs = self.probabilities(text)
+        order = np.argsort(-probs)
+        if top_k is not None:
+            order = order[:top_k]
+        return [(self.labels[i], float(probs[i])) for i in order]
+
+    # ------------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def train(
+        cls,
+        examples: Sequence[Tuple[str, Any]],
+        n_features: int = DEFAULT_N_FEATURES,
+        epochs: int = 300,
+        learning_rate: float = 0.1,
+        l2: float = 1e-4,
+        validation_split: float = 0.2,
+        seed: int = 0
+    ) -> "IntentClassifier":
+        """
+        Fit on (text, intent) pairs with full-batch Adam, then fit the
+        softmax temperature on a held-out split
+
+        The model keeps the weights the temperature was fitted for: weights
+        refit on all examples would have different logit scales, and the
+        temperature would no longer calibrate them. With fewer than 20
+        examples nothing is held out and the temperature stays 1.
+        """
+        _require_numpy()
+        if not examples:
+            raise ValueError("At least one example is required")
+
+        labels = sorted({_as_intent(label) for _, label in examples}, key=str)
+        label_ids = {label: i for i, label in enumerate(labels)}
+        featurizer = HashedNgramFeaturizer(n_features)
+
+        shuffled = list(examples)
+        random.Random(seed).shuffle(shuffled)
+        held_out = int(len(shuffled) * validation_split) if len(shuffled) >= 20 else 0
+
+        fit_part, check_part = shuffled[held_out:], shuffled[:held_out]
+        weights, bias = _fit(fit_part, label_ids, featurizer, epochs, learning_rate, l2)
+        temperature = _fit_temperature(check_part, label_ids, featurizer, weights, bias) if held_out else 1.0
+        return cls(labels, weights, bias, temperature, n_features)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str):
+        np.savez_compressed(
+            path,
+            weights=self.weights.astype(np.float32),
+            bias=self.bias,
+            temperature=np.array([self.temperature]),
+            n_features=np.array([self.featurizer.n_features]),
+            labels=np.array([str(getattr(l, "value", l)) for l in self.labels])
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        _require_numpy()
+        with np.load(path) as data:
+            return cls(
+                labels=[_as_intent(l) for l in data["labels"].tolist()],
+                weights=data["weights"].astype(np.float64),
+                bias=data["bias"],
+                temperature=float(data["temperature"][0]),
+                n_features=int(data["n_features"][0])
+            )
+
+
+def _as_intent(label: Any) -> Any:
+    """CommerceIntent for known intent names, the raw label otherwise"""
+    try:
+        return CommerceIntent(label)
+    except ValueError:
+        return label
+
+
+def _design(examples, label_ids, featurizer):
+    rows, columns, values = featurizer.batch([text for text, _ in examples])
+    targets = np.array([label_ids[_as_intent(label)] for _, label in examples])
+    return rows, columns, values, targets
+
+
+def _logits(rows, columns, values, n_rows, weights, bias):
+    logits = np.zeros((n_rows, weights.shape[1]))
+    np.add.at(logits, rows, weights[columns] * values[:, None])
+    return logits + bias
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def _fit(examples, label_ids, featurizer, epochs, learning_rate, l2):
+    rows, columns, values, targets = _design(examples, label_ids, featurizer)
+    n_rows, n_labels = len(examples), len(label_ids)
+    weights = np.zeros((featurizer.n_features, n_labels))
+    bias = np.zeros(n_labels)
+    onehot = np.eye(n_labels)[targets]
+
+    # Adam state
+    m_w, v_w = np.zeros_like(weights), np.zeros_like(weights)
+    m_b, v_b = np.zeros_like(bias), np.zeros_like(bias)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    active = np.unique(columns)
+
+    for step in range(1, epochs + 1):
+        error = (_softmax(_logits(rows, columns, values, n_rows, weights, bias)) - onehot) / n_rows
+        grad_w = np.zeros_like(weights)
+        np.add.at(grad_w, columns, error[rows] * values[:, None])
+        grad_w[active] += l2 * weights[active]
+        grad_b = error.sum(axis=0)
+
+        # Only columns that occur in the data ever move
+        m_w[active] = beta1 * m_w[active] + (1 - beta1) * grad_w[active]
+        v_w[active] = beta2 * v_w[active] + (1 - beta2) * grad_w[active] ** 2
+        m_b = beta1 * m_b + (1 - beta1) * grad_b
+        v_b = beta2 * v_b + (1 - beta2) * grad_b ** 2
+        correction1, correction2 = 1 - beta1 ** step, 1 - beta2 ** step
+        weights[active] -= learning_rate * (m_w[active] / correction1) / (np.sqrt(v_w[active] / correction2) + eps)
+        bias -= learning_rate * (m_b / correction1) / (np.sqrt(v_b / correction2) + eps)
+
+    return weights, bias
+
+
+def _fit_temperature(examples, label_ids, featurizer, weights, bias) -> float:
+    """Temperature minimising held-out negative log-likelihood (grid search)"""
+    rows, columns, values, targets = _design(examples, label_ids, featurizer)
+    logits = _logits(rows, columns, values, len(examples), weights, bias)
+    best_t, best_nll = 1.0, float("inf")
+    for t in np.exp(np.linspace(math.log(0.25), math.log(8.0), 41)):
+        probs = _softmax(logits / t)
+        nll = -np.log(probs[np.arange(len(targets)), targets] + 1e-12).mean()
+        if nll < best_nll:
+            best_t, best_nll = float(t), nll
+    return best_t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or query the intent classifier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train", help="Train from a JSON lines examples file")
+    train_cmd.add_argument("examples")
+    train_cmd.add_argument("model")
+    train_cmd.add_argument("--epochs", type=int, default=300)
+    predict_cmd = sub.add_parser("predict", help="Rank intents for a message")
+    predict_cmd.add_argument("model")
+    predict_cmd.add_argument("text")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        examples = load_examples(args.examples)
+        clf = IntentClassifier.train(examples, epochs=args.epochs)
+        clf.save(args.model)
+        print(f"Trained on {len(examples)} examples, {len(clf.labels)} intents, "
+              f"temperature {clf.temperature:.2f} → {args.model}")
+    else:
+        clf = IntentClassifier.load(args.model)
+        for label, prob in clf.predict(args.text, top_k=5):
+            print(f"{prob:6.3f}  {getattr(label, 'value', label)}")
+
+
+if __name__ == "__main__":
+    main()
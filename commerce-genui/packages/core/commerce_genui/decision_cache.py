@@ -0,0 +1,131 @@
+"""
+Decision Cache - Bounded LRU memo for UI decisions
+
+The same short messages ("show cart", "checkout", "my orders") recur
+constantly. A decision is cached under the normalized message plus a cheap
+fingerprint of only the context fields the chosen component's props read,
+so a changed cart invalidates CheckoutWizard but not ProductGrid.
+
+Fingerprints are structural and depth-limited: scalars compare by value and
+containers by their contents down to FINGERPRINT_DEPTH levels (deeper
+containers only by length). Cached props are shared between hits - treat
+them as read-only.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_SIZE = 1024
+# context value → record → nested field (e.g. products → product → features)
+FINGERPRINT_DEPTH = 3
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class Unfingerprintable(TypeError):
+    """A context value can't be fingerprinted, so the decision is not cached"""
+
+
+def normalize_message(text: Optional[str]) -> str:
+    """
+    Cache form of a message: case and surrounding whitespace dropped
+
+    Intent matching is already case-insensitive and word-bounded, so this
+    never changes which decision a message gets.
+    """
+    return (text or "").strip().lower()
+
+
+def fingerprint(value: Any, depth: int = FINGERPRINT_DEPTH) -> Hashable:
+    """Hashable summary of a context value (see module docstring)"""
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, dict):
+        if depth <= 0:
+            return ("{}", len(value))
+        return tuple((k, fingerprint(v, depth - 1)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        if depth <= 0:
+            return ("[]", len(value))
+        return ("[]",) + tuple(fingerprint(v, depth - 1) for v in value)
+    try:
+        # Other hashable objects compare by their own equality (and the key keeps them alive)
+        hash(value)
+    except TypeError:
+        raise Unfingerprintable(type(value).__name__)
+    return value
+
+
+def context_fingerprint(context: Dict[str, Any], fields: Optional[Iterable[str]]) -> Tuple:
+    """Fingerprint of the given context fields (None means every field)"""
+    if fields is None:
+        return tuple((k, fingerprint(v)) for k, v in sorted(context.items()))
+    return tuple(fingerprint(context.get(f)) for f in fields)
+
+
+class DecisionCache:
+    """
+    Thread-safe LRU with hit/miss counters
+
+    Example:
+        cache = DecisionCache(max_entries=512)
+        value = cache.get(key)
+        if value is None:
+            value = cache.put(key, build())
+        cache.stats()  # {'hits': ..., 'misses': ..., 'hit_rate': ...}
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value (marked most recently used) or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        """Store a value, evicting the least recently used entry when full"""
+        if self.max_entries <= 0:
+            return value
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -3,7 +3,7 @@ Decision Engine - Core logic for converting agent responses to UI decisions
 Extracted and enhanced from ShopSage project
 """
 
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Sequence, Tuple
 from dataclasses import dataclass, field
 from .intent_schema import (
     CommerceIntent,
@@ -11,6 +11,25 @@ from .intent_schema import (
     IntentPattern,
     DEFAULT_INTENT_PATTERNS
 )
+from .intent_engine import IntentEngine, IntentRule, ScoredIntent
+from .registry import ComponentConfig, ComponentIndex, _global_index
+from .batch import BatchDecisions, Turn, decide_batch
+from .decision_cache import (
+    DEFAULT_CACHE_SIZE,
+    DecisionCache,
+    Unfingerprintable,
+    context_fingerprint,
+    normalize_message
+)
+from .fast_decision import FastDecision
+
+# Confidence reported for keyword-pattern decisions
+DECISION_CONFIDENCE = 0.95
+# Classifier decisions below this probability fall back to keyword patterns
+DEFAULT_CLASSIFIER_THRESHOLD = 0.6
+# Runner-up intents at least this likely contribute alternatives
+ALTERNATIVE_MIN_PROBABILITY = 0.05
+MAX_ALTERNATIVE_INTENTS = 3
 
 
 @dataclass
@@ -23,24 +42,22 @@ class UIIntent:
     confidence: float = 1.0
 
 
-@dataclass
-class ComponentConfig:
-    """Configuration for a registered component"""
-    name: str
-    description: str
-    intents: List[CommerceIntent]
-    props_builder: Optional[Callable] = None
-    priority: int = 1
-
-
 class ComponentRegistry:
     """
     Registry for UI components
     Allows developers to register custom components
+    
+    Components registered globally with register_component() are folded into
+    the same intent index; components registered on this registry (including
+    the defaults) win on name clashes.
     """
     
     def __init__(self):
-        self.components: Dict[str, ComponentConfig] = {}
+        self.index = ComponentIndex()
+        self.components: Dict[str, ComponentConfig] = self.index.components
+        self._local: Dict[str, ComponentConfig] = {}
+        self._from_global: Dict[str, ComponentConfig] = {}
+        self._global_version = -1
         self._register_defaults()
     
     def _register_defaults(self):
@@ -117,14 +134,37 @@ class ComponentRegistry:
     
     def register(self, config: ComponentConfig):
         """Register a new component"""
-        self.components[config.name] = config
+        self._local[config.name] = config
+        self._from_global.pop(config.name, None)
+        self.index.add(config)
+    
+    def ranked_for_intent(self, intent: CommerceIntent) -> Tuple[ComponentConfig, ...]:
+        """Components that can handle an intent, highest priority first"""
+        self._sync_global()
+        return self.index.ranked(intent)
+    
+    def ranked_names_for_intent(self, intent: CommerceIntent) -> Tuple[str, ...]:
+        """Names of the components that can handle an intent, highest priority first"""
+        self._sync_global()
+        return self.index.ranked_names(intent)
     
     def get_for_intent(self, intent: CommerceIntent) -> List[ComponentConfig]:
         """Get all components that can handle an intent"""
-        return [
-            comp for comp in self.components.values()
-            if intent in comp.intents
-        ]
+        return list(self.ranked_for_intent(intent))
+    
+    def _sync_global(self):
+        """Pull in changes from the global registry (a version check when nothing changed)"""
+        if self._global_version == _global_index.version:
+            return
+        for name, config in self._from_global.items():
+            if self.index.components.get(name) is config:
+                self.index.remove(name)
+        self._from_global = {}
+        for name, config in _global_index.components.items():
+            if name not in self._local:
+                self.index.add(config)
+                self._from_global[name] = config
+        self._global_version = _global_index.version
 
 
 class CommerceGenUI:
@@ -138,12 +178,44 @@ class CommerceGenUI:
             agent_response="Found 15 laptops under $800",
             context={"products": [...]}
         )
+    
+    Decisions are memoized in an LRU of `cache_size` entries (0 disables it);
+    see cache_stats(). decide() and decide_json() skip pydantic validation.
     """
     
-    def __init__(self):
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
         self.registry = ComponentRegistry()
         self.intent_patterns = DEFAULT_INTENT_PATTERNS.copy()
         self.custom_handlers: Dict[str, Callable] = {}
+        
+        # Compiled matcher over intent_patterns (kept in sync by add_intent_pattern)
+        self.intent_engine = IntentEngine(
+            IntentRule(tuple(p.keywords), p.intent, p.priority) for p in self.intent_patterns
+        )
+        
+        # Optional trained classifier (see use_classifier)
+        self.classifier = None
+        self.classifier_threshold = DEFAULT_CLASSIFIER_THRESHOLD
+        
+        # Normalized message → (intent, confidence, component, alternatives), and
+        # (component, context fingerprint) → props for custom props builders
+        self.decision_cache = DecisionCache(cache_size)
+        self._props_cache = DecisionCache(cache_size)
+        self._cache_config: Optional[Tuple] = None
+    
+    def use_classifier(self, classifier, threshold: float = DEFAULT_CLASSIFIER_THRESHOLD):
+        """
+        Detect intents with a trained IntentClassifier
+        
+        Decisions whose top probability is below `threshold` fall back to
+        keyword patterns. Pass None to go back to patterns only.
+        
+        Example:
+            from commerce_genui.classifier import IntentClassifier, load_examples
+            sdk.use_classifier(IntentClassifier.train(load_examples("intents.jsonl")))
+        """
+        self.classifier = classifier
+        self.classifier_threshold = threshold
     
     def register_component(
         self,
@@ -151,7 +223,8 @@ class CommerceGenUI:
         description: str,
         intents: List[CommerceIntent],
         props_builder: Optional[Callable] = None,
-        priority: int = 1
+        priority: int = 1,
+        context_fields: Optional[List[str]] = None
     ):
         """
         Register a custom component
@@ -162,13 +235,16 @@ class CommerceGenUI:
             intents: Which intents trigger this component
             props_builder: Optional function to build props
             priority: Higher = more likely to be selected
+            context_fields: Context keys props_builder reads (default: all).
+                Builders that read anything outside the context need cache_size=0.
         """
         config = ComponentConfig(
             name=name,
             description=description,
-            intents=intents,
+            intents=list(intents),
             props_builder=props_builder,
-            priority=priority
+            priority=priority,
+            context_fields=context_fields
         )
         self.registry.register(config)
     
@@ -179,7 +255,7 @@ class CommerceGenUI:
         components: List[str],
         priority: int = 1
     ):
-        """Add custom intent pattern"""
+        """Add custom intent pattern (compiled into the matcher immediately)"""
         pattern = IntentPattern(
             keywords=keywords,
             intent=intent,
@@ -187,6 +263,17 @@ class CommerceGenUI:
             priority=priority
         )
         self.intent_patterns.append(pattern)
+        self.intent_engine.add_rule(pattern.keywords, pattern.intent, pattern.priority)
+    
+    def score_intents(
+        self,
+        user_message: str,
+        agent_response: str = ""
+    ) -> List[ScoredIntent]:
+        """
+        All matching intents in pattern priority order, with keyword hit counts
+        """
+        return self.intent_engine.score(user_message, agent_response)
     
     def detect_intent(
         self,
@@ -197,26 +284,32 @@ class CommerceGenUI:
         """
         Detect user intent from message and context
         
-        Returns the highest-priority matching intent
+        Returns the classifier's intent when one is configured and confident,
+        otherwise the highest-priority matching pattern (earliest added on ties)
         """
-        message_lower = user_message.lower()
-        response_lower = agent_response.lower()
-        combined = f"{message_lower} {response_lower}"
-        
-        # Find matching patterns
-        matches = []
-        for pattern in self.intent_patterns:
-            for keyword in pattern.keywords:
-                if keyword in combined:
-                    matches.append(pattern)
-                    break
-        
-        if not matches:
-            return CommerceIntent.BROWSE_PRODUCTS
-        
-        # Return highest priority intent
-        matches.sort(key=lambda p: p.priority, reverse=True)
-        return matches[0].intent
+        return self._detect(user_message, agent_response)[0]
+    
+    def _detect(
+        self,
+        user_message: str,
+        agent_response: str = ""
+    ) -> Tuple[CommerceIntent, float, List[Tuple[CommerceIntent, float]]]:
+        """(intent, confidence, runner-up intents with probabilities)"""
+        if self.classifier is not None:
+            ranked = self.classifier.predict(user_message)
+            if ranked and ranked[0][1] >= self.classifier_threshold and isinstance(ranked[0][0], CommerceIntent):
+                runners_up = [
+                    (label, prob) for label, prob in ranked[1:MAX_ALTERNATIVE_INTENTS + 1]
+                    if prob >= ALTERNATIVE_MIN_PROBABILITY and isinstance(label, CommerceIntent)
+                ]
+                return ranked[0][0], ranked[0][1], runners_up
+        
+        intent = self.intent_engine.best(
+            user_message,
+            agent_response,
+            default=CommerceIntent.BROWSE_PRODUCTS
+        )
+        return intent, DECISION_CONFIDENCE, []
     
     def select_component(
         self,
@@ -226,7 +319,7 @@ class CommerceGenUI:
         """
         Select best component for intent based on context
         """
-        candidates = self.registry.get_for_intent(intent)
+        candidates = self.registry.ranked_for_intent(intent)
         
         if not candidates:
             return "ProductGrid"  # Default fallback
@@ -238,8 +331,7 @@ class CommerceGenUI:
                 if intent in [CommerceIntent.CHECKOUT, CommerceIntent.VIEW_CART]:
                     return "CheckoutWizard"
         
-        # Return highest priority component
-        candidates.sort(key=lambda c: c.priority, reverse=True)
+        # Candidates are kept sorted by priority at registration time
         return candidates[0].name
     
     def build_props(
@@ -378,33 +470,152 @@ class CommerceGenUI:
         Returns:
             UIDecision with component, props, and explanation
         """
-        context = context or {}
+        return self.decide(user_message, agent_response, context).to_model()
+    
+    def decide(
+        self,
+        user_message: str,
+        agent_response: str = "",
+        context: Optional[Dict[str, Any]] = None
+    ) -> FastDecision:
+        """
+        decide_ui without validation - returns a slotted FastDecision
         
-        # Step 1: Detect intent
-        intent = self.detect_intent(user_message, agent_response, context)
+        Use decide_ui() where the validated UIDecision schema is needed.
+        """
+        context = context or {}
         
-        # Step 2: Select best component
-        component = self.select_component(intent, context)
+        if not self.decision_cache.enabled:
+            route = self._route(user_message, agent_response, context)
+        else:
+            self._check_cache_config()
+            # Routing depends only on the text and on whether the cart has items
+            key = (
+                normalize_message(user_message),
+                normalize_message(agent_response),
+                bool(context.get('cart_items'))
+            )
+            route = self.decision_cache.get(key)
+            if route is None:
+                route = self.decision_cache.put(key, self._route(user_message, agent_response, context))
+        intent, confidence, component, alternatives = route
         
         # Step 3: Build props
-        props = self.build_props(component, context)
+        props = self._cached_props(component, context)
         
-        # Step 4: Generate explanation
+        # Step 4: Generate explanation (quotes the message as typed)
         reason = self.get_selection_reason(intent, component, user_message)
         
-        # Step 5: Find alternatives
-        alternatives = [
-            c.name for c in self.registry.get_for_intent(intent)
-            if c.name != component
-        ]
-        
-        return UIDecision(
+        return FastDecision(
             intent=intent,
             component=component,
             reason=reason,
             data=props,
-            confidence=0.95,  # Could use ML model here
-            alternatives=alternatives if alternatives else None
+            confidence=confidence,
+            alternatives=list(alternatives) if alternatives else None
+        )
+    
+    def decide_json(
+        self,
+        user_message: str,
+        agent_response: str = "",
+        context: Optional[Dict[str, Any]] = None
+    ) -> bytes:
+        """
+        Decision encoded straight to JSON bytes (same document as
+        decide_ui(...).model_dump_json())
+        """
+        return self.decide(user_message, agent_response, context).to_json()
+    
+    def _route(
+        self,
+        user_message: str,
+        agent_response: str,
+        context: Dict[str, Any]
+    ) -> Tuple[CommerceIntent, float, str, Tuple[str, ...]]:
+        """Steps 1, 2 and 5 of decide_ui: (intent, confidence, component, alternatives)"""
+        # Step 1: Detect intent
+        intent, confidence, runners_up = self._detect(user_message, agent_response)
+        
+        # Step 2: Select best component
+        component = self.select_component(intent, context)
+        
+        # Step 5: Find alternatives - other components for this intent, then
+        # the best component of each likely runner-up intent
+        alternatives = [
+            name for name in self.registry.ranked_names_for_intent(intent)
+            if name != component
+        ]
+        for runner_up, _ in runners_up:
+            names = self.registry.ranked_names_for_intent(runner_up)
+            if names and names[0] != component and names[0] not in alternatives:
+                alternatives.append(names[0])
+        
+        return intent, confidence, component, tuple(alternatives)
+    
+    def _cached_props(self, component: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        build_props, memoized for custom props builders
+        
+        The default builders only pick fields out of the context, which is
+        cheaper than fingerprinting it, so they always run.
+        """
+        config = self.registry.components.get(component)
+        if not (config and config.props_builder and self._props_cache.enabled):
+            return self.build_props(component, context)
+        try:
+            key = (component, context_fingerprint(context, config.context_fields))
+        except Unfingerprintable:
+            return self.build_props(component, context)
+        props = self._props_cache.get(key)
+        if props is None:
+            props = self._props_cache.put(key, self.build_props(component, context))
+        # Callers get their own top-level dict; nested values are shared
+        return dict(props)
+    
+    def _check_cache_config(self):
+        """Drop cached decisions when components, patterns or the classifier change"""
+        self.registry._sync_global()
+        config = (
+            self.registry.index.version,
+            len(self.intent_engine.rules),
+            self.classifier,
+            self.classifier_threshold
+        )
+        if config != self._cache_config:
+            self.decision_cache.clear()
+            self._props_cache.clear()
+            self._cache_config = config
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Decision cache size and hit rate (custom props builders under "props")"""
+        stats = self.decision_cache.stats()
+        stats["props"] = self._props_cache.stats()
+        return stats
+    
+    def decide_ui_batch(
+        self,
+        turns: Sequence[Turn],
+        processes: Optional[int] = None,
+        chunk_size: int = 10000
+    ) -> BatchDecisions:
+        """
+        Decide intent and component for many (message, response, context) turns
+        
+        Shares the compiled matcher and component index, builds no props and
+        no UIDecision objects, and returns compact id/confidence arrays.
+        Pass processes > 1 to spread large batches across a process pool.
+        
+        Example:
+            result = sdk.decide_ui_batch([("Show my cart", "", None), ...])
+            result.component(0)  # "CheckoutWizard"
+        """
+        return decide_batch(
+            self,
+            turns,
+            processes=processes,
+            chunk_size=chunk_size,
+            confidence=DECISION_CONFIDENCE
         )
     
     def decide_ui_simple(
@@ -417,7 +628,7 @@ class CommerceGenUI:
         Simplified decision function returning lightweight UIIntent
         For backwards compatibility
         """
-        decision = self.decide_ui(user_message, agent_response, context)
+        decision = self.decide(user_message, agent_response, context)
         return UIIntent(
             intent=decision.intent,
             component=decision.component,
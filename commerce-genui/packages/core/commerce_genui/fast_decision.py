@@ -0,0 +1,156 @@
+"""
+Fast Decisions - Slotted decision records and direct JSON encoding
+
+UIDecision is the public, validated schema. On the hot path
+CommerceGenUI.decide() returns a FastDecision instead: a slotted dataclass
+that skips pydantic validation. decide_ui() converts it into a UIDecision,
+and decide_json() encodes it straight to JSON bytes. It uses orjson when
+that is installed (pip install commerce-genui[fast]) and the standard
+library otherwise.
+
+Benchmark:
+    python -m commerce_genui.fast_decision
+    python -m commerce_genui.fast_decision --iterations 50000
+"""
+
+import argparse
+import dataclasses
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional extra
+    orjson = None
+
+from pydantic import BaseModel
+
+from .intent_schema import CommerceIntent, UIDecision
+
+
+@dataclasses.dataclass
+class FastDecision:
+    """Unvalidated UI decision (same fields as UIDecision)"""
+    __slots__ = ("intent", "component", "reason", "data", "confidence", "alternatives")
+    intent: CommerceIntent
+    component: str
+    reason: str
+    data: Dict[str, Any]
+    confidence: float
+    alternatives: Optional[List[str]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Same shape as UIDecision.model_dump()"""
+        return {
+            "intent": getattr(self.intent, "value", self.intent),
+            "component": self.component,
+            "reason": self.reason,
+            "data": self.data,
+            "confidence": self.confidence,
+            "alternatives": self.alternatives
+        }
+
+    def to_model(self) -> UIDecision:
+        """Validated public schema"""
+        return UIDecision(
+            intent=self.intent,
+            component=self.component,
+            reason=self.reason,
+            data=self.data,
+            confidence=self.confidence,
+            alternatives=self.alternatives
+        )
+
+    def to_json(self) -> bytes:
+        return dumps(self)
+
+
+def _default(obj: Any) -> Any:
+    """Encode the values the standard JSON encoders don't know"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(decision: Union[FastDecision, UIDecision, Dict[str, Any]]) -> bytes:
+    """Compact JSON bytes for a decision (or any JSON-like dict)"""
+    if isinstance(decision, UIDecision):
+        decision = decision.model_dump()
+    if orjson is not None:
+        # orjson encodes slotted dataclasses and enums natively
+        return orjson.dumps(decision, default=_default)
+    if isinstance(decision, FastDecision):
+        decision = decision.to_dict()
+    return json.dumps(decision, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+BENCHMARK_TURNS = [
+    ("Show my cart", "", {"cart_items": [{"id": "1", "name": "Shoes", "price": 59.0, "quantity": 1}]}),
+    ("Show me cheap laptops under $800", "Found 15 laptops", None),
+    ("Compare the top 3", "", None),
+    ("my orders", "", {"orders": [{"id": "o1", "total": 12.5}]}),
+]
+
+
+def benchmark(iterations: int = 20000, product_count: int = 12) -> Dict[str, float]:
+    """Mean microseconds per decision for each path"""
+    from .decision_engine import CommerceGenUI
+
+    sdk = CommerceGenUI()
+    products = [
+        {"id": f"p{i}", "name": f"Product {i}", "price": 10.0 + i, "image": f"/img/{i}.jpg"}
+        for i in range(product_count)
+    ]
+    turns = [
+        (message, response, dict(context or {}, products=products))
+        for message, response, context in BENCHMARK_TURNS
+    ]
+    for message, response, context in turns:
+        assert json.loads(sdk.decide_json(message, response, context)) == \
+            json.loads(sdk.decide_ui(message, response, context).model_dump_json())
+
+    paths = {
+        "decide_ui (pydantic)": lambda m, r, c: sdk.decide_ui(m, r, c),
+        "decide (slotted)": lambda m, r, c: sdk.decide(m, r, c),
+        "decide_ui + model_dump_json": lambda m, r, c: sdk.decide_ui(m, r, c).model_dump_json(),
+        "decide_json": lambda m, r, c: sdk.decide_json(m, r, c),
+    }
+    results = {}
+    for name, fn in paths.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for message, response, context in turns:
+                fn(message, response, context)
+        results[name] = (time.perf_counter() - started) / (iterations * len(turns)) * 1e6
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decision fast path benchmark")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--products", type=int, default=12)
+    args = parser.parse_args()
+
+    results = benchmark(args.iterations, args.products)
+    print(f"{len(BENCHMARK_TURNS)} turns x {args.iterations} iterations, "
+          f"{args.products} products, encoder: {'orjson' if orjson else 'json'}")
+    for name, micros in results.items():
+        print(f"{name:<30}{micros:>8.2f} µs/decision{1e6 / micros:>12,.0f} decisions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Intent Engine - Compiled keyword matcher shared by every intent detector
+
+Rules map keywords to a label (an intent, a component name, ...). Rules are
+kept presorted by priority (ties keep insertion order) and all keywords are
+compiled into a single trie-shaped regex whenever a rule is added, so
+detection is one pass over the text regardless of how many rules exist.
+Keywords only match whole words (a plural -s/-es is allowed), so "set" no
+longer fires on "settings" nor "fit" on "outfit".
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class IntentRule:
+    """Keywords that vote for a label"""
+    keywords: Tuple[str, ...]
+    label: Hashable
+    priority: int = 1
+
+
+@dataclass
+class ScoredIntent:
+    """One ranked match: label, its best rule priority and how many keywords hit it"""
+    label: Any
+    priority: int
+    score: float
+    keywords: List[str] = field(default_factory=list)
+
+
+def trie_pattern(words: Sequence[str]) -> str:
+    """Regex source matching any of `words`, factored by common prefix (longest match first)"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def emit(node: Dict) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional: try the longer keyword first, fall back to the one ending here
+        return '(?:' + body + ')?' if '' in node else body
+
+    return emit(trie)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class IntentEngine:
+    """
+    Compiled keyword → label matcher, ranked by rule priority
+
+    Example:
+        engine = IntentEngine()
+        engine.add_rule(["cheap", "budget"], CommerceIntent.FILTER_BY_PRICE, priority=10)
+        engine.add_rule(["show", "find"], CommerceIntent.SEARCH_PRODUCTS)
+        engine.best("show me cheap shoes")   # CommerceIntent.FILTER_BY_PRICE
+        engine.score("show me cheap shoes")  # every match, best first
+    """
+
+    def __init__(self, rules: Iterable[IntentRule] = ()):
+        self.rules: List[IntentRule] = []
+        self._pattern: Optional[re.Pattern] = None
+        # Rules in priority order; a rule's rank is its position here
+        self._ranked: List[IntentRule] = []
+        # keyword -> best (lowest) rank it fires, and every rank it fires
+        self._keyword_best: Dict[str, int] = {}
+        self._keyword_ranks: Dict[str, Tuple[int, ...]] = {}
+        self.add_rules(rules)
+
+    def add_rule(self, keywords: Sequence[str], label: Hashable, priority: int = 1) -> IntentRule:
+        """Add one rule and recompile"""
+        rule = self._make_rule(keywords, label, priority)
+        self.rules.append(rule)
+        self.compile()
+        return rule
+
+    def add_rules(self, rules: Iterable[IntentRule]):
+        """Add several rules with a single recompile"""
+        for rule in rules:
+            self.rules.append(self._make_rule(rule.keywords, rule.label, rule.priority))
+        self.compile()
+
+    @staticmethod
+    def _make_rule(keywords: Sequence[str], label: Hashable, priority: int) -> IntentRule:
+        return IntentRule(
+            keywords=tuple(k.lower() for k in keywords if k),
+            label=label,
+            priority=priority
+        )
+
+    def compile(self):
+        """Presort the rules by priority and build the combined matcher"""
+        # Stable sort: equal priorities keep the order they were added in
+        self._ranked = sorted(self.rules, key=lambda r: -r.priority)
+
+        keyword_ranks: Dict[str, List[int]] = {}
+        for rank, rule in enumerate(self._ranked):
+            for keyword in rule.keywords:
+                ranks = keyword_ranks.setdefault(keyword, [])
+                if rank not in ranks:
+                    ranks.append(rank)
+
+        # Only the longest keyword starting at a position is reported, so a
+        # keyword also stands for the shorter keywords it starts with - as long
+        # as they end on a word boundary inside it ("try" in "try on")
+        closed: Dict[str, Tuple[int, ...]] = {}
+        for keyword, ranks in keyword_ranks.items():
+            merged = set(ranks)
+            for end, ch in enumerate(keyword):
+                if end and not _is_word_char(ch):
+                    merged.update(keyword_ranks.get(keyword[:end], ()))
+            closed[keyword] = tuple(sorted(merged))
+        self._keyword_ranks = closed
+        self._keyword_best = {keyword: ranks[0] for keyword, ranks in closed.items()}
+
+        if not closed:
+            self._pattern = None
+            return
+        # Whole words only, with an optional plural suffix outside the captured keyword
+        self._pattern = re.compile(
+            r'(?<!\w)(?=(' + trie_pattern(list(closed)) + r')(?:e?s)?(?!\w))'
+        )
+
+    def best(self, *texts: str, default: Any = None) -> Any:
+        """
+        Label of the highest-priority rule that fires, or `default`.
+
+        One pass over each text; returns as soon as the top-ranked rule fires.
+        """
+        pattern = self._pattern
+        if pattern is None:
+            return default
+        keyword_best = self._keyword_best
+        best_rank = len(self._ranked)
+        for text in texts:
+            if not text:
+                continue
+            for match in pattern.finditer(text.lower()):
+                rank = keyword_best[match.group(1)]
+                if rank < best_rank:
+                    best_rank = rank
+                    if rank == 0:
+                        return self._ranked[0].label
+        return self._ranked[best_rank].label if best_rank < len(self._ranked) else default
+
+    def matched_keywords(self, *texts: str) -> List[str]:
+        """Distinct longest keywords found in the texts, in order of appearance"""
+        if self._pattern is None:
+            return []
+        found: Dict[str, None] = {}
+        for text in texts:
+            if not text:
+                continue
+            for match in self._pattern.finditer(text.lower()):
+                found[match.group(1)] = None
+        return list(found)
+
+    def score(self, *texts: str) -> List[ScoredIntent]:
+        """
+        Every label that fires, in rule priority order (the first entry is
+        what `best` returns), with the number of keyword hits as its score
+        """
+        hits: Dict[int, List[str]] = {}
+        for keyword in self.matched_keywords(*texts):
+            for rank in self._keyword_ranks[keyword]:
+                hits.setdefault(rank, []).append(keyword)
+
+        by_label: Dict[Hashable, ScoredIntent] = {}
+        # Ranks are already in priority order, so no sorting by score is needed
+        for rank in sorted(hits):
+            rule = self._ranked[rank]
+            scored = by_label.get(rule.label)
+            if scored is None:
+                scored = by_label[rule.label] = ScoredIntent(rule.label, rule.priority, 0.0)
+            scored.score += len(hits[rank])
+            scored.keywords.extend(k for k in hits[rank] if k not in scored.keywords)
+        return list(by_label.values())
@@ -3,7 +3,8 @@ Component Registry - Global registry for UI components
 Provides plugin architecture
 """
 
-from typing import Dict, Any, List, Callable, Optional
+from bisect import bisect_right
+from typing import Dict, Any, List, Callable, Optional, Tuple
 from dataclasses import dataclass
 from .intent_schema import CommerceIntent
 
@@ -16,6 +17,8 @@ class ComponentConfig:
     intents: List[CommerceIntent]
     props_builder: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
     priority: int = 1
+    # Context keys props_builder reads (cache fingerprint); None means all of them
+    context_fields: Optional[List[str]] = None
     
     def __post_init__(self):
         """Validate configuration"""
@@ -25,8 +28,69 @@ class ComponentConfig:
             raise ValueError("Intents must be a list")
 
 
-# Global component registry
-_global_registry: Dict[str, ComponentConfig] = {}
+class ComponentIndex:
+    """
+    Components by name plus an intent → components index, kept sorted by
+    priority (highest first, registration order on ties) as components are
+    registered, so selecting a component is a dictionary lookup
+    """
+    
+    def __init__(self):
+        self.components: Dict[str, ComponentConfig] = {}
+        self._by_intent: Dict[CommerceIntent, Tuple[ComponentConfig, ...]] = {}
+        self._names_by_intent: Dict[CommerceIntent, Tuple[str, ...]] = {}
+        # Bumped on every change so dependent indexes can tell they are stale
+        self.version = 0
+    
+    def add(self, config: ComponentConfig):
+        """Add or replace a component (by name)"""
+        if config.name in self.components:
+            self._unindex(self.components[config.name])
+        self.components[config.name] = config
+        for intent in dict.fromkeys(config.intents):
+            ranked = list(self._by_intent.get(intent, ()))
+            keys = [-c.priority for c in ranked]
+            ranked.insert(bisect_right(keys, -config.priority), config)
+            self._set(intent, ranked)
+        self.version += 1
+    
+    def remove(self, name: str):
+        """Remove a component if present"""
+        config = self.components.pop(name, None)
+        if config is not None:
+            self._unindex(config)
+            self.version += 1
+    
+    def clear(self):
+        self.components.clear()
+        self._by_intent.clear()
+        self._names_by_intent.clear()
+        self.version += 1
+    
+    def ranked(self, intent: CommerceIntent) -> Tuple[ComponentConfig, ...]:
+        """Components for an intent, best first"""
+        return self._by_intent.get(intent, ())
+    
+    def ranked_names(self, intent: CommerceIntent) -> Tuple[str, ...]:
+        """Component names for an intent, best first"""
+        return self._names_by_intent.get(intent, ())
+    
+    def _unindex(self, config: ComponentConfig):
+        for intent in dict.fromkeys(config.intents):
+            self._set(intent, [c for c in self._by_intent.get(intent, ()) if c is not config])
+    
+    def _set(self, intent: CommerceIntent, ranked: List[ComponentConfig]):
+        if ranked:
+            self._by_intent[intent] = tuple(ranked)
+            self._names_by_intent[intent] = tuple(c.name for c in ranked)
+        else:
+            self._by_intent.pop(intent, None)
+            self._names_by_intent.pop(intent, None)
+
+
+# Global component registry - _global_registry is the index's name → config map
+_global_index = ComponentIndex()
+_global_registry: Dict[str, ComponentConfig] = _global_index.components
 
 
 def register_component(
@@ -34,7 +98,8 @@ def register_component(
     description: str,
     intents: List[CommerceIntent],
     props_builder: Optional[Callable] = None,
-    priority: int = 1
+    priority: int = 1,
+    context_fields: Optional[List[str]] = None
 ) -> ComponentConfig:
     """
     Register a component globally
@@ -45,7 +110,8 @@ def register_component(
             description="Shows flash deals with countdown",
             intents=[CommerceIntent.VIEW_DEALS],
             props_builder=lambda ctx: {"deals": ctx.get("flash_deals")},
-            priority=20
+            priority=20,
+            context_fields=["flash_deals"]
         )
     """
     config = ComponentConfig(
@@ -53,9 +119,10 @@ def register_component(
         description=description,
         intents=intents,
         props_builder=props_builder,
-        priority=priority
+        priority=priority,
+        context_fields=context_fields
     )
-    _global_registry[name] = config
+    _global_index.add(config)
     return config
 
 
@@ -71,4 +138,4 @@ def get_all_components() -> Dict[str, ComponentConfig]:
 
 def clear_registry():
     """Clear all registered components (useful for testing)"""
-    _global_registry.clear()
+    _global_index.clear()
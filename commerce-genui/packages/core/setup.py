@@ -32,6 +32,12 @@ setup(
         "pydantic>=2.0.0",
     ],
     extras_require={
+        "ml": [
+            "numpy>=1.22.0",
+        ],
+        "fast": [
+            "orjson>=3.8.0",
+        ],
         "dev": [
             "pytest>=7.0.0",
             "black>=23.0.0",
@@ -12,7 +12,12 @@ PYTHON_FILES = [
     "packages/core/commerce_genui/__init__.py",
     "packages/core/commerce_genui/intent_schema.py",
     "packages/core/commerce_genui/decision_engine.py",
+    "packages/core/commerce_genui/intent_engine.py",
     "packages/core/commerce_genui/registry.py",
+    "packages/core/commerce_genui/batch.py",
+    "packages/core/commerce_genui/classifier.py",
+    "packages/core/commerce_genui/decision_cache.py",
+    "packages/core/commerce_genui/fast_decision.py",
     "packages/core/setup.py",
     "examples/minimal-shop/backend/server.py",
 ]
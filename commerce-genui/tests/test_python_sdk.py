@@ -13,6 +13,7 @@ sys.path.insert(0, core_dir)
 
 try:
     from commerce_genui import CommerceGenUI, CommerceIntent, UIIntent, ComponentRegistry, UIDecision
+    from commerce_genui import IntentEngine, register_component, clear_registry
     print("✅ All imports successful")
 except ImportError as e:
     print(f"❌ Import error: {e}")
@@ -451,6 +452,324 @@ def test_pydantic_validation():
         return False
 
 
+def test_intent_scoring():
+    """Test 11: Scored intents from the shared intent engine"""
+    print("\n" + "="*60)
+    print("TEST 11: Intent Scoring")
+    print("="*60)
+    
+    try:
+        sdk = CommerceGenUI()
+        
+        # Every matching intent is returned, highest priority first
+        ranked = sdk.score_intents("Show cheap options under $100")
+        labels = [scored.label for scored in ranked]
+        assert labels[0] == CommerceIntent.FILTER_BY_PRICE, labels
+        assert CommerceIntent.SEARCH_PRODUCTS in labels, labels
+        assert ranked[0].score == 2.0, ranked[0]
+        assert ranked[0].label == sdk.detect_intent("Show cheap options under $100")
+        print(f"  ✓ Ranked: {[l.value for l in labels]}")
+        
+        # Keywords in the agent response count too
+        assert sdk.detect_intent("hmm", "Here is your order history") == CommerceIntent.VIEW_ORDER_HISTORY
+        print("  ✓ Agent response keywords detected")
+        
+        # Patterns added later are compiled into the same matcher
+        sdk.add_intent_pattern(["gift card"], CommerceIntent.VIEW_DEALS, ["DealBadgePanel"], priority=30)
+        assert sdk.detect_intent("Show my cart and a gift card") == CommerceIntent.VIEW_DEALS
+        print("  ✓ Custom pattern compiled")
+        
+        # Equal priority: the rule added first wins; hits only feed the score
+        engine = IntentEngine()
+        engine.add_rule(["a1", "a2"], "A")
+        engine.add_rule(["b1"], "B")
+        engine.add_rule(["c1"], "C", priority=5)
+        assert engine.best("b1 a1 a2") == "A"
+        assert engine.best("b1") == "B"
+        assert engine.best("a1 c1") == "C"
+        assert [s.score for s in engine.score("b1 a1 a2")] == [2.0, 1.0]
+        assert engine.best("nothing", default="none") == "none"
+        print("  ✓ Priority order with rule-order ties")
+        
+        # Whole words only, plurals allowed
+        assert engine.best("a1s") == "A"
+        assert engine.best("xa1 a1x", default="none") == "none"
+        assert sdk.detect_intent("Open settings") == CommerceIntent.BROWSE_PRODUCTS
+        assert sdk.detect_intent("Build an outfit") != CommerceIntent.VIRTUAL_TRYON
+        assert sdk.detect_intent("Show deals") == CommerceIntent.VIEW_DEALS
+        print("  ✓ Word-boundary matching")
+        
+        print("✅ Intent scoring working")
+        return True
+        
+    except AssertionError as e:
+        print(f"❌ Intent scoring failed: {e}")
+        return False
+
+
+def test_component_index():
+    """Test 12: Intent → component index maintained at registration"""
+    print("\n" + "="*60)
+    print("TEST 12: Component Index")
+    print("="*60)
+    
+    try:
+        sdk = CommerceGenUI()
+        
+        # Ranked at registration time, highest priority first
+        names = sdk.registry.ranked_names_for_intent(CommerceIntent.VIEW_CART)
+        assert names == ("CheckoutWizard",), names
+        sdk.register_component("CartDrawer", "Slide-out cart", [CommerceIntent.VIEW_CART], priority=30)
+        sdk.register_component("MiniCart", "Compact cart", [CommerceIntent.VIEW_CART], priority=15)
+        names = sdk.registry.ranked_names_for_intent(CommerceIntent.VIEW_CART)
+        assert names == ("CartDrawer", "CheckoutWizard", "MiniCart"), names
+        print(f"  ✓ VIEW_CART → {list(names)}")
+        
+        # Re-registering a name replaces it in the index
+        sdk.register_component("CartDrawer", "Slide-out cart", [CommerceIntent.VIEW_DEALS], priority=30)
+        assert "CartDrawer" not in sdk.registry.ranked_names_for_intent(CommerceIntent.VIEW_CART)
+        assert sdk.select_component(CommerceIntent.VIEW_DEALS) == "CartDrawer"
+        print("  ✓ Re-registration updates the index")
+        
+        # Alternatives come from the same index
+        decision = sdk.decide_ui("Show my cart")
+        assert decision.component == "CheckoutWizard"
+        assert decision.alternatives == ["MiniCart"], decision.alternatives
+        print(f"  ✓ Alternatives: {decision.alternatives}")
+        
+        # Global registrations feed every registry's index
+        clear_registry()
+        register_component("FlashSale", "Flash sale", [CommerceIntent.VIEW_DEALS], priority=50)
+        assert sdk.select_component(CommerceIntent.VIEW_DEALS) == "FlashSale"
+        assert CommerceGenUI().select_component(CommerceIntent.VIEW_DEALS) == "FlashSale"
+        clear_registry()
+        assert sdk.select_component(CommerceIntent.VIEW_DEALS) == "CartDrawer"
+        print("  ✓ Global registry feeds the index")
+        
+        print("✅ Component index working")
+        return True
+        
+    except AssertionError as e:
+        print(f"❌ Component index failed: {e}")
+        return False
+    finally:
+        clear_registry()
+
+
+def test_batch_decisions():
+    """Test 13: Batch decision API"""
+    print("\n" + "="*60)
+    print("TEST 13: Batch Decisions")
+    print("="*60)
+    
+    try:
+        sdk = CommerceGenUI()
+        sdk.register_component("FlashDealPanel", "Flash sales", [CommerceIntent.VIEW_DEALS], priority=20)
+        turns = [
+            ("Show my cart", "", {"cart_items": [{"id": "1"}]}),
+            ("Show cheap options under $100", "Found 3 items", None),
+            ("Compare these products", "", {}),
+            ("Show deals", "", None),
+            ("asdfghjkl", "", None),
+        ] * 3
+        
+        result = sdk.decide_ui_batch(turns)
+        assert len(result) == len(turns)
+        assert len(result.confidence) == len(turns)
+        for i, (message, response, context) in enumerate(turns):
+            decision = sdk.decide_ui(message, response, context)
+            intent = decision.intent if isinstance(decision.intent, str) else decision.intent.value
+            assert result.intent(i) == intent, (message, result.intent(i), intent)
+            assert result.component(i) == decision.component, (message, result.component(i))
+        print(f"  ✓ {len(result)} turns match decide_ui")
+        
+        # Same answers from a process pool
+        pooled = sdk.decide_ui_batch(turns, processes=2, chunk_size=4)
+        assert list(pooled.intent_ids) == list(result.intent_ids)
+        assert list(pooled.component_ids) == list(result.component_ids)
+        print("  ✓ Process pool results identical")
+        
+        print("✅ Batch decisions working")
+        return True
+        
+    except AssertionError as e:
+        print(f"❌ Batch decisions failed: {e}")
+        return False
+
+
+def test_intent_classifier():
+    """Test 14: Trained intent classifier"""
+    print("\n" + "="*60)
+    print("TEST 14: Intent Classifier")
+    print("="*60)
+    
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("  ⚠ NumPy not installed, skipping (pip install commerce-genui[ml])")
+        return True
+    
+    import tempfile
+    from commerce_genui import IntentClassifier
+    from commerce_genui.classifier import load_examples
+    
+    try:
+        examples = load_examples(os.path.join(test_dir, '..', 'examples', 'intent_examples.jsonl'))
+        clf = IntentClassifier.train(examples)
+        
+        ranked = clf.predict("where is my parcel right now")
+        assert ranked[0][0] == CommerceIntent.TRACK_ORDER, ranked[:3]
+        assert abs(sum(p for _, p in ranked) - 1.0) < 1e-6
+        assert all(ranked[i][1] >= ranked[i + 1][1] for i in range(len(ranked) - 1))
+        print(f"  ✓ 'where is my parcel' → {ranked[0][0].value} ({ranked[0][1]:.2f})")
+
+        # The temperature calibrates the weights that ship (fitted on the same held-out split)
+        import random
+        from commerce_genui.classifier import HashedNgramFeaturizer, _fit_temperature
+        shuffled = list(examples)
+        random.Random(0).shuffle(shuffled)
+        held_out = shuffled[:int(len(shuffled) * 0.2)]
+        label_ids = {label: i for i, label in enumerate(clf.labels)}
+        refit = _fit_temperature(held_out, label_ids, HashedNgramFeaturizer(clf.featurizer.n_features), clf.weights, clf.bias)
+        assert abs(refit - clf.temperature) < 1e-9, (refit, clf.temperature)
+        print(f"  ✓ Temperature {clf.temperature:.2f} fits the shipped weights")
+
+        # Classifier drives the decision and its confidence
+        sdk = CommerceGenUI()
+        sdk.use_classifier(clf, threshold=0.0)
+        decision = sdk.decide_ui("where is my parcel right now")
+        assert decision.intent == CommerceIntent.TRACK_ORDER
+        assert abs(decision.confidence - ranked[0][1]) < 1e-6
+        print(f"  ✓ decide_ui confidence {decision.confidence:.2f}, alternatives {decision.alternatives}")
+        
+        # Below the threshold keyword patterns decide
+        sdk.use_classifier(clf, threshold=1.01)
+        assert sdk.detect_intent("Show my cart") == CommerceIntent.VIEW_CART
+        assert sdk.decide_ui("Show my cart").confidence == 0.95
+        print("  ✓ Falls back to keyword patterns below threshold")
+        
+        # Batch replay honours the classifier
+        sdk.use_classifier(clf, threshold=0.0)
+        batch = sdk.decide_ui_batch([("where is my parcel right now", "", None)])
+        assert batch.intent(0) == CommerceIntent.TRACK_ORDER.value
+        assert abs(batch.confidence[0] - ranked[0][1]) < 1e-4
+        print("  ✓ Batch decisions use the classifier")
+        
+        # Save / load round trip
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.npz")
+            clf.save(path)
+            loaded = IntentClassifier.load(path)
+        again = loaded.predict("where is my parcel right now")
+        assert again[0][0] == ranked[0][0] and abs(again[0][1] - ranked[0][1]) < 1e-4
+        print("  ✓ Save/load round trip")
+        
+        print("✅ Intent classifier working")
+        return True
+        
+    except AssertionError as e:
+        print(f"❌ Intent classifier failed: {e}")
+        return False
+
+
+def test_decision_cache():
+    """Test 15: Memoized decisions"""
+    print("\n" + "="*60)
+    print("TEST 15: Decision Cache")
+    print("="*60)
+    
+    try:
+        sdk = CommerceGenUI(cache_size=2)
+        uncached = CommerceGenUI(cache_size=0)
+        context = {"cart_items": [{"id": "1"}], "products": [{"id": "p1", "price": 10}]}
+        
+        for message in ["Show my cart", "  show MY cart", "Compare these", "Show my cart", "checkout"]:
+            a = sdk.decide_ui(message, "", context)
+            b = uncached.decide_ui(message, "", context)
+            assert a.model_dump() == b.model_dump(), message
+        print("  ✓ Cached decisions match uncached ones (reason quotes the raw message)")
+        
+        stats = sdk.cache_stats()
+        assert stats["hits"] == 2 and stats["misses"] == 3, stats
+        assert stats["size"] == 2 and stats["evictions"] == 1, stats
+        print(f"  ✓ Hit rate {stats['hit_rate']:.2f}, bounded at {stats['max_entries']} entries")
+        
+        sdk.decide_ui("Show my cart", "", {})
+        assert sdk.cache_stats()["misses"] == stats["misses"] + 1
+        print("  ✓ Cart state is part of the key")
+        
+        # Custom props are rebuilt only when the fields they read change
+        calls = []
+        def deals_props(ctx):
+            calls.append(1)
+            return {"deals": ctx.get("flash_deals", [])}
+        sdk = CommerceGenUI()
+        sdk.register_component("FlashDealPanel", "Flash sales", [CommerceIntent.VIEW_DEALS],
+                               props_builder=deals_props, priority=20, context_fields=["flash_deals"])
+        deals = [{"id": "d1", "price": 5}]
+        sdk.decide_ui("Show deals", "", {"flash_deals": deals, "products": [1]})
+        sdk.decide_ui("show deals", "", {"flash_deals": deals, "products": [1, 2]})
+        assert len(calls) == 1
+        deals.append({"id": "d2", "price": 3})
+        assert len(sdk.decide_ui("Show deals", "", {"flash_deals": deals}).data["deals"]) == 2
+        assert len(calls) == 2
+        print("  ✓ Props cache keyed on the component's context fields")
+        
+        # Registering a component invalidates cached routes
+        sdk.register_component("MegaDeals", "Mega sales", [CommerceIntent.VIEW_DEALS], priority=30)
+        assert sdk.decide_ui("Show deals").component == "MegaDeals"
+        print("  ✓ Registry changes invalidate the cache")
+        
+        print("✅ Decision cache working")
+        return True
+        
+    except AssertionError as e:
+        print(f"❌ Decision cache failed: {e}")
+        return False
+
+
+def test_fast_decisions():
+    """Test 16: Slotted fast-path decisions and JSON encoding"""
+    print("\n" + "="*60)
+    print("TEST 16: Fast Decisions")
+    print("="*60)
+    
+    import json
+    from commerce_genui import FastDecision
+    
+    try:
+        sdk = CommerceGenUI()
+        context = {"products": [{"id": "p1", "price": 10.0}], "cart_items": [{"id": "c1"}]}
+        
+        for message in ["Show my cart", "Compare these", "Show me cheap shoes", "asdfghjkl"]:
+            fast = sdk.decide(message, "", context)
+            assert isinstance(fast, FastDecision)
+            assert not hasattr(fast, "__dict__")
+            model = sdk.decide_ui(message, "", context)
+            assert fast.to_dict() == model.model_dump(), message
+            assert json.loads(sdk.decide_json(message, "", context)) == json.loads(model.model_dump_json())
+        print("  ✓ decide / decide_json match decide_ui")
+        
+        simple = sdk.decide_ui_simple("Show my cart", "", context)
+        assert simple.component == "CheckoutWizard" and simple.intent == "VIEW_CART"
+        print("  ✓ decide_ui_simple built from the fast path")
+        
+        # Validation mode still rejects bad decisions
+        bad = FastDecision(CommerceIntent.VIEW_CART, "CheckoutWizard", "", {}, 1.5, None)
+        try:
+            bad.to_model()
+            assert False, "confidence > 1 should fail validation"
+        except ValueError:
+            print("  ✓ to_model() validates")
+        
+        print("✅ Fast decisions working")
+        return True
+        
+    except AssertionError as e:
+        print(f"❌ Fast decisions failed: {e}")
+        return False
+
+
 def run_all_tests():
     """Run all tests and report results"""
     print("\n" + "="*60)
@@ -468,6 +787,12 @@ def run_all_tests():
         ("Plugin System", test_plugin_system),
         ("Edge Cases", test_edge_cases),
         ("Pydantic Validation", test_pydantic_validation),
+        ("Intent Scoring", test_intent_scoring),
+        ("Component Index", test_component_index),
+        ("Batch Decisions", test_batch_decisions),
+        ("Intent Classifier", test_intent_classifier),
+        ("Decision Cache", test_decision_cache),
+        ("Fast Decisions", test_fast_decisions),
     ]
     
     results = []